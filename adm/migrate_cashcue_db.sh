@@ -0,0 +1,69 @@
+#!/usr/bin/env bash
+# =====================================================
+# CashCue Database Migration Script
+#
+# Description:
+#   Applies the schema migrations of adm/migrations/*.sql to an existing
+#   CashCue database, in file name order. Each migration is idempotent
+#   (IF NOT EXISTS ...), so the whole set can be replayed after every update.
+#   Fresh installs already get these changes from schemaCashCueBD.sql.
+#
+# Compatibility:
+#     - Native VM deployment (DB_HOST=localhost)
+#     - Docker container deployment (DB_HOST=cashcue_db)
+# =====================================================
+
+set -euo pipefail
+
+# --------------------------------------------------------------
+# Load a dotenv-style config file safely (see install_cashcue_db.sh)
+# --------------------------------------------------------------
+load_dotenv() {
+    local dotenv_file="$1"
+    if [ ! -f "$dotenv_file" ]; then
+        echo "[WARN] Dotenv file not found: $dotenv_file"
+        return 1
+    fi
+
+    while IFS= read -r line || [ -n "$line" ]; do
+        line="$(echo "$line" | sed -e 's/^[[:space:]]*//' -e 's/[[:space:]]*$//')"
+        [[ -z "$line" || "$line" =~ ^# ]] && continue
+        line="$(echo "$line" | sed -E 's/([^=]+)=([^#]*).*/\1=\2/')"
+        key="${line%%=*}"
+        value="${line#*=}"
+        key="$(echo "$key" | tr -d '[:space:]')"
+        value="$(echo "$value" | sed -e 's/^[[:space:]]*//' -e 's/[[:space:]]*$//')"
+        if [ -z "${!key:-}" ]; then
+            export "$key=$value"
+        fi
+    done < "$dotenv_file"
+}
+
+CONFIG_FILE="/etc/cashcue/cashcue.conf"
+
+if [ ! -f "$CONFIG_FILE" ]; then
+    echo "[ERROR] Configuration file not found: $CONFIG_FILE"
+    exit 1
+fi
+
+echo "[INFO] Loading configuration from $CONFIG_FILE"
+load_dotenv "$CONFIG_FILE"
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+MIGRATIONS_DIR="${SCRIPT_DIR}/migrations"
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_NAME="${DB_NAME:-cashcue}"
+DB_USER="${DB_USER:-cashcue_user}"
+DB_PASS="${DB_PASS:-}"
+
+# --------------------------------------------------------------
+# Apply migrations in order
+# --------------------------------------------------------------
+shopt -s nullglob
+for migration in "$MIGRATIONS_DIR"/*.sql; do
+    echo "[INFO] Applying $(basename "$migration")..."
+    mariadb -h "$DB_HOST" -u "$DB_USER" -p"$DB_PASS" "$DB_NAME" < "$migration"
+done
+
+echo "[SUCCESS] Database migrations applied."
@@ -0,0 +1,10 @@
+-- =====================================================
+-- realtime_price: composite (instrument_id, captured_at) index
+--
+-- Serves the half-open captured_at range scans of DailyPriceUpdater and the
+-- per-instrument "latest price" lookups (ORDER BY captured_at DESC LIMIT 1).
+-- Idempotent: safe to run again.
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS `idx_realtime_price_instrument_captured`
+    ON `realtime_price` (`instrument_id`, `captured_at`);
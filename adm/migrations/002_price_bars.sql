@@ -0,0 +1,36 @@
+-- =====================================================
+-- Intraday OHLC bars maintained by update_realtime_prices
+--
+-- price_bar_5m / price_bar_1h: one row per instrument and bar, merged at
+-- each sweep (REALTIME_BARS=true). first_at/last_at are the capture times of
+-- the ticks that set open/close, so late or repeated flushes merge correctly.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS `price_bar_5m` (
+  `instrument_id` int(11) NOT NULL,
+  `bar_start` datetime NOT NULL,
+  `open_price` decimal(12,4) NOT NULL,
+  `high_price` decimal(12,4) NOT NULL,
+  `low_price` decimal(12,4) NOT NULL,
+  `close_price` decimal(12,4) NOT NULL,
+  `tick_count` int(11) NOT NULL DEFAULT 0,
+  `first_at` datetime NOT NULL,
+  `last_at` datetime NOT NULL,
+  PRIMARY KEY (`instrument_id`,`bar_start`),
+  CONSTRAINT `price_bar_5m_ibfk_1` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `price_bar_1h` (
+  `instrument_id` int(11) NOT NULL,
+  `bar_start` datetime NOT NULL,
+  `open_price` decimal(12,4) NOT NULL,
+  `high_price` decimal(12,4) NOT NULL,
+  `low_price` decimal(12,4) NOT NULL,
+  `close_price` decimal(12,4) NOT NULL,
+  `tick_count` int(11) NOT NULL DEFAULT 0,
+  `first_at` datetime NOT NULL,
+  `last_at` datetime NOT NULL,
+  PRIMARY KEY (`instrument_id`,`bar_start`),
+  CONSTRAINT `price_bar_1h_ibfk_1` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
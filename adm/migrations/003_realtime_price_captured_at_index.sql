@@ -0,0 +1,11 @@
+-- =====================================================
+-- realtime_price: captured_at index
+--
+-- Serves the retention job (app.prune_realtime_prices), whose scans span all
+-- instruments: the MIN(captured_at) lookup, the per-day downsampling ranges
+-- and the id bounds of the ticks older than the raw cutoff.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS `idx_realtime_price_captured_at`
+    ON `realtime_price` (`captured_at`);
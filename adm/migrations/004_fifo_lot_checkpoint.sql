@@ -0,0 +1,27 @@
+-- =====================================================
+-- FIFO lot checkpoints used by update_portfolio_snapshot
+--
+-- fifo_lot_checkpoint: open lots, position and realized P/L of one
+-- instrument in one broker account after the order (last_trade_date,
+-- last_order_id). order_count/fingerprint (BIT_XOR of CRC32) cover every
+-- order up to that point: a back-dated, edited or deleted order changes them
+-- and the pair is replayed from scratch.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS `fifo_lot_checkpoint` (
+  `broker_account_id` int(11) NOT NULL,
+  `instrument_id` int(11) NOT NULL,
+  `last_trade_date` datetime NOT NULL,
+  `last_order_id` bigint(20) NOT NULL,
+  `order_count` int(11) NOT NULL,
+  `fingerprint` bigint(20) unsigned NOT NULL,
+  `position` decimal(16,4) NOT NULL,
+  `realized_pl` decimal(24,8) NOT NULL,
+  `lots` longtext NOT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`broker_account_id`,`instrument_id`),
+  KEY `fk_fifo_lot_checkpoint_instrument` (`instrument_id`),
+  CONSTRAINT `fk_fifo_lot_checkpoint_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_fifo_lot_checkpoint_instrument` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
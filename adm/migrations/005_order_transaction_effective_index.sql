@@ -0,0 +1,11 @@
+-- =====================================================
+-- order_transaction: composite (broker_account_id, status, settled, trade_date) index
+--
+-- Serves the "effective orders" filter (status='ACTIVE' AND settled=1) of the
+-- portfolio snapshot and history: per-account range scans in trade_date order
+-- that never touch cancelled or unsettled rows.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS `idx_order_tx_effective`
+    ON `order_transaction` (`broker_account_id`, `status`, `settled`, `trade_date`);
@@ -0,0 +1,23 @@
+-- =====================================================
+-- Cash balance watermarks used by recalc_cash_balances --incremental
+--
+-- cash_balance_checkpoint: balance of one broker account after the
+-- cash_transaction rows up to last_tx_id / last_tx_date (tx_count rows,
+-- content fingerprint: BIT_XOR of CRC32(CONCAT_WS('|', id, amount, type, date))).
+-- A later run only applies rows with id > last_tx_id; a deleted or edited row
+-- (count or fingerprint mismatch) or a back-dated one (date < last_tx_date)
+-- triggers a full rebuild of the account.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS `cash_balance_checkpoint` (
+  `broker_account_id` int(11) NOT NULL,
+  `last_tx_id` int(11) NOT NULL,
+  `last_tx_date` datetime NOT NULL,
+  `tx_count` int(11) NOT NULL,
+  `fingerprint` bigint(20) unsigned NOT NULL DEFAULT 0,
+  `balance` decimal(14,2) NOT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`broker_account_id`),
+  CONSTRAINT `fk_cash_balance_checkpoint_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,89 @@
+-- =====================================================
+-- Materialized running cash balance
+--
+-- cash_running_balance: balance of the broker account right after each
+-- cash_transaction row, in (date, id) order. Kept up to date by the triggers
+-- below on every INSERT / UPDATE / DELETE of cash_transaction, whatever the
+-- writer (web API, scripts); a back-dated row shifts the balances after it.
+-- "Balance as of X" is an indexed lookup (lib.cash.balance_as_of).
+-- Cash effect = the signed amount: every type of the cash_transaction.type
+-- ENUM counts as stored, the rule of lib.cash.CASH_EFFECTS.
+-- Rebuild from any point: python3 -m app.rebuild_cash_running_balance
+-- With binary logging on, creating triggers needs log_bin_trust_function_creators=1.
+-- Idempotent: safe to run again (the backfill recomputes every row).
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS `cash_running_balance` (
+  `transaction_id` int(11) NOT NULL,
+  `broker_account_id` int(11) NOT NULL,
+  `date` datetime NOT NULL,
+  `balance` decimal(14,2) NOT NULL,
+  PRIMARY KEY (`transaction_id`),
+  KEY `idx_cash_running_balance_account_date` (`broker_account_id`,`date`,`transaction_id`),
+  CONSTRAINT `fk_cash_running_balance_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DROP TRIGGER IF EXISTS `trg_cash_transaction_running_ai`;
+DROP TRIGGER IF EXISTS `trg_cash_transaction_running_au`;
+DROP TRIGGER IF EXISTS `trg_cash_transaction_running_ad`;
+
+DELIMITER ;;
+CREATE TRIGGER `trg_cash_transaction_running_ai` AFTER INSERT ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DECLARE v_effect DECIMAL(14,2);
+  DECLARE v_prev DECIMAL(14,2);
+  SET v_effect = NEW.amount;
+  UPDATE cash_running_balance SET balance = balance + v_effect
+     WHERE broker_account_id = NEW.broker_account_id
+       AND (date > NEW.date OR (date = NEW.date AND transaction_id > NEW.id));
+  SET v_prev = (SELECT r.balance FROM cash_running_balance r
+                 WHERE r.broker_account_id = NEW.broker_account_id
+                   AND (r.date < NEW.date OR (r.date = NEW.date AND r.transaction_id < NEW.id))
+                 ORDER BY r.date DESC, r.transaction_id DESC LIMIT 1);
+  INSERT INTO cash_running_balance (transaction_id, broker_account_id, date, balance)
+  VALUES (NEW.id, NEW.broker_account_id, NEW.date, COALESCE(v_prev, 0) + v_effect);
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_running_au` AFTER UPDATE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DECLARE v_effect DECIMAL(14,2);
+  DECLARE v_prev DECIMAL(14,2);
+  IF NOT (NEW.amount <=> OLD.amount AND NEW.date <=> OLD.date
+          AND NEW.broker_account_id <=> OLD.broker_account_id) THEN
+    SET v_effect = OLD.amount;
+    DELETE FROM cash_running_balance WHERE transaction_id = OLD.id;
+    UPDATE cash_running_balance SET balance = balance - v_effect
+       WHERE broker_account_id = OLD.broker_account_id
+         AND (date > OLD.date OR (date = OLD.date AND transaction_id > OLD.id));
+    SET v_effect = NEW.amount;
+    UPDATE cash_running_balance SET balance = balance + v_effect
+       WHERE broker_account_id = NEW.broker_account_id
+         AND (date > NEW.date OR (date = NEW.date AND transaction_id > NEW.id));
+    SET v_prev = (SELECT r.balance FROM cash_running_balance r
+                   WHERE r.broker_account_id = NEW.broker_account_id
+                     AND (r.date < NEW.date OR (r.date = NEW.date AND r.transaction_id < NEW.id))
+                   ORDER BY r.date DESC, r.transaction_id DESC LIMIT 1);
+    INSERT INTO cash_running_balance (transaction_id, broker_account_id, date, balance)
+    VALUES (NEW.id, NEW.broker_account_id, NEW.date, COALESCE(v_prev, 0) + v_effect);
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_running_ad` AFTER DELETE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DECLARE v_effect DECIMAL(14,2);
+  SET v_effect = OLD.amount;
+  DELETE FROM cash_running_balance WHERE transaction_id = OLD.id;
+  UPDATE cash_running_balance SET balance = balance - v_effect
+     WHERE broker_account_id = OLD.broker_account_id
+       AND (date > OLD.date OR (date = OLD.date AND transaction_id > OLD.id));
+END;;
+DELIMITER ;
+
+INSERT INTO `cash_running_balance` (transaction_id, broker_account_id, date, balance)
+SELECT t.id, t.broker_account_id, t.date,
+       SUM(t.amount) OVER (PARTITION BY t.broker_account_id ORDER BY t.date, t.id ROWS UNBOUNDED PRECEDING)
+FROM cash_transaction t
+ON DUPLICATE KEY UPDATE
+    broker_account_id = VALUES(broker_account_id),
+    date = VALUES(date),
+    balance = VALUES(balance);
@@ -0,0 +1,44 @@
+-- =====================================================
+-- Invalidate cash balance watermarks on history changes
+--
+-- recalc_cash_balances --incremental trusts cash_balance_checkpoint without
+-- scanning the rows below the watermark. The triggers below delete the
+-- checkpoint of an account (its next run is a full rebuild) when one of its
+-- cash_transaction rows at or below last_tx_id is edited or deleted, or when
+-- a row dated before last_tx_date is inserted (back-dated). Rows after the
+-- watermark do not touch it. --verify still checks the whole history.
+-- Needs several triggers per table event (MariaDB >= 10.2.3, MySQL >= 5.7.2).
+-- With binary logging on, creating triggers needs log_bin_trust_function_creators=1.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+DROP TRIGGER IF EXISTS `trg_cash_transaction_checkpoint_ai`;
+DROP TRIGGER IF EXISTS `trg_cash_transaction_checkpoint_au`;
+DROP TRIGGER IF EXISTS `trg_cash_transaction_checkpoint_ad`;
+
+DELIMITER ;;
+CREATE TRIGGER `trg_cash_transaction_checkpoint_ai` AFTER INSERT ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DELETE FROM cash_balance_checkpoint
+   WHERE broker_account_id = NEW.broker_account_id
+     AND (NEW.id <= last_tx_id OR NEW.date < last_tx_date);
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_checkpoint_au` AFTER UPDATE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  IF NOT (NEW.id <=> OLD.id AND NEW.amount <=> OLD.amount AND NEW.type <=> OLD.type
+          AND NEW.date <=> OLD.date AND NEW.broker_account_id <=> OLD.broker_account_id) THEN
+    DELETE FROM cash_balance_checkpoint
+     WHERE (broker_account_id = OLD.broker_account_id AND OLD.id <= last_tx_id)
+        OR (broker_account_id = NEW.broker_account_id
+            AND (NEW.id <= last_tx_id OR NEW.date < last_tx_date));
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_checkpoint_ad` AFTER DELETE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DELETE FROM cash_balance_checkpoint
+   WHERE broker_account_id = OLD.broker_account_id
+     AND OLD.id <= last_tx_id;
+END;;
+DELIMITER ;
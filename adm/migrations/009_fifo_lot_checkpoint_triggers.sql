@@ -0,0 +1,66 @@
+-- =====================================================
+-- Invalidate FIFO lot checkpoints on order history changes
+--
+-- update_portfolio_snapshot resumes fifo_lot_checkpoint without scanning the
+-- orders before it. The triggers below delete the checkpoint of a broker
+-- account and instrument (the pair is replayed from its first order on the
+-- next run) when an effective order (status 'ACTIVE', settled) at or before
+-- its (last_trade_date, last_order_id) is inserted, edited or deleted;
+-- cancelling or settling such an order counts as an edit. Later orders do
+-- not touch it. --verify-lots still checks the whole history.
+-- Needs several triggers per table event (MariaDB >= 10.2.3, MySQL >= 5.7.2).
+-- With binary logging on, creating triggers needs log_bin_trust_function_creators=1.
+-- Idempotent: safe to run again.
+-- =====================================================
+
+DROP TRIGGER IF EXISTS `trg_order_transaction_checkpoint_ai`;
+DROP TRIGGER IF EXISTS `trg_order_transaction_checkpoint_au`;
+DROP TRIGGER IF EXISTS `trg_order_transaction_checkpoint_ad`;
+
+DELIMITER ;;
+CREATE TRIGGER `trg_order_transaction_checkpoint_ai` AFTER INSERT ON `order_transaction` FOR EACH ROW
+BEGIN
+  IF NEW.status = 'ACTIVE' AND NEW.settled = 1 THEN
+    DELETE FROM fifo_lot_checkpoint
+     WHERE broker_account_id = NEW.broker_account_id
+       AND instrument_id = NEW.instrument_id
+       AND (NEW.trade_date < last_trade_date
+            OR (NEW.trade_date = last_trade_date AND NEW.id <= last_order_id));
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_order_transaction_checkpoint_au` AFTER UPDATE ON `order_transaction` FOR EACH ROW
+BEGIN
+  IF NOT (NEW.id <=> OLD.id AND NEW.order_type <=> OLD.order_type
+          AND NEW.quantity <=> OLD.quantity AND NEW.price <=> OLD.price
+          AND NEW.trade_date <=> OLD.trade_date AND NEW.status <=> OLD.status
+          AND NEW.settled <=> OLD.settled AND NEW.broker_account_id <=> OLD.broker_account_id
+          AND NEW.instrument_id <=> OLD.instrument_id) THEN
+    IF OLD.status = 'ACTIVE' AND OLD.settled = 1 THEN
+      DELETE FROM fifo_lot_checkpoint
+       WHERE broker_account_id = OLD.broker_account_id
+         AND instrument_id = OLD.instrument_id
+         AND (OLD.trade_date < last_trade_date
+              OR (OLD.trade_date = last_trade_date AND OLD.id <= last_order_id));
+    END IF;
+    IF NEW.status = 'ACTIVE' AND NEW.settled = 1 THEN
+      DELETE FROM fifo_lot_checkpoint
+       WHERE broker_account_id = NEW.broker_account_id
+         AND instrument_id = NEW.instrument_id
+         AND (NEW.trade_date < last_trade_date
+              OR (NEW.trade_date = last_trade_date AND NEW.id <= last_order_id));
+    END IF;
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_order_transaction_checkpoint_ad` AFTER DELETE ON `order_transaction` FOR EACH ROW
+BEGIN
+  IF OLD.status = 'ACTIVE' AND OLD.settled = 1 THEN
+    DELETE FROM fifo_lot_checkpoint
+     WHERE broker_account_id = OLD.broker_account_id
+       AND instrument_id = OLD.instrument_id
+       AND (OLD.trade_date < last_trade_date
+            OR (OLD.trade_date = last_trade_date AND OLD.id <= last_order_id));
+  END IF;
+END;;
+DELIMITER ;
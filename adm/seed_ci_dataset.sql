@@ -84,6 +84,68 @@ UNLOCK TABLES;
 COMMIT;
 SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
 
+--
+-- Table structure for table `cash_balance_checkpoint`
+--
+
+DROP TABLE IF EXISTS `cash_balance_checkpoint`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `cash_balance_checkpoint` (
+  `broker_account_id` int(11) NOT NULL,
+  `last_tx_id` int(11) NOT NULL,
+  `last_tx_date` datetime NOT NULL,
+  `tx_count` int(11) NOT NULL,
+  `fingerprint` bigint(20) unsigned NOT NULL DEFAULT 0,
+  `balance` decimal(14,2) NOT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`broker_account_id`),
+  CONSTRAINT `fk_cash_balance_checkpoint_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `cash_balance_checkpoint`
+--
+
+SET @OLD_AUTOCOMMIT=@@AUTOCOMMIT, @@AUTOCOMMIT=0;
+LOCK TABLES `cash_balance_checkpoint` WRITE;
+/*!40000 ALTER TABLE `cash_balance_checkpoint` DISABLE KEYS */;
+/*!40000 ALTER TABLE `cash_balance_checkpoint` ENABLE KEYS */;
+UNLOCK TABLES;
+COMMIT;
+SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
+
+--
+-- Table structure for table `cash_running_balance`
+--
+
+DROP TABLE IF EXISTS `cash_running_balance`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `cash_running_balance` (
+  `transaction_id` int(11) NOT NULL,
+  `broker_account_id` int(11) NOT NULL,
+  `date` datetime NOT NULL,
+  `balance` decimal(14,2) NOT NULL,
+  PRIMARY KEY (`transaction_id`),
+  KEY `idx_cash_running_balance_account_date` (`broker_account_id`,`date`,`transaction_id`),
+  CONSTRAINT `fk_cash_running_balance_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `cash_running_balance`
+--
+
+SET @OLD_AUTOCOMMIT=@@AUTOCOMMIT, @@AUTOCOMMIT=0;
+LOCK TABLES `cash_running_balance` WRITE;
+/*!40000 ALTER TABLE `cash_running_balance` DISABLE KEYS */;
+/*!40000 ALTER TABLE `cash_running_balance` ENABLE KEYS */;
+UNLOCK TABLES;
+COMMIT;
+SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
+
 --
 -- Table structure for table `cash_transaction`
 --
@@ -117,6 +179,83 @@ UNLOCK TABLES;
 COMMIT;
 SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
 
+DELIMITER ;;
+CREATE TRIGGER `trg_cash_transaction_running_ai` AFTER INSERT ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DECLARE v_effect DECIMAL(14,2);
+  DECLARE v_prev DECIMAL(14,2);
+  SET v_effect = NEW.amount;
+  UPDATE cash_running_balance SET balance = balance + v_effect
+     WHERE broker_account_id = NEW.broker_account_id
+       AND (date > NEW.date OR (date = NEW.date AND transaction_id > NEW.id));
+  SET v_prev = (SELECT r.balance FROM cash_running_balance r
+                 WHERE r.broker_account_id = NEW.broker_account_id
+                   AND (r.date < NEW.date OR (r.date = NEW.date AND r.transaction_id < NEW.id))
+                 ORDER BY r.date DESC, r.transaction_id DESC LIMIT 1);
+  INSERT INTO cash_running_balance (transaction_id, broker_account_id, date, balance)
+  VALUES (NEW.id, NEW.broker_account_id, NEW.date, COALESCE(v_prev, 0) + v_effect);
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_running_au` AFTER UPDATE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DECLARE v_effect DECIMAL(14,2);
+  DECLARE v_prev DECIMAL(14,2);
+  IF NOT (NEW.amount <=> OLD.amount AND NEW.date <=> OLD.date
+          AND NEW.broker_account_id <=> OLD.broker_account_id) THEN
+    SET v_effect = OLD.amount;
+    DELETE FROM cash_running_balance WHERE transaction_id = OLD.id;
+    UPDATE cash_running_balance SET balance = balance - v_effect
+       WHERE broker_account_id = OLD.broker_account_id
+         AND (date > OLD.date OR (date = OLD.date AND transaction_id > OLD.id));
+    SET v_effect = NEW.amount;
+    UPDATE cash_running_balance SET balance = balance + v_effect
+       WHERE broker_account_id = NEW.broker_account_id
+         AND (date > NEW.date OR (date = NEW.date AND transaction_id > NEW.id));
+    SET v_prev = (SELECT r.balance FROM cash_running_balance r
+                   WHERE r.broker_account_id = NEW.broker_account_id
+                     AND (r.date < NEW.date OR (r.date = NEW.date AND r.transaction_id < NEW.id))
+                   ORDER BY r.date DESC, r.transaction_id DESC LIMIT 1);
+    INSERT INTO cash_running_balance (transaction_id, broker_account_id, date, balance)
+    VALUES (NEW.id, NEW.broker_account_id, NEW.date, COALESCE(v_prev, 0) + v_effect);
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_running_ad` AFTER DELETE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DECLARE v_effect DECIMAL(14,2);
+  SET v_effect = OLD.amount;
+  DELETE FROM cash_running_balance WHERE transaction_id = OLD.id;
+  UPDATE cash_running_balance SET balance = balance - v_effect
+     WHERE broker_account_id = OLD.broker_account_id
+       AND (date > OLD.date OR (date = OLD.date AND transaction_id > OLD.id));
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_checkpoint_ai` AFTER INSERT ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DELETE FROM cash_balance_checkpoint
+   WHERE broker_account_id = NEW.broker_account_id
+     AND (NEW.id <= last_tx_id OR NEW.date < last_tx_date);
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_checkpoint_au` AFTER UPDATE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  IF NOT (NEW.id <=> OLD.id AND NEW.amount <=> OLD.amount AND NEW.type <=> OLD.type
+          AND NEW.date <=> OLD.date AND NEW.broker_account_id <=> OLD.broker_account_id) THEN
+    DELETE FROM cash_balance_checkpoint
+     WHERE (broker_account_id = OLD.broker_account_id AND OLD.id <= last_tx_id)
+        OR (broker_account_id = NEW.broker_account_id
+            AND (NEW.id <= last_tx_id OR NEW.date < last_tx_date));
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_cash_transaction_checkpoint_ad` AFTER DELETE ON `cash_transaction` FOR EACH ROW
+BEGIN
+  DELETE FROM cash_balance_checkpoint
+   WHERE broker_account_id = OLD.broker_account_id
+     AND OLD.id <= last_tx_id;
+END;;
+DELIMITER ;
+
 --
 -- Table structure for table `daily_price`
 --
@@ -189,6 +328,43 @@ UNLOCK TABLES;
 COMMIT;
 SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
 
+--
+-- Table structure for table `fifo_lot_checkpoint`
+--
+
+DROP TABLE IF EXISTS `fifo_lot_checkpoint`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `fifo_lot_checkpoint` (
+  `broker_account_id` int(11) NOT NULL,
+  `instrument_id` int(11) NOT NULL,
+  `last_trade_date` datetime NOT NULL,
+  `last_order_id` bigint(20) NOT NULL,
+  `order_count` int(11) NOT NULL,
+  `fingerprint` bigint(20) unsigned NOT NULL,
+  `position` decimal(16,4) NOT NULL,
+  `realized_pl` decimal(24,8) NOT NULL,
+  `lots` longtext NOT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`broker_account_id`,`instrument_id`),
+  KEY `fk_fifo_lot_checkpoint_instrument` (`instrument_id`),
+  CONSTRAINT `fk_fifo_lot_checkpoint_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_fifo_lot_checkpoint_instrument` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `fifo_lot_checkpoint`
+--
+
+SET @OLD_AUTOCOMMIT=@@AUTOCOMMIT, @@AUTOCOMMIT=0;
+LOCK TABLES `fifo_lot_checkpoint` WRITE;
+/*!40000 ALTER TABLE `fifo_lot_checkpoint` DISABLE KEYS */;
+/*!40000 ALTER TABLE `fifo_lot_checkpoint` ENABLE KEYS */;
+UNLOCK TABLES;
+COMMIT;
+SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
+
 --
 -- Table structure for table `instrument`
 --
@@ -248,6 +424,7 @@ CREATE TABLE `order_transaction` (
   PRIMARY KEY (`id`),
   KEY `instrument_id` (`instrument_id`),
   KEY `fk_order_tx_broker_account` (`broker_account_id`),
+  KEY `idx_order_tx_effective` (`broker_account_id`,`status`,`settled`,`trade_date`),
   CONSTRAINT `fk_order_tx_broker_account` FOREIGN KEY (`broker_account_id`) REFERENCES `broker_account` (`id`) ON DELETE CASCADE,
   CONSTRAINT `order_transaction_ibfk_2` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=283 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -265,6 +442,54 @@ UNLOCK TABLES;
 COMMIT;
 SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
 
+DELIMITER ;;
+CREATE TRIGGER `trg_order_transaction_checkpoint_ai` AFTER INSERT ON `order_transaction` FOR EACH ROW
+BEGIN
+  IF NEW.status = 'ACTIVE' AND NEW.settled = 1 THEN
+    DELETE FROM fifo_lot_checkpoint
+     WHERE broker_account_id = NEW.broker_account_id
+       AND instrument_id = NEW.instrument_id
+       AND (NEW.trade_date < last_trade_date
+            OR (NEW.trade_date = last_trade_date AND NEW.id <= last_order_id));
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_order_transaction_checkpoint_au` AFTER UPDATE ON `order_transaction` FOR EACH ROW
+BEGIN
+  IF NOT (NEW.id <=> OLD.id AND NEW.order_type <=> OLD.order_type
+          AND NEW.quantity <=> OLD.quantity AND NEW.price <=> OLD.price
+          AND NEW.trade_date <=> OLD.trade_date AND NEW.status <=> OLD.status
+          AND NEW.settled <=> OLD.settled AND NEW.broker_account_id <=> OLD.broker_account_id
+          AND NEW.instrument_id <=> OLD.instrument_id) THEN
+    IF OLD.status = 'ACTIVE' AND OLD.settled = 1 THEN
+      DELETE FROM fifo_lot_checkpoint
+       WHERE broker_account_id = OLD.broker_account_id
+         AND instrument_id = OLD.instrument_id
+         AND (OLD.trade_date < last_trade_date
+              OR (OLD.trade_date = last_trade_date AND OLD.id <= last_order_id));
+    END IF;
+    IF NEW.status = 'ACTIVE' AND NEW.settled = 1 THEN
+      DELETE FROM fifo_lot_checkpoint
+       WHERE broker_account_id = NEW.broker_account_id
+         AND instrument_id = NEW.instrument_id
+         AND (NEW.trade_date < last_trade_date
+              OR (NEW.trade_date = last_trade_date AND NEW.id <= last_order_id));
+    END IF;
+  END IF;
+END;;
+
+CREATE TRIGGER `trg_order_transaction_checkpoint_ad` AFTER DELETE ON `order_transaction` FOR EACH ROW
+BEGIN
+  IF OLD.status = 'ACTIVE' AND OLD.settled = 1 THEN
+    DELETE FROM fifo_lot_checkpoint
+     WHERE broker_account_id = OLD.broker_account_id
+       AND instrument_id = OLD.instrument_id
+       AND (OLD.trade_date < last_trade_date
+            OR (OLD.trade_date = last_trade_date AND OLD.id <= last_order_id));
+  END IF;
+END;;
+DELIMITER ;
+
 --
 -- Table structure for table `portfolio_snapshot`
 --
@@ -300,6 +525,50 @@ UNLOCK TABLES;
 COMMIT;
 SET AUTOCOMMIT=@OLD_AUTOCOMMIT;
 
+--
+-- Table structure for table `price_bar_1h`
+--
+
+DROP TABLE IF EXISTS `price_bar_1h`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `price_bar_1h` (
+  `instrument_id` int(11) NOT NULL,
+  `bar_start` datetime NOT NULL,
+  `open_price` decimal(12,4) NOT NULL,
+  `high_price` decimal(12,4) NOT NULL,
+  `low_price` decimal(12,4) NOT NULL,
+  `close_price` decimal(12,4) NOT NULL,
+  `tick_count` int(11) NOT NULL DEFAULT 0,
+  `first_at` datetime NOT NULL,
+  `last_at` datetime NOT NULL,
+  PRIMARY KEY (`instrument_id`,`bar_start`),
+  CONSTRAINT `price_bar_1h_ibfk_1` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `price_bar_5m`
+--
+
+DROP TABLE IF EXISTS `price_bar_5m`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `price_bar_5m` (
+  `instrument_id` int(11) NOT NULL,
+  `bar_start` datetime NOT NULL,
+  `open_price` decimal(12,4) NOT NULL,
+  `high_price` decimal(12,4) NOT NULL,
+  `low_price` decimal(12,4) NOT NULL,
+  `close_price` decimal(12,4) NOT NULL,
+  `tick_count` int(11) NOT NULL DEFAULT 0,
+  `first_at` datetime NOT NULL,
+  `last_at` datetime NOT NULL,
+  PRIMARY KEY (`instrument_id`,`bar_start`),
+  CONSTRAINT `price_bar_5m_ibfk_1` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `realtime_price`
 --
@@ -316,6 +585,8 @@ CREATE TABLE `realtime_price` (
   `capital_exchanged_percent` decimal(5,2) DEFAULT NULL COMMENT 'Percentage of capital exchanged (from source HTML)',
   PRIMARY KEY (`id`),
   KEY `instrument_id` (`instrument_id`),
+  KEY `idx_realtime_price_instrument_captured` (`instrument_id`,`captured_at`),
+  KEY `idx_realtime_price_captured_at` (`captured_at`),
   CONSTRAINT `realtime_price_ibfk_1` FOREIGN KEY (`instrument_id`) REFERENCES `instrument` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=88987 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
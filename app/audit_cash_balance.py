@@ -9,17 +9,24 @@ Purpose:
 - Recompute the running cash balance from cash_transaction table.
 - Compare with cash_account.current_balance.
 - Highlight any discrepancies (delta) and provide hints for corrections.
-- Optionally, verbose mode shows every transaction line-by-line.
+- Optionally, verbose mode shows every transaction line-by-line, with the
+  running balance stored in cash_running_balance (no replay).
+- The last stored running balance is checked against the recomputed balance;
+  --verify also replays the ledger in Python and flags every drifted row.
 - Reusable: can audit all brokers or a specific broker account.
 - Exportable: stdout or log file (future PDF/CSV extensions possible).
 - Supports dry-run mode (no DB writes).
+- Balances and per-type totals of all audited accounts come from ONE grouped
+  query (lib.cash: shared CASH_EFFECTS table evaluated as SUM(CASE ...));
+  rows are only read one by one for --super-verbose.
 
 Usage:
-  python3 -m app.audit_cash_balance [--dry-run] [--super-verbose] [--broker BROKER_ID] [--log LOG_FILE]
+  python3 -m app.audit_cash_balance [--dry-run] [--super-verbose] [--verify] [--broker BROKER_ID] [--log LOG_FILE]
 
 Options:
   --dry-run        Simulate without changing DB
   --super-verbose  Show every transaction line
+  --verify         Replay the ledger and compare every stored running balance
   --broker         Filter on specific broker_account_id
   --log            Output to a log file
 """
@@ -29,14 +36,16 @@ from decimal import Decimal
 from lib.config import ConfigManager
 from lib.logger import LoggerManager
 from lib.db import DatabaseConnection
+from lib.cash import CASH_EFFECTS, balance_as_of, cash_effect, load_cash_totals
 
 
 class CashAudit:
-    def __init__(self, config, logger, dry_run=False, super_verbose=False, broker_filter=None):
+    def __init__(self, config, logger, dry_run=False, super_verbose=False, broker_filter=None, verify=False):
         self.config = config
         self.logger = logger
         self.dry_run = dry_run
         self.super_verbose = super_verbose
+        self.verify = verify
         self.broker_filter = broker_filter
 
         self.db = DatabaseConnection(
@@ -47,12 +56,13 @@ class CashAudit:
             port=int(config.get("DB_PORT", 3306))
         )
         self.db.connect()
+        self.chunk_size = config.get_int("AUDIT_FETCH_CHUNK", 1000)
 
     def fetch_brokers(self):
-        sql = "SELECT id, name, current_balance FROM cash_account"
+        sql = "SELECT broker_account_id AS id, name, current_balance FROM cash_account"
         params = ()
         if self.broker_filter:
-            sql += " WHERE id = %s"
+            sql += " WHERE broker_account_id = %s"
             params = (self.broker_filter,)
         with self.db.cursor() as cur:
             cur.execute(sql, params)
@@ -60,56 +70,64 @@ class CashAudit:
 
     def fetch_cash_transactions(self, broker_id):
         sql = """
-            SELECT date, type, amount, comment
-            FROM cash_transaction
-            WHERE broker_account_id = %s
-            ORDER BY date ASC
+            SELECT t.date, t.type, t.amount, t.comment, r.balance AS stored_balance
+            FROM cash_transaction t
+            LEFT JOIN cash_running_balance r ON r.transaction_id = t.id
+            WHERE t.broker_account_id = %s
+            ORDER BY t.date ASC, t.id ASC
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql, (broker_id,))
-            return cur.fetchall()
+        return self.db.stream(sql, (broker_id,), self.chunk_size)
 
     def compute_impact(self, ttype, amount):
-        """Compute cash impact per transaction type."""
-        if ttype in ("DEPOSIT", "DIVIDEND", "SELL"):
-            return amount
-        elif ttype in ("BUY", "WITHDRAWAL"):
-            return -amount
-        elif ttype == "ADJUSTMENT":
-            return -amount  # Reflect the adjustment
-        else:
+        """Compute cash impact per transaction type (lib.cash.CASH_EFFECTS)."""
+        if ttype not in CASH_EFFECTS:
             self.logger.warning(f"Unhandled transaction type: {ttype}")
-            return Decimal("0.0")
+        return cash_effect(ttype, amount)
+
+    def fetch_cash_totals(self):
+        """Balance and per-type totals of every account, one grouped query."""
+        if self.broker_filter:
+            return load_cash_totals(self.db, where="WHERE t.broker_account_id = %s",
+                                    params=(self.broker_filter,))
+        return load_cash_totals(self.db)
 
-    def audit_broker(self, broker):
+    def audit_broker(self, broker, cash_totals=None):
         broker_id = broker["id"]
         broker_name = broker["name"]
         persisted_balance = Decimal(broker["current_balance"])
 
         self.logger.info(f"\n--- Auditing broker '{broker_name}' (ID={broker_id}) ---")
 
-        transactions = self.fetch_cash_transactions(broker_id)
-        running_balance = Decimal("0.0")
-        totals = {
-            "DEPOSIT": Decimal("0.0"),
-            "DIVIDEND": Decimal("0.0"),
-            "SELL": Decimal("0.0"),
-            "BUY": Decimal("0.0"),
-            "WITHDRAWAL": Decimal("0.0"),
-            "ADJUSTMENT": Decimal("0.0")
-        }
-
-        for t in transactions:
-            date = t["date"]
-            ttype = t["type"]
-            amount = Decimal(t["amount"])
-            impact = self.compute_impact(ttype, amount)
-            running_balance += impact
-            if ttype in totals:
-                totals[ttype] += amount
-
-            if self.super_verbose:
-                self.logger.info(f"{date} | {ttype:<10} | amount={amount:10.2f} | impact={impact:10.2f} | running_balance={running_balance:10.2f} | comment={t.get('comment')}")
+        if cash_totals is None:
+            cash_totals = self.fetch_cash_totals()
+        account = cash_totals.get(broker_id)
+        running_balance = account["balance"] if account else Decimal("0.0")
+        totals = dict(account["totals"]) if account else {t: Decimal("0.0") for t in CASH_EFFECTS}
+        if account and account["unknown_count"]:
+            self.logger.warning(f"{account['unknown_count']} transaction(s) of unhandled type ignored")
+
+        stored_balance = balance_as_of(self.db, broker_id)
+        if stored_balance != running_balance:
+            self.logger.warning(f"Stored running balance {stored_balance:.2f} differs, "
+                                f"run app.rebuild_cash_running_balance --broker {broker_id}")
+
+        if self.super_verbose or self.verify:
+            replayed = Decimal("0.0")
+            drifted = 0
+            for t in self.fetch_cash_transactions(broker_id):
+                amount = Decimal(t["amount"])
+                stored = t["stored_balance"]
+                if self.super_verbose:
+                    shown = f"{Decimal(stored):10.2f}" if stored is not None else f"{'missing':>10}"
+                    self.logger.info(f"{t['date']} | {t['type']:<10} | amount={amount:10.2f} | running_balance={shown} | comment={t.get('comment')}")
+                if self.verify:
+                    replayed += self.compute_impact(t["type"], amount)
+                    if stored is None or Decimal(stored) != replayed:
+                        drifted += 1
+                        self.logger.warning(f"{t['date']} | replayed={replayed:10.2f} | stored={stored}")
+            if drifted:
+                self.logger.error(f"{drifted} stored running balance(s) out of date, "
+                                  f"run app.rebuild_cash_running_balance --broker {broker_id}")
 
         delta = persisted_balance - running_balance
 
@@ -137,8 +155,9 @@ class CashAudit:
             return
 
         self.logger.info("=== CASH AUDIT STARTED ===")
+        cash_totals = self.fetch_cash_totals()
         for broker in brokers:
-            self.audit_broker(broker)
+            self.audit_broker(broker, cash_totals)
         self.logger.info("=== CASH AUDIT COMPLETED ===")
 
 
@@ -146,6 +165,8 @@ def main():
     parser = argparse.ArgumentParser(description="CashCue Cash Account Audit Tool")
     parser.add_argument("--dry-run", action="store_true", help="Simulate execution without DB writes")
     parser.add_argument("--super-verbose", action="store_true", help="Show each transaction line")
+    parser.add_argument("--verify", action="store_true",
+                        help="Replay the ledger and compare every stored running balance")
     parser.add_argument("--broker", type=int, help="Filter by broker_account_id")
     parser.add_argument("--log", type=str, help="Log file output")
     args = parser.parse_args()
@@ -157,7 +178,8 @@ def main():
         logger=logger,
         dry_run=args.dry_run,
         super_verbose=args.super_verbose,
-        broker_filter=args.broker
+        broker_filter=args.broker,
+        verify=args.verify
     )
     auditor.run()
 
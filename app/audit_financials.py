@@ -13,7 +13,11 @@ Features:
    - Recompute cash balances from `cash_account.initial_balance` and
      `cash_transaction` history
    - Handles all transaction types: BUY, SELL, DIVIDEND, DEPOSIT, WITHDRAWAL, FEES, ADJUSTMENT
-   - Computes line-by-line running balances
+     with the shared cash-effect table of lib.cash; balances and per-type
+     totals of all accounts come from ONE grouped SUM(CASE ...) query
+   - Lists every transaction with its running balance, read from the
+     materialized cash_running_balance table (super-verbeux mode); --verify
+     replays the ledger in Python and flags the stored balances that drifted
    - Shows totals per transaction type
    - Highlights inconsistencies with hints for manual investigation
 
@@ -21,6 +25,8 @@ Features:
    - Reads `order_transaction` per broker account
    - Separates BUY and SELL orders, calculates invested amounts, fees, and total flows
    - Compares computed portfolio positions against snapshots and cash balances
+   - Values open positions at their latest price (LatestPriceResolver: one
+     query for all instruments, cached across broker accounts)
    - Detects mismatches and provides explanatory messages
 
 3. RECONCILIATION
@@ -38,16 +44,30 @@ Features:
    - --lang LANG     : Output language, 'en' or 'fr'
    - --log FILE      : Write output to a log file
    - --super-verbose : Enable super-verbeux detailed audit
+   - --verify        : Replay the cash ledger and check every stored running balance
+   - --workers N     : Audit broker accounts in N processes, each on its own
+                       DB connection (default: AUDIT_WORKERS); the output of
+                       each account is captured and logged in account order
+   - --report FILE   : Merged per-account report (balances, deltas, per-type
+                       totals, positions) as JSON (with summary) or CSV
 
 Usage Example:
 -------------
 $ python3 -m app.audit_financials --super-verbose --lang en --log audit.log
+$ python3 -m app.audit_financials --workers 4 --report /var/lib/cashcue/audit.json
 
 Author: Pierre / OpenAI GPT-5-mini
 Date: 2026-02-06
 """
 
 import argparse
+import csv
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from decimal import Decimal
 import sys
@@ -55,17 +75,81 @@ import sys
 from lib.config import ConfigManager
 from lib.logger import LoggerManager
 from lib.db import DatabaseConnection
+from lib.prices import LatestPriceResolver, valuation_price
+from lib.cash import CASH_EFFECTS, balance_as_of, cash_effect, load_cash_totals
+
+# -------------------------------
+# RESULT CLASS
+# -------------------------------
+class AccountAudit:
+    """
+    Structured result of the audit of one broker account, filled by
+    FinancialAuditor.audit_cash() and audit_orders().
+
+    status: OK | INCONSISTENT (cash delta) | NO_CASH_ACCOUNT | ERROR
+    """
+
+    FIELDS = (
+        "broker_account_id", "name", "status", "error",
+        "initial_balance", "recomputed_cash", "persisted_cash", "cash_delta",
+        "unknown_count", "cash_totals",
+        "total_buy", "total_sell", "total_fees", "positions", "market_value",
+        "log",
+    )
+    SCALARS = tuple(f for f in FIELDS if f not in ("cash_totals", "positions", "log"))
+    __slots__ = FIELDS
+
+    def __init__(self, broker_account_id, name):
+        self.broker_account_id = broker_account_id
+        self.name = name
+        self.status = "OK"
+        self.error = None
+        self.initial_balance = None
+        self.recomputed_cash = None
+        self.persisted_cash = None
+        self.cash_delta = None
+        self.unknown_count = 0
+        self.cash_totals = {}
+        self.total_buy = Decimal("0.0")
+        self.total_sell = Decimal("0.0")
+        self.total_fees = Decimal("0.0")
+        self.positions = {}  # instrument_id -> open quantity
+        self.market_value = Decimal("0.0")
+        self.log = ""  # audit text captured by a worker process
+
+    def to_dict(self):
+        """JSON-ready dict (Decimals as strings, without the captured log)."""
+        def value(v):
+            if isinstance(v, Decimal):
+                return str(v)
+            if isinstance(v, dict):
+                return {str(k): value(x) for k, x in v.items()}
+            return v
+        return {f: value(getattr(self, f)) for f in self.FIELDS if f != "log"}
+
+    @classmethod
+    def csv_header(cls):
+        return list(cls.SCALARS) + [f"total_{t}" for t in CASH_EFFECTS] + ["open_positions"]
+
+    def csv_row(self):
+        row = self.to_dict()
+        return ([row[f] for f in self.SCALARS]
+                + [row["cash_totals"].get(t) for t in CASH_EFFECTS]
+                + [";".join(f"{i}:{q}" for i, q in row["positions"].items())])
+
 
 # -------------------------------
 # AUDITOR CLASS
 # -------------------------------
 class FinancialAuditor:
-    def __init__(self, config, logger, lang="en", super_verbose=False, dry_run=False):
+    def __init__(self, config, logger, lang="en", super_verbose=False, dry_run=False, workers=1, verify=False):
         self.config = config
         self.logger = logger
         self.lang = lang
         self.super_verbose = super_verbose
+        self.verify = verify
         self.dry_run = dry_run
+        self.workers = max(1, workers)
 
         # DB connection
         self.db = DatabaseConnection(
@@ -76,6 +160,10 @@ class FinancialAuditor:
             port=int(config.get("DB_PORT", 3306))
         )
         self.db.connect()
+        self.prices = LatestPriceResolver(self.db)
+        self.chunk_size = config.get_int("AUDIT_FETCH_CHUNK", 1000)
+        self.cash_totals = None  # {broker_account_id: totals}, loaded once (see fetch_cash_totals)
+        self.broker_ids = None  # worker shard: limits the grouped cash query to these accounts
 
     # -------------------------------
     # TRANSLATION UTILS
@@ -99,26 +187,47 @@ class FinancialAuditor:
             return cur.fetchone()
 
     def fetch_cash_transactions(self, broker_id):
+        """
+        Generator over the account's cash transactions, streamed from the
+        server in chunks of AUDIT_FETCH_CHUNK rows.
+        """
         sql = """
-            SELECT date, amount, type, reference_id, comment
-            FROM cash_transaction
-            WHERE broker_account_id=%s
-            ORDER BY date ASC, id ASC
+            SELECT t.date, t.amount, t.type, t.reference_id, t.comment, r.balance AS stored_balance
+            FROM cash_transaction t
+            LEFT JOIN cash_running_balance r ON r.transaction_id = t.id
+            WHERE t.broker_account_id=%s
+            ORDER BY t.date ASC, t.id ASC
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql, (broker_id,))
-            return cur.fetchall()
+        return self.db.stream(sql, (broker_id,), self.chunk_size)
+
+    def fetch_cash_totals(self, broker_id):
+        """
+        Balance effect and per-type totals of one account, from one grouped
+        query run for all accounts on first use.
+        """
+        if self.cash_totals is None:
+            if self.broker_ids:
+                self.cash_totals = load_cash_totals(
+                    self.db,
+                    where=f"WHERE t.broker_account_id IN ({', '.join(['%s'] * len(self.broker_ids))})",
+                    params=tuple(self.broker_ids),
+                )
+            else:
+                self.cash_totals = load_cash_totals(self.db)
+        return self.cash_totals.get(broker_id)
 
     def fetch_orders(self, broker_id):
+        """
+        Generator over the account's orders, streamed like
+        fetch_cash_transactions().
+        """
         sql = """
             SELECT instrument_id, order_type, quantity, price, fees, total_cost, trade_date, status
             FROM order_transaction
             WHERE broker_account_id=%s
             ORDER BY trade_date ASC, id ASC
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql, (broker_id,))
-            return cur.fetchall()
+        return self.db.stream(sql, (broker_id,), self.chunk_size)
 
     # -------------------------------
     # CASH COMPUTATION
@@ -127,18 +236,14 @@ class FinancialAuditor:
         """
         Returns the effect of a cash transaction on the cash balance.
         """
-        if ttype in ("DEPOSIT", "DIVIDEND", "SELL"):
-            return amount
-        elif ttype in ("BUY", "WITHDRAWAL", "FEES", "ADJUSTMENT"):
-            return -amount
-        else:
+        if ttype not in CASH_EFFECTS:
             self.logger.warning(f"Unknown cash transaction type: {ttype}")
-            return Decimal("0.0")
+        return cash_effect(ttype, amount)
 
     # -------------------------------
     # AUDIT METHODS
     # -------------------------------
-    def audit_cash(self, broker):
+    def audit_cash(self, broker, result):
         bname = broker["name"]
         self.logger.info("\n" + "="*70)
         self.logger.info(self.t(f"Broker account '{bname}' (ID={broker['id']})",
@@ -150,22 +255,45 @@ class FinancialAuditor:
         cash_acc = self.fetch_cash_account(broker["id"])
         if not cash_acc:
             self.logger.warning(self.t("No cash account found", "Pas de compte cash trouvé"))
+            result.status = "NO_CASH_ACCOUNT"
             return
 
         balance = Decimal(cash_acc["initial_balance"])
-        running_balance = balance
-        totals = {"DEPOSIT":0, "DIVIDEND":0, "SELL":0, "BUY":0, "WITHDRAWAL":0, "FEES":0, "ADJUSTMENT":0}
-
-        txs = self.fetch_cash_transactions(broker["id"])
-        for row in txs:
-            ttype = row["type"]
-            amount = Decimal(row["amount"])
-            impact = self.compute_cash_impact(ttype, amount)
-            running_balance += impact
-            totals[ttype] += impact
-
-            if self.super_verbose:
-                self.logger.info(f"{row['date']} | {ttype:<10} | amount={amount:>10} | impact={impact:>10} | running_balance={running_balance:>10} | comment={row.get('comment','')}")
+        account = self.fetch_cash_totals(broker["id"])
+        running_balance = balance + (account["balance"] if account else 0)
+        totals = account["totals"] if account else {t: Decimal("0.0") for t in CASH_EFFECTS}
+        if account and account["unknown_count"]:
+            self.logger.warning(self.t(f"{account['unknown_count']} transaction(s) of unknown type ignored",
+                                       f"{account['unknown_count']} transaction(s) de type inconnu ignorée(s)"))
+
+        # Stored running balances start at 0: the account balance adds initial_balance
+        stored_last = balance_as_of(self.db, broker["id"])
+        if account and stored_last != account["balance"]:
+            self.logger.warning(self.t(f"Stored running balance {stored_last:.2f} differs from the ledger "
+                                       f"{account['balance']:.2f}, run app.rebuild_cash_running_balance",
+                                       f"Solde courant stocké {stored_last:.2f} différent du journal "
+                                       f"{account['balance']:.2f}, lancer app.rebuild_cash_running_balance"))
+
+        if self.super_verbose or self.verify:
+            replayed = Decimal("0.0")
+            drifted = 0
+            for row in self.fetch_cash_transactions(broker["id"]):
+                ttype = row["type"]
+                amount = Decimal(row["amount"])
+                stored = row["stored_balance"]
+                if self.super_verbose:
+                    shown = balance + Decimal(stored) if stored is not None else "missing"
+                    self.logger.info(f"{row['date']} | {ttype:<10} | amount={amount:>10} | running_balance={shown:>10} | comment={row.get('comment','')}")
+                if self.verify:
+                    replayed += self.compute_cash_impact(ttype, amount)
+                    if stored is None or Decimal(stored) != replayed:
+                        drifted += 1
+                        self.logger.warning(f"{row['date']} | replayed={balance + replayed:>10} | stored={stored}")
+            if drifted:
+                self.logger.error(self.t(f"{drifted} stored running balance(s) out of date, "
+                                         f"run app.rebuild_cash_running_balance --broker {broker['id']}",
+                                         f"{drifted} solde(s) courant(s) stocké(s) périmé(s), "
+                                         f"lancer app.rebuild_cash_running_balance --broker {broker['id']}"))
 
         # Totals per type
         self.logger.info("-"*70)
@@ -182,19 +310,27 @@ class FinancialAuditor:
             self.logger.error(f"Delta               : {delta:.2f} ({self.t('INCONSISTENCY DETECTED','INCOHERENCE DETECTEE')})")
             self.logger.error(self.t("Hint: check missing cash_transaction or manual balance override",
                                      "Indice : vérifier les cash_transactions manquantes ou un ajustement manuel"))
+            result.status = "INCONSISTENT"
 
-    def audit_orders(self, broker):
+        result.initial_balance = balance
+        result.recomputed_cash = running_balance
+        result.persisted_cash = persisted
+        result.cash_delta = delta
+        result.unknown_count = account["unknown_count"] if account else 0
+        result.cash_totals = dict(totals)
+
+    def audit_orders(self, broker, result):
         self.logger.info("\n" + "-"*70)
         self.logger.info(self.t("[ORDERS / POSITIONS AUDIT]", "[AUDIT ORDRES / POSITIONS]"))
         self.logger.info("-"*70)
 
-        orders = self.fetch_orders(broker["id"])
         total_buy = Decimal("0.0")
         total_sell = Decimal("0.0")
         total_fees = Decimal("0.0")
         running_positions = {}
 
-        for o in orders:
+        # Streamed: the connection is free again once the loop has ended
+        for o in self.fetch_orders(broker["id"]):
             qty = Decimal(o["quantity"])
             total_cost = Decimal(o["total_cost"])
             fees = Decimal(o["fees"] or 0)
@@ -216,24 +352,178 @@ class FinancialAuditor:
         self.logger.info(f"Total FEES : {total_fees:.2f}")
         self.logger.info(f"Positions  : {running_positions}")
 
+        open_positions = {i: q for i, q in running_positions.items() if q != 0}
+        latest = self.prices.resolve(open_positions)
+        market_value = Decimal("0.0")
+        for instr, qty in open_positions.items():
+            price = valuation_price(latest[instr])
+            market_value += price * qty
+            if self.super_verbose:
+                self.logger.info(f"instr={instr} | qty={qty} | last_close={latest[instr].close} "
+                                 f"({latest[instr].close_date}) | last_tick={latest[instr].tick} "
+                                 f"({latest[instr].tick_at})")
+        self.logger.info(f"{self.t('Market value', 'Valeur de marché')} : {market_value:.2f}")
+
+        result.total_buy = total_buy
+        result.total_sell = total_sell
+        result.total_fees = total_fees
+        result.positions = open_positions
+        result.market_value = market_value
+
+    def audit_account(self, broker):
+        """
+        Cash and orders audit of one broker account. Errors are caught and
+        reported in the result, so one broken account does not stop the run.
+        """
+        result = AccountAudit(broker["id"], broker["name"])
+        try:
+            self.audit_cash(broker, result)
+            self.audit_orders(broker, result)
+        except Exception as e:
+            self.logger.error(f"Audit of broker account {broker['id']} failed: {e}")
+            result.status = "ERROR"
+            result.error = str(e)
+        return result
+
+    # -------------------------------
+    # PARALLEL EXECUTION
+    # -------------------------------
+    def audit_parallel(self, brokers):
+        """
+        Shard the broker accounts across self.workers processes, each on a
+        DB connection of its own. The audit text of every account is
+        captured by the worker and logged here in broker order, so the
+        output of concurrent accounts is never interleaved.
+        """
+        shards = [brokers[i::self.workers] for i in range(self.workers)]
+        shards = [shard for shard in shards if shard]
+        results = []
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                pool.submit(audit_account_shard, self.config, shard, self.lang, self.super_verbose,
+                            self.verify)
+                for shard in shards
+            ]
+            for worker, future in enumerate(futures, 1):
+                shard_results, pid, elapsed = future.result()
+                self.logger.info(f"Worker {worker} (pid {pid}): {len(shard_results)} accounts in {elapsed:.2f}s")
+                results.extend(shard_results)
+        results.sort(key=lambda r: r.broker_account_id)
+        for result in results:
+            for line in result.log.splitlines():
+                self.logger.info(line)
+        return results
+
+    # -------------------------------
+    # REPORT
+    # -------------------------------
+    @staticmethod
+    def summarize(results, elapsed):
+        return {
+            "accounts": len(results),
+            "ok": sum(r.status == "OK" for r in results),
+            "inconsistent": [r.broker_account_id for r in results if r.status == "INCONSISTENT"],
+            "no_cash_account": [r.broker_account_id for r in results if r.status == "NO_CASH_ACCOUNT"],
+            "errors": [r.broker_account_id for r in results if r.status == "ERROR"],
+            "total_abs_cash_delta": str(sum((abs(r.cash_delta) for r in results if r.cash_delta is not None),
+                                            Decimal("0.00"))),
+            "total_market_value": str(sum((r.market_value for r in results), Decimal("0.0"))),
+            "elapsed_seconds": round(elapsed, 2),
+        }
+
+    def write_report(self, path, results, summary):
+        """
+        Merged report of every account: JSON (accounts + summary) or CSV (one
+        row per account), chosen by the file extension.
+        """
+        if path.lower().endswith(".csv"):
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(AccountAudit.csv_header())
+            writer.writerows(r.csv_row() for r in results)
+            content = buf.getvalue()
+        else:
+            content = json.dumps({
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "summary": summary,
+                "accounts": [r.to_dict() for r in results],
+            }, indent=2, default=str)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        self.logger.info(self.t(f"Report written to {path}", f"Rapport écrit dans {path}"))
+
+    def log_summary(self, summary):
+        self.logger.info("-"*70)
+        self.logger.info(self.t("[SUMMARY]", "[RESUME]"))
+        self.logger.info(f"{self.t('Accounts audited', 'Comptes audités')} : {summary['accounts']} "
+                         f"(OK={summary['ok']})")
+        if summary["inconsistent"]:
+            self.logger.error(f"{self.t('Cash inconsistencies', 'Incohérences cash')} : {summary['inconsistent']} "
+                              f"(|delta| = {summary['total_abs_cash_delta']})")
+        if summary["no_cash_account"]:
+            self.logger.warning(f"{self.t('No cash account', 'Sans compte cash')} : {summary['no_cash_account']}")
+        if summary["errors"]:
+            self.logger.error(f"{self.t('Failed audits', 'Audits en échec')} : {summary['errors']}")
+        self.logger.info(f"{self.t('Total market value', 'Valeur de marché totale')} : {summary['total_market_value']}")
+        self.logger.info(f"{self.t('Duration', 'Durée')} : {summary['elapsed_seconds']}s")
+
     # -------------------------------
     # MAIN EXECUTION
     # -------------------------------
-    def run(self):
+    def run(self, report=None):
         self.logger.info("\n" + "="*70)
         self.logger.info(self.t("=== FINANCIAL AUDIT STARTED ===", "=== AUDIT FINANCIER DEMARRE ==="))
 
+        started = time.monotonic()
         brokers = self.fetch_brokers()
         if not brokers:
             self.logger.warning(self.t("No broker accounts found", "Aucun compte courtier trouvé"))
-            return
+            return []
 
-        for broker in brokers:
-            self.audit_cash(broker)
-            self.audit_orders(broker)
+        if self.workers > 1 and len(brokers) > 1:
+            results = self.audit_parallel(brokers)
+        else:
+            results = [self.audit_account(broker) for broker in brokers]
+
+        summary = self.summarize(results, time.monotonic() - started)
+        self.log_summary(summary)
+        if report:
+            self.write_report(report, results, summary)
 
         self.logger.info(self.t("=== FINANCIAL AUDIT COMPLETED ===", "=== AUDIT FINANCIER TERMINE ==="))
         self.logger.info("="*70 + "\n")
+        return results
+
+
+def audit_account_shard(config, brokers, lang, super_verbose, verify=False):
+    """
+    Worker process: audit a shard of broker accounts on a DB connection of
+    its own. The audit text of each account is captured into its result
+    (AccountAudit.log) instead of being written concurrently with the other
+    workers. Returns (results, pid, elapsed seconds).
+    """
+    started = time.monotonic()
+    buf = io.StringIO()
+    handler = logging.StreamHandler(buf)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger(f"cashcue.audit.{os.getpid()}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers = [handler]
+
+    auditor = FinancialAuditor(config, logger, lang=lang, super_verbose=super_verbose, verify=verify)
+    auditor.broker_ids = [b["id"] for b in brokers]
+    results = []
+    try:
+        for broker in brokers:
+            result = auditor.audit_account(broker)
+            result.log = buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            results.append(result)
+    finally:
+        auditor.db.close()
+    return results, os.getpid(), time.monotonic() - started
 
 
 # -------------------------------
@@ -245,6 +535,12 @@ def main():
     parser.add_argument("--lang", choices=["en","fr"], default="en", help="Output language")
     parser.add_argument("--super-verbose", action="store_true", help="Enable line-by-line audit")
     parser.add_argument("--log", type=str, help="Write output to log file")
+    parser.add_argument("--verify", action="store_true",
+                        help="Replay the cash ledger and check every stored running balance")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes auditing broker accounts concurrently (default: AUDIT_WORKERS)")
+    parser.add_argument("--report", type=str,
+                        help="Write the merged per-account report to FILE (.json or .csv)")
     args = parser.parse_args()
 
     config = ConfigManager("/etc/cashcue/cashcue.conf")
@@ -253,8 +549,10 @@ def main():
     else:
         logger = LoggerManager(config.get("LOG_FILE", "/var/log/cashcue/audit_financials.log")).get_logger()
 
-    auditor = FinancialAuditor(config, logger, lang=args.lang, super_verbose=args.super_verbose, dry_run=args.dry_run)
-    auditor.run()
+    workers = args.workers if args.workers is not None else config.get_int("AUDIT_WORKERS", 1)
+    auditor = FinancialAuditor(config, logger, lang=args.lang, super_verbose=args.super_verbose,
+                               dry_run=args.dry_run, workers=workers, verify=args.verify)
+    auditor.run(report=args.report)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+CashCue - Price Collection Scheduler (resident daemon)
+
+Replaces the `*/5 * * * *` cron line of update_realtime_prices with one
+long-running process that keeps the configuration, logger, HTTP session pool
+and MySQL connection warm between sweeps.
+
+Behaviour:
+- Polls realtime prices only during the exchange session
+  (MARKET_DAYS, MARKET_OPEN - MARKET_CLOSE, in MARKET_TIMEZONE)
+- Only ACTIVE instruments are polled, selected once per poll with their
+  held / watch-only flag (net quantities of order_transaction)
+- Held instruments use the cadence of their type in minutes
+  (SCHEDULER_CADENCES=STOCK:5,ETF:15 ; other types use REALTIME_UPDATE_INTERVAL);
+  watch-only instruments are polled at most every REALTIME_WATCH_INTERVAL minutes
+- At session close: one last sweep of every type, then DailyPriceUpdater for
+  the day and PortfolioSnapshotUpdater, in the same process
+- Outside sessions the process just sleeps until the next open
+- SIGTERM / SIGINT stop the loop; a sweep in progress still flushes its prices
+
+Usage:
+  python3 -m app.price_scheduler [--dry-run] [--async] [--stream] [--skip-unchanged]
+"""
+
+import argparse
+import signal
+import threading
+from datetime import datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.update_daily_price import DAILY_PRICE_SOURCE, DailyPriceUpdater
+from app.update_portfolio_snapshot import PortfolioSnapshotUpdater
+from app.update_realtime_prices import HTTP_CONCURRENCY, REALTIME_WATCH_INTERVAL, RealtimePriceUpdater
+from lib.config import ConfigManager
+from lib.db import DatabaseConnection
+from lib.logger import LoggerManager
+
+INSTRUMENT_TYPES = ("STOCK", "ETF", "BOND", "FUND", "OTHER")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Upper bound of one idle wait, so configuration of the next event is re-evaluated
+MAX_SLEEP_SECONDS = 60
+
+
+def parse_hhmm(value):
+    hours, minutes = value.strip().split(":")
+    return dtime(int(hours), int(minutes))
+
+
+def parse_days(value):
+    """'Mon,Tue,Wed,Thu,Fri' -> {0, 1, 2, 3, 4}"""
+    return {WEEKDAYS.index(day.strip()[:3].lower()) for day in value.split(",") if day.strip()}
+
+
+def parse_cadences(value, default_minutes):
+    """'STOCK:5,ETF:15' -> {'STOCK': 5, 'ETF': 15, 'BOND': default, ...}"""
+    cadences = {t: default_minutes for t in INSTRUMENT_TYPES}
+    for item in value.split(","):
+        if ":" in item:
+            typ, minutes = item.split(":", 1)
+            cadences[typ.strip().upper()] = int(minutes)
+    return cadences
+
+
+class PriceScheduler:
+    """
+    Resident loop driving realtime sweeps, and daily/snapshot rollups at close.
+    """
+
+    def __init__(self, config, logger, dry_run=False, async_mode=False, stream=False,
+                 skip_unchanged=False):
+        self.config = config
+        self.logger = logger
+        self.dry_run = dry_run
+        self.async_mode = async_mode
+
+        self.tz = ZoneInfo(config.get("MARKET_TIMEZONE", "Europe/Paris"))
+        self.open_time = parse_hhmm(config.get("MARKET_OPEN", "09:00"))
+        self.close_time = parse_hhmm(config.get("MARKET_CLOSE", "17:35"))
+        self.days = parse_days(config.get("MARKET_DAYS", "Mon,Tue,Wed,Thu,Fri"))
+        self.cadences = parse_cadences(
+            config.get("SCHEDULER_CADENCES", ""),
+            config.get_int("REALTIME_UPDATE_INTERVAL", 5)
+        )
+        self.watch_interval = config.get_int("REALTIME_WATCH_INTERVAL", REALTIME_WATCH_INTERVAL)
+
+        # One warm connection shared by the realtime and daily updaters
+        self.db = DatabaseConnection(
+            host=config.get("DB_HOST", "localhost"),
+            user=config.get("DB_USER"),
+            password=config.get("DB_PASS"),
+            database=config.get("DB_NAME"),
+            port=int(config.get("DB_PORT", 3306))
+        )
+        self.stop_event = threading.Event()
+        # The sweep checks stop_event between instruments (SIGTERM stays ours)
+        self.realtime = RealtimePriceUpdater(
+            self.db, logger, dry_run=dry_run, concurrency=HTTP_CONCURRENCY,
+            stream=stream, skip_unchanged=skip_unchanged, close_db=False,
+            stop_event=self.stop_event
+        )
+        self.daily = DailyPriceUpdater(self.db, logger, dry_run=dry_run, close_db=False,
+                                       source=DAILY_PRICE_SOURCE)
+        self.snapshot = None  # created on first close (opens its own connection)
+
+        self.next_poll = {}  # (type, held) -> next due time
+        self.closed_on = None
+
+    # ------------------------------------------------------------------
+    # Calendar
+    # ------------------------------------------------------------------
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def is_trading_day(self, now):
+        return now.weekday() in self.days
+
+    def in_session(self, now):
+        return self.is_trading_day(now) and self.open_time <= now.time() < self.close_time
+
+    def next_open(self, now):
+        day = now.date()
+        for _ in range(8):
+            candidate = datetime.combine(day, self.open_time, tzinfo=self.tz)
+            if candidate > now and candidate.weekday() in self.days:
+                return candidate
+            day += timedelta(days=1)
+        return now + timedelta(days=1)
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def cadence(self, typ, held):
+        minutes = self.cadences.get(typ, self.cadences["OTHER"])
+        return minutes if held else max(minutes, self.watch_interval)
+
+    def poll(self, now):
+        # Groups are re-read on every wake-up (at most MAX_SLEEP_SECONDS apart),
+        # even when none is due: a position opened since the last sweep starts
+        # its held cadence right away instead of after the slowest group
+        self.db.ping()
+        groups = {}
+        for instr in self.realtime.fetch_instruments():
+            groups.setdefault((instr["type"], instr["held"]), []).append(instr)
+        # Groups appear/disappear when positions are opened or closed
+        self.next_poll = {key: self.next_poll.get(key, now) for key in groups}
+
+        due = [key for key in groups if now >= self.next_poll[key]]
+        if not due:
+            return
+        self.logger.info(
+            "Realtime sweep for " + ", ".join(f"{typ} {'held' if held else 'watch'}" for typ, held in due)
+        )
+        self.realtime.run(async_mode=self.async_mode,
+                          instruments=[instr for key in due for instr in groups[key]])
+        for typ, held in due:
+            self.next_poll[(typ, held)] = now + timedelta(minutes=self.cadence(typ, held))
+
+    def close_session(self, now):
+        today = now.date()
+        self.closed_on = today  # never retried in a loop, even if a job fails
+        self.next_poll = {}
+        self.logger.info(f"=== Session closed ({today}): final sweep and daily rollups ===")
+        self.db.ping()
+        self.realtime.run(async_mode=self.async_mode)
+        self.daily.run(today)
+
+        if self.snapshot is None:
+            self.snapshot = PortfolioSnapshotUpdater(self.config, self.logger, self.dry_run)
+        else:
+            self.snapshot.db.ping()
+        self.snapshot.snapshot_date = today
+        self.snapshot.run()
+
+    # ------------------------------------------------------------------
+    # Main loop
+    # ------------------------------------------------------------------
+
+    def seconds_until_next_event(self, now):
+        if self.in_session(now):
+            close_at = datetime.combine(now.date(), self.close_time, tzinfo=self.tz)
+            events = [close_at] + list(self.next_poll.values())
+        else:
+            events = [self.next_open(now)]
+        wait = min(events) - now
+        return min(max(wait.total_seconds(), 1), MAX_SLEEP_SECONDS)
+
+    def stop(self, signum=None, frame=None):
+        self.logger.info("Stop requested, finishing current job...")
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.logger.info(
+            f"=== Price scheduler started: {self.open_time:%H:%M}-{self.close_time:%H:%M} "
+            f"{self.tz.key}, cadences={self.cadences}, dry_run={self.dry_run} ==="
+        )
+        try:
+            while not self.stop_event.is_set():
+                now = self.now()
+                try:
+                    if self.in_session(now):
+                        self.poll(now)
+                    elif (self.is_trading_day(now) and now.time() >= self.close_time
+                          and self.closed_on != now.date()):
+                        self.close_session(now)
+                except Exception as e:
+                    self.logger.error("Scheduled job failed: %s", e)
+                self.stop_event.wait(self.seconds_until_next_event(self.now()))
+        finally:
+            self.db.close()
+            if self.snapshot is not None:
+                self.snapshot.db.close()
+            self.logger.info("=== Price scheduler stopped ===")
+
+
+# ----------------------------------------------------------------------
+# ENTRY POINT
+# ----------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="CashCue Price Collection Scheduler")
+    parser.add_argument("--dry-run", action="store_true", help="Simulate execution without DB writes")
+    parser.add_argument("--async", dest="async_mode", action="store_true",
+                        help="Fetch instruments concurrently. Overrides config REALTIME_FETCH_MODE.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Streamed early-terminating page reads. Overrides config HTTP_STREAM.")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="Skip unchanged ticks. Overrides config REALTIME_SKIP_UNCHANGED.")
+    args = parser.parse_args()
+
+    config = ConfigManager("/etc/cashcue/cashcue.conf")
+    logger = LoggerManager(
+        config.get("LOG_FILE", "/var/log/cashcue/price_scheduler.log"),
+        config.get("APP_LOG_LEVEL", "INFO")
+    ).get_logger()
+
+    scheduler = PriceScheduler(
+        config,
+        logger,
+        dry_run=args.dry_run or config.get_bool("DRY_RUN"),
+        async_mode=args.async_mode or config.get("REALTIME_FETCH_MODE", "sync").lower() == "async",
+        stream=args.stream or config.get_bool("HTTP_STREAM"),
+        skip_unchanged=args.skip_unchanged or config.get_bool("REALTIME_SKIP_UNCHANGED"),
+    )
+    scheduler.run()
+
+
+if __name__ == "__main__":
+    main()
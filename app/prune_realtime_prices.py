@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+CashCue - Realtime Price Retention
+
+Tiered retention for the append-only `realtime_price` table:
+- ticks are kept at full resolution for RETENTION_RAW_DAYS days
+- older days are first downsampled into price_bar_5m and price_bar_1h
+  (recomputed from the ticks, which are authoritative), then deleted
+- 5-minute bars are kept RETENTION_5M_DAYS days, hourly bars
+  RETENTION_1H_DAYS days (0 = forever); daily_price is never pruned
+
+Deletes walk the primary key in windows of RETENTION_BATCH_SIZE ids, one short
+autocommit statement each, with RETENTION_BATCH_PAUSE seconds between them, so
+InnoDB row locks and undo stay small while the collectors keep inserting.
+The scans by captured_at use its own index: existing databases need
+`make migrate-db`.
+
+The report gives the rows deleted per table and the bytes reclaimed, estimated
+from the table's average row size (index included); the file only shrinks on
+disk after OPTIMIZE TABLE (--optimize).
+
+Usage:
+  python3 -m app.prune_realtime_prices [--dry-run] [--raw-days N] [--optimize]
+"""
+
+import argparse
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+from lib.config import ConfigManager
+from lib.db import DatabaseConnection
+from lib.logger import LoggerManager
+
+# -----------------------------
+# Load configuration
+# -----------------------------
+config = ConfigManager("/etc/cashcue/cashcue.conf")
+
+DB_HOST = config.get("DB_HOST", "localhost")
+DB_PORT = int(config.get("DB_PORT", 3306))
+DB_NAME = config.get("DB_NAME")
+DB_USER = config.get("DB_USER")
+DB_PASS = config.get("DB_PASS")
+
+RETENTION_RAW_DAYS = int(config.get("RETENTION_RAW_DAYS", 30))
+RETENTION_5M_DAYS = int(config.get("RETENTION_5M_DAYS", 365))
+RETENTION_1H_DAYS = int(config.get("RETENTION_1H_DAYS", 0))
+RETENTION_BATCH_SIZE = int(config.get("RETENTION_BATCH_SIZE", 5000))
+RETENTION_BATCH_PAUSE = float(config.get("RETENTION_BATCH_PAUSE", 0.05))
+
+LOG_FILE = config.get("LOG_FILE", "/var/log/cashcue/retention.log")
+APP_LOG_LEVEL = config.get("APP_LOG_LEVEL", "INFO").upper()
+
+# Bar start expressions over realtime_price.captured_at (%% = literal % for pymysql)
+BUCKETS = {
+    "price_bar_5m": "DATE_FORMAT(captured_at, '%%Y-%%m-%%d %%H:00:00') + INTERVAL (MINUTE(captured_at) DIV 5 * 5) MINUTE",
+    "price_bar_1h": "DATE_FORMAT(captured_at, '%%Y-%%m-%%d %%H:00:00')",
+}
+
+
+# -----------------------------
+# Retention job
+# -----------------------------
+class RealtimePriceRetention:
+    def __init__(self, db, logger, dry_run=False, raw_days=RETENTION_RAW_DAYS,
+                 bar_5m_days=RETENTION_5M_DAYS, bar_1h_days=RETENTION_1H_DAYS,
+                 batch_size=RETENTION_BATCH_SIZE, batch_pause=RETENTION_BATCH_PAUSE):
+        self.db = db
+        self.logger = logger
+        self.dry_run = dry_run
+        self.raw_days = raw_days
+        self.bar_5m_days = bar_5m_days
+        self.bar_1h_days = bar_1h_days
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.report = {}
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def fetch_one(self, sql, params=()):
+        with self.db.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchone()
+
+    def bytes_per_row(self, table):
+        """
+        Average on-disk size of one row, data and indexes, from table statistics.
+        """
+        row = self.fetch_one(
+            """
+            SELECT (DATA_LENGTH + INDEX_LENGTH) / NULLIF(TABLE_ROWS, 0) AS per_row
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """,
+            (table,)
+        )
+        return float(row["per_row"] or 0) if row else 0.0
+
+    def record(self, table, rows, per_row):
+        entry = self.report.setdefault(table, {"rows": 0, "bytes": 0})
+        entry["rows"] += rows
+        entry["bytes"] += int(rows * per_row)
+
+    # -----------------------------
+    # Downsampling
+    # -----------------------------
+    def downsample_day(self, day):
+        """
+        (Re)build the 5-minute and hourly bars of `day` from its ticks.
+        """
+        start = datetime.combine(day, dtime.min)
+        for table, bucket in BUCKETS.items():
+            sql = f"""
+                INSERT INTO {table}
+                    (instrument_id, bar_start, open_price, high_price, low_price, close_price,
+                     tick_count, first_at, last_at)
+                SELECT instrument_id, {bucket} AS bar,
+                       SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY captured_at, id), ',', 1),
+                       MAX(price),
+                       MIN(price),
+                       SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY captured_at DESC, id DESC), ',', 1),
+                       COUNT(*),
+                       MIN(captured_at),
+                       MAX(captured_at)
+                FROM realtime_price
+                WHERE captured_at >= %s AND captured_at < %s
+                GROUP BY instrument_id, bar
+                ON DUPLICATE KEY UPDATE
+                    open_price = VALUES(open_price),
+                    high_price = VALUES(high_price),
+                    low_price = VALUES(low_price),
+                    close_price = VALUES(close_price),
+                    tick_count = VALUES(tick_count),
+                    first_at = VALUES(first_at),
+                    last_at = VALUES(last_at)
+            """
+            if self.dry_run:
+                self.logger.info(f"[DRY-RUN] Downsample {day} into {table}")
+                continue
+            with self.db.transaction() as cur:
+                cur.execute(sql, (start, start + timedelta(days=1)))
+
+    def downsample(self, cutoff):
+        """
+        Downsample every day with ticks older than `cutoff`, oldest first.
+        """
+        row = self.fetch_one("SELECT MIN(captured_at) AS oldest FROM realtime_price")
+        if not row or row["oldest"] is None or row["oldest"] >= cutoff:
+            return 0
+        day, days = row["oldest"].date(), 0
+        while day < cutoff.date():
+            self.downsample_day(day)
+            day += timedelta(days=1)
+            days += 1
+        self.logger.info(f"Downsampled {days} days of ticks before {cutoff:%Y-%m-%d}")
+        return days
+
+    # -----------------------------
+    # Batched deletes
+    # -----------------------------
+    def delete_ticks(self, cutoff):
+        """
+        Delete realtime_price rows captured before `cutoff`, walking the
+        primary key so each DELETE touches at most batch_size ids.
+        """
+        bounds = self.fetch_one(
+            "SELECT MIN(id) AS lo, MAX(id) AS hi, COUNT(*) AS n FROM realtime_price WHERE captured_at < %s",
+            (cutoff,)
+        )
+        if not bounds or not bounds["n"]:
+            return 0
+        per_row = self.bytes_per_row("realtime_price")
+        if self.dry_run:
+            self.logger.info(f"[DRY-RUN] Would delete {bounds['n']} realtime_price rows before {cutoff}")
+            self.record("realtime_price", bounds["n"], per_row)
+            return bounds["n"]
+
+        deleted = 0
+        lo = bounds["lo"]
+        while lo <= bounds["hi"]:
+            with self.db.cursor() as cur:
+                deleted += cur.execute(
+                    "DELETE FROM realtime_price WHERE id >= %s AND id < %s AND captured_at < %s",
+                    (lo, lo + self.batch_size, cutoff)
+                )
+            lo += self.batch_size
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+        self.record("realtime_price", deleted, per_row)
+        self.logger.info(f"Deleted {deleted} realtime_price rows before {cutoff}")
+        return deleted
+
+    def delete_bars(self, table, cutoff):
+        """
+        Delete bars older than `cutoff` in LIMIT-ed batches (no surrogate key).
+        """
+        per_row = self.bytes_per_row(table)
+        if self.dry_run:
+            row = self.fetch_one(f"SELECT COUNT(*) AS n FROM {table} WHERE bar_start < %s", (cutoff,))
+            self.logger.info(f"[DRY-RUN] Would delete {row['n']} {table} rows before {cutoff}")
+            self.record(table, row["n"], per_row)
+            return row["n"]
+
+        deleted = 0
+        while True:
+            with self.db.cursor() as cur:
+                count = cur.execute(f"DELETE FROM {table} WHERE bar_start < %s LIMIT %s",
+                                    (cutoff, self.batch_size))
+            deleted += count
+            if count < self.batch_size:
+                break
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+        self.record(table, deleted, per_row)
+        self.logger.info(f"Deleted {deleted} {table} rows before {cutoff}")
+        return deleted
+
+    def optimize(self):
+        for table in self.report:
+            if self.report[table]["rows"]:
+                self.logger.info(f"OPTIMIZE TABLE {table}...")
+                if not self.dry_run:
+                    with self.db.cursor() as cur:
+                        cur.execute(f"OPTIMIZE TABLE {table}")
+                        cur.fetchall()
+
+    # -----------------------------
+    # Main workflow
+    # -----------------------------
+    def run(self, today=None, optimize=False):
+        today = today or date.today()
+        started = time.monotonic()
+        self.logger.info(
+            f"=== Realtime price retention: raw={self.raw_days}d, 5m={self.bar_5m_days}d, "
+            f"1h={self.bar_1h_days or 'forever'}d, batch={self.batch_size} ==="
+        )
+        try:
+            # Bars are (re)built before the ticks they summarize are deleted
+            raw_cutoff = datetime.combine(today - timedelta(days=self.raw_days), dtime.min)
+            self.downsample(raw_cutoff)
+            self.delete_ticks(raw_cutoff)
+
+            if self.bar_5m_days:
+                self.delete_bars("price_bar_5m",
+                                 datetime.combine(today - timedelta(days=self.bar_5m_days), dtime.min))
+            if self.bar_1h_days:
+                self.delete_bars("price_bar_1h",
+                                 datetime.combine(today - timedelta(days=self.bar_1h_days), dtime.min))
+
+            if optimize:
+                self.optimize()
+
+            for table, entry in self.report.items():
+                self.logger.info(
+                    f"{table}: {entry['rows']} rows deleted, ~{entry['bytes'] / 1048576:.1f} MiB reclaimed"
+                )
+            self.logger.info(f"=== Retention completed in {time.monotonic() - started:.1f}s ===")
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
+        finally:
+            self.db.close()
+        return self.report
+
+
+# -----------------------------
+# Entry point
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="CashCue Realtime Price Retention")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted, change nothing")
+    parser.add_argument("--raw-days", type=int, default=RETENTION_RAW_DAYS,
+                        help="Days of ticks kept at full resolution (default: RETENTION_RAW_DAYS)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Run OPTIMIZE TABLE afterwards to return the space to the filesystem")
+    args = parser.parse_args()
+    dry_run = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
+    if args.raw_days < 1:
+        parser.error("--raw-days must be at least 1")
+
+    logger = LoggerManager(log_file=LOG_FILE, level=APP_LOG_LEVEL).get_logger()
+    if dry_run:
+        logger.info("=== Running in DRY-RUN mode ===")
+
+    db = DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT)
+    RealtimePriceRetention(db, logger, dry_run=dry_run, raw_days=args.raw_days).run(optimize=args.optimize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+CashCue - Cash Running Balance Rebuild
+
+Recomputes the materialized running balance of `cash_transaction`
+(table cash_running_balance, see adm/migrations/007_cash_running_balance.sql)
+with one window-function statement:
+
+    balance = base + SUM(effect) OVER (PARTITION BY broker_account_id
+                                       ORDER BY date, id)
+
+The triggers keep the table current on every insert, update and delete; this
+job repairs it after the triggers were missing or disabled (bulk imports,
+restores) and verifies it.
+
+- --from DATE: only rows dated DATE or later are recomputed, starting from the
+  stored balance of the last row before DATE (rows before it are trusted)
+- --broker ID: one broker account
+- --check: count the rows whose stored balance differs from the recomputed
+  one, change nothing
+
+Usage:
+  python3 -m app.rebuild_cash_running_balance [--from YYYY-MM-DD] [--broker ID] [--check] [--dry-run]
+"""
+
+import argparse
+import time
+from datetime import date
+
+from lib.cash import cash_effect_sql
+from lib.config import ConfigManager
+from lib.db import DatabaseConnection
+from lib.logger import LoggerManager
+
+# -----------------------------
+# Load configuration
+# -----------------------------
+config = ConfigManager("/etc/cashcue/cashcue.conf")
+
+DB_HOST = config.get("DB_HOST", "localhost")
+DB_PORT = int(config.get("DB_PORT", 3306))
+DB_NAME = config.get("DB_NAME")
+DB_USER = config.get("DB_USER")
+DB_PASS = config.get("DB_PASS")
+
+LOG_FILE = config.get("LOG_FILE", "/var/log/cashcue/cash_running_balance.log")
+APP_LOG_LEVEL = config.get("APP_LOG_LEVEL", "INFO").upper()
+
+RUNNING_BALANCE = (
+    f"SUM({cash_effect_sql('t.amount', 't.type')}) OVER "
+    "(PARTITION BY t.broker_account_id ORDER BY t.date, t.id ROWS UNBOUNDED PRECEDING)"
+)
+
+
+# -----------------------------
+# Rebuild job
+# -----------------------------
+class CashRunningBalanceRebuilder:
+    def __init__(self, db, logger, dry_run=False):
+        self.db = db
+        self.logger = logger
+        self.dry_run = dry_run
+
+    @staticmethod
+    def _scope(start=None, broker_id=None):
+        """WHERE clause and params over cash_transaction `t`."""
+        clauses, params = [], []
+        if start:
+            clauses.append("t.date >= %s")
+            params.append(start)
+        if broker_id:
+            clauses.append("t.broker_account_id = %s")
+            params.append(broker_id)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def rebuild(self, start=None, broker_id=None):
+        """
+        Upsert the running balance of every row in scope. Returns the
+        affected row count reported by the server.
+        """
+        where, params = self._scope(start, broker_id)
+        base_join = ""
+        base = "0"
+        if start:
+            # Stored balance of each account's last row before `start`
+            base_join = """
+                LEFT JOIN (
+                    SELECT broker_account_id, balance
+                    FROM (
+                        SELECT r.broker_account_id, r.balance,
+                               ROW_NUMBER() OVER (PARTITION BY r.broker_account_id
+                                                  ORDER BY r.date DESC, r.transaction_id DESC) AS rn
+                        FROM cash_running_balance r
+                        WHERE r.date < %s
+                    ) last_rows
+                    WHERE rn = 1
+                ) b ON b.broker_account_id = t.broker_account_id
+            """
+            base = "COALESCE(b.balance, 0)"
+            params = [start] + params
+        sql = f"""
+            INSERT INTO cash_running_balance (transaction_id, broker_account_id, date, balance)
+            SELECT t.id, t.broker_account_id, t.date, {base} + {RUNNING_BALANCE}
+            FROM cash_transaction t
+            {base_join}
+            {where}
+            ON DUPLICATE KEY UPDATE
+                broker_account_id = VALUES(broker_account_id),
+                date = VALUES(date),
+                balance = VALUES(balance)
+        """
+        orphans = """
+            DELETE r FROM cash_running_balance r
+            LEFT JOIN cash_transaction t ON t.id = r.transaction_id
+            WHERE t.id IS NULL
+        """
+        if self.dry_run:
+            self.logger.info(f"[DRY-RUN] Would rebuild running balances "
+                             f"(from={start or 'beginning'}, broker={broker_id or 'all'})")
+            return 0
+        with self.db.transaction() as cur:
+            affected = cur.execute(sql, params)
+            removed = cur.execute(orphans)
+        self.logger.info(f"Running balances rebuilt: {affected} rows affected, {removed} orphans removed")
+        return affected
+
+    def check(self, broker_id=None):
+        """
+        Number of rows of the account(s) whose stored running balance is
+        missing or differs from a full recomputation.
+        """
+        where, params = self._scope(broker_id=broker_id)
+        sql = f"""
+            SELECT COUNT(*) AS mismatches
+            FROM (
+                SELECT t.id, {RUNNING_BALANCE} AS expected
+                FROM cash_transaction t
+                {where}
+            ) e
+            LEFT JOIN cash_running_balance r ON r.transaction_id = e.id
+            WHERE r.balance IS NULL OR r.balance <> e.expected
+        """
+        with self.db.cursor() as cur:
+            cur.execute(sql, params)
+            mismatches = cur.fetchone()["mismatches"]
+        if mismatches:
+            self.logger.warning(f"{mismatches} running balance(s) out of date")
+        else:
+            self.logger.info("Running balances are consistent")
+        return mismatches
+
+    def run(self, start=None, broker_id=None, check_only=False):
+        started = time.monotonic()
+        self.logger.info(f"=== Cash running balance {'check' if check_only else 'rebuild'}: "
+                         f"from={start or 'beginning'}, broker={broker_id or 'all'} ===")
+        try:
+            if check_only:
+                return self.check(broker_id)
+            self.rebuild(start, broker_id)
+            return 0
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
+            return None
+        finally:
+            self.logger.info(f"=== Completed in {time.monotonic() - started:.1f}s ===")
+            self.db.close()
+
+
+# -----------------------------
+# Entry point
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="CashCue Cash Running Balance Rebuild")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be rebuilt, change nothing")
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat,
+                        help="First day to recompute (YYYY-MM-DD, default: whole history)")
+    parser.add_argument("--broker", type=int, help="Only this broker_account_id")
+    parser.add_argument("--check", action="store_true", help="Only count out-of-date running balances")
+    args = parser.parse_args()
+    dry_run = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
+
+    logger = LoggerManager(log_file=LOG_FILE, level=APP_LOG_LEVEL).get_logger()
+    if dry_run:
+        logger.info("=== Running in DRY-RUN mode ===")
+
+    db = DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT)
+    result = CashRunningBalanceRebuilder(db, logger, dry_run=dry_run).run(
+        args.from_date, args.broker, check_only=args.check
+    )
+    raise SystemExit(0 if result == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,22 +15,37 @@ Features:
 - Same structure and style as update_portfolio_snapshot.py
 - Uses ConfigManager, LoggerManager, DatabaseConnection
 - --dry-run support
+- --incremental: resume each account from its watermark in
+  cash_balance_checkpoint (last transaction id/date and the balance there)
+  and only apply the newer rows. The cash_transaction triggers delete the
+  watermark of an account when a transaction below it is edited or deleted,
+  or a back-dated one is inserted: that account gets a full rebuild. Full
+  runs refresh the watermarks too.
+- --verify (implies --incremental): also check the history below every
+  watermark (row count, content fingerprint, back-dated rows), for changes
+  the triggers could not see. Scans every transaction.
+
+Cash effects come from the shared table of lib.cash (CASH_EFFECTS) and are
+evaluated by the database: all accounts (or all their new rows) are summed
+with ONE grouped SUM(CASE ...) query.
 """
 
 import argparse
-from datetime import datetime
 from decimal import Decimal
 
 from lib.config import ConfigManager
 from lib.logger import LoggerManager
 from lib.db import DatabaseConnection
+from lib.cash import CASH_FINGERPRINT, load_cash_totals
 
 
 class CashBalanceRecalculator:
-    def __init__(self, config, logger, dry_run=False):
+    def __init__(self, config, logger, dry_run=False, incremental=False, verify=False):
         self.config = config
         self.logger = LoggerManager().get_logger()
         self.dry_run = dry_run
+        self.incremental = incremental or verify
+        self.verify = verify
 
         # DB connection
         self.db = DatabaseConnection(
@@ -56,16 +71,36 @@ class CashBalanceRecalculator:
             cur.execute(sql)
             return cur.fetchall()
 
-    def fetch_cash_transactions(self, broker_account_id):
-        sql = """
-            SELECT amount, type
-            FROM cash_transaction
-            WHERE broker_account_id = %s
-            ORDER BY date ASC
+    def fetch_checkpoints(self):
         """
+        Watermark of every account. With --verify, also what changed below
+        it since: seen_count and seen_fingerprint (rows still at or below
+        last_tx_id, see lib.cash.CASH_FINGERPRINT) and backdated (a newer row
+        dated before last_tx_date).
+        """
+        if not self.verify:
+            sql = """
+                SELECT broker_account_id, last_tx_id, last_tx_date, tx_count, fingerprint, balance
+                FROM cash_balance_checkpoint
+            """
+        else:
+            sql = f"""
+                SELECT c.broker_account_id, c.last_tx_id, c.last_tx_date, c.tx_count, c.fingerprint, c.balance,
+                       COUNT(t.id) AS seen_count,
+                       COALESCE(BIT_XOR({CASH_FINGERPRINT}), 0) AS seen_fingerprint,
+                       EXISTS (SELECT 1 FROM cash_transaction b
+                                WHERE b.broker_account_id = c.broker_account_id
+                                  AND b.id > c.last_tx_id
+                                  AND b.date < c.last_tx_date) AS backdated
+                FROM cash_balance_checkpoint c
+                LEFT JOIN cash_transaction t
+                       ON t.broker_account_id = c.broker_account_id
+                      AND t.id <= c.last_tx_id
+                GROUP BY c.broker_account_id, c.last_tx_id, c.last_tx_date, c.tx_count, c.fingerprint, c.balance
+            """
         with self.db.cursor() as cur:
-            cur.execute(sql, (broker_account_id,))
-            return cur.fetchall()
+            cur.execute(sql)
+            return {row["broker_account_id"]: row for row in cur.fetchall()}
 
     def fetch_latest_snapshot_date(self):
         sql = "SELECT MAX(date) AS latest_date FROM portfolio_snapshot"
@@ -78,14 +113,34 @@ class CashBalanceRecalculator:
     #  CASH COMPUTATION
     # ---------------------------------------------------------
 
-    def compute_cash_effect(self, amount, ttype):
-        if ttype in ("DEPOSIT", "DIVIDEND", "SELL"):
-            return amount
-        elif ttype in ("BUY", "WITHDRAWAL", "FEES", "ADJUSTMENT"):
-            return -amount
-        else:
-            self.logger.warning(f"Unhandled transaction type: {ttype}")
-            return Decimal("0.0")
+    def fetch_cash_totals(self, resumed):
+        """
+        Cash totals of every account in one grouped query: all rows, or only
+        the rows after the watermark for the `resumed` checkpoints.
+        """
+        if not resumed:
+            return load_cash_totals(self.db)
+        placeholders = ", ".join(["%s"] * len(resumed))
+        return load_cash_totals(
+            self.db,
+            join="LEFT JOIN cash_balance_checkpoint c ON c.broker_account_id = t.broker_account_id",
+            where=f"WHERE t.broker_account_id NOT IN ({placeholders}) OR t.id > c.last_tx_id",
+            params=tuple(resumed),
+        )
+
+    def checkpoint_is_valid(self, broker_name, checkpoint):
+        if checkpoint["seen_count"] != checkpoint["tx_count"]:
+            self.logger.warning(f"'{broker_name}': {checkpoint['tx_count'] - checkpoint['seen_count']} "
+                                f"transaction(s) deleted below the watermark, full rebuild")
+            return False
+        if int(checkpoint["seen_fingerprint"]) != int(checkpoint["fingerprint"]):
+            self.logger.warning(f"'{broker_name}': transaction(s) edited below the watermark, full rebuild")
+            return False
+        if checkpoint["backdated"]:
+            self.logger.warning(f"'{broker_name}': back-dated transaction before "
+                                f"{checkpoint['last_tx_date']}, full rebuild")
+            return False
+        return True
 
     # ---------------------------------------------------------
     #  UPDATE METHODS
@@ -106,6 +161,27 @@ class CashBalanceRecalculator:
         with self.db.cursor() as cur:
             cur.execute(sql, params)
 
+    def store_checkpoint(self, broker_account_id, last_tx_id, last_tx_date, tx_count, fingerprint, cash_balance):
+        sql = """
+            INSERT INTO cash_balance_checkpoint
+                (broker_account_id, last_tx_id, last_tx_date, tx_count, fingerprint, balance)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_tx_id   = VALUES(last_tx_id),
+                last_tx_date = VALUES(last_tx_date),
+                tx_count     = VALUES(tx_count),
+                fingerprint  = VALUES(fingerprint),
+                balance      = VALUES(balance)
+        """
+        params = (broker_account_id, last_tx_id, last_tx_date, tx_count, fingerprint, cash_balance)
+
+        if self.dry_run:
+            self.logger.info(f"[DRY-RUN] SQL: {sql} | Params: {params}")
+            return
+
+        with self.db.cursor() as cur:
+            cur.execute(sql, params)
+
     def update_snapshot_cash(self, broker_account_id, latest_date, cash_balance):
         sql = """
             UPDATE portfolio_snapshot
@@ -126,7 +202,8 @@ class CashBalanceRecalculator:
     # ---------------------------------------------------------
 
     def run(self):
-        self.logger.info(f"=== Starting Cash Balance Recalculation (DRY_RUN={self.dry_run}) ===")
+        self.logger.info(f"=== Starting Cash Balance Recalculation "
+                         f"(DRY_RUN={self.dry_run}, INCREMENTAL={self.incremental}) ===")
 
         latest_date = self.fetch_latest_snapshot_date()
         if not latest_date:
@@ -138,23 +215,55 @@ class CashBalanceRecalculator:
             self.logger.warning("No broker accounts with has_cash_account=1.")
             return
 
+        checkpoints = self.fetch_checkpoints() if self.incremental else {}
+        resumed = {}
+        for broker in brokers:
+            checkpoint = checkpoints.get(broker["id"])
+            if not checkpoint:
+                if self.incremental:
+                    self.logger.info(f"'{broker['name']}': no watermark, full rebuild")
+                continue
+            if not self.verify or self.checkpoint_is_valid(broker["name"], checkpoint):
+                resumed[broker["id"]] = checkpoint
+        totals = self.fetch_cash_totals(resumed)
+
         for broker in brokers:
             broker_account_id = broker["id"]
             broker_name = broker["name"]
             self.logger.info(f"Processing broker_account '{broker_name}' (ID={broker_account_id})")
 
-            rows = self.fetch_cash_transactions(broker_account_id)
-
-            cash_balance = Decimal("0.0")
-            for row in rows:
-                amount = Decimal(row["amount"])
-                impact = self.compute_cash_effect(amount, row["type"])
-                cash_balance += impact
-
-            self.logger.info(f"Computed cash balance for '{broker_name}': {cash_balance}")
+            checkpoint = resumed.get(broker_account_id)
+            if checkpoint:
+                cash_balance = Decimal(checkpoint["balance"])
+                last_tx_id = checkpoint["last_tx_id"]
+                last_tx_date = checkpoint["last_tx_date"]
+                tx_count = checkpoint["tx_count"]
+                fingerprint = int(checkpoint["fingerprint"])
+            else:
+                cash_balance = Decimal("0.0")
+                last_tx_id = last_tx_date = None
+                tx_count = 0
+                fingerprint = 0
+
+            applied = totals.get(broker_account_id)
+            if applied:
+                if applied["unknown_count"]:
+                    self.logger.warning(f"'{broker_name}': {applied['unknown_count']} transaction(s) "
+                                        f"of unhandled type ignored")
+                cash_balance += applied["balance"]
+                last_tx_id = applied["last_tx_id"]
+                last_tx_date = max(last_tx_date, applied["last_tx_date"]) if last_tx_date else applied["last_tx_date"]
+                tx_count += applied["tx_count"]
+                fingerprint ^= applied["fingerprint"]  # new rows all have id > last_tx_id
+
+            self.logger.info(f"Computed cash balance for '{broker_name}': {cash_balance} "
+                             f"({applied['tx_count'] if applied else 0} transaction(s) applied)")
 
             self.update_cash_account(broker_account_id, cash_balance)
             self.update_snapshot_cash(broker_account_id, latest_date, cash_balance)
+            if last_tx_id is not None:
+                self.store_checkpoint(broker_account_id, last_tx_id, last_tx_date, tx_count, fingerprint,
+                                      cash_balance)
 
             self.logger.info(f"Updated cash_account & portfolio_snapshot cash for '{broker_name}'")
 
@@ -168,13 +277,19 @@ class CashBalanceRecalculator:
 def main():
     parser = argparse.ArgumentParser(description="CashCue Cash Balance Recalculator (OOD)")
     parser.add_argument("--dry-run", action="store_true", help="Simulate execution without DB writes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only apply transactions newer than each account's watermark")
+    parser.add_argument("--verify", action="store_true",
+                        help="With --incremental, check the whole history below each watermark "
+                             "instead of trusting the cash_transaction triggers")
     args = parser.parse_args()
 
     config = ConfigManager("/etc/cashcue/cashcue.conf")
     logger = LoggerManager(config.get("LOG_FILE", "/var/log/cashcue/cash_recalc.log"))
     dry_run = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
 
-    worker = CashBalanceRecalculator(config, logger, dry_run)
+    worker = CashBalanceRecalculator(config, logger, dry_run, incremental=args.incremental,
+                                     verify=args.verify)
     worker.run()
 
 
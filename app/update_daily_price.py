@@ -10,10 +10,37 @@ Rules:
 - Last execution of the day overrides previous runs.
 - pct_change = (close - open) / open * 100
 - volume is not updated for now.
+- The day is read with a half-open captured_at range (index friendly) and
+  open/high/low/close are aggregated by the database: one row per instrument.
+  Existing databases need `make migrate-db` for the (instrument_id, captured_at) index.
+- DAILY_PRICE_SOURCE=bars builds the instrument days that price_bar_1h
+  (maintained by update_realtime_prices with REALTIME_BARS=true) fully covers
+  from the bars, without scanning their ticks. Only the days with an hour of
+  ticks that no bar fully spans (bars enabled mid-day, failed flush) are still
+  aggregated from realtime_price; days without ticks left come from the bars.
+
+Backfill mode (--from / --to, inclusive dates):
+- the range is split in chunks of DAILY_BACKFILL_CHUNK_DAYS days
+- chunks are computed by a pool of DAILY_BACKFILL_WORKERS threads, each with
+  its own DB connection, and upserted in bulk (one transaction per chunk)
+- finished chunks are recorded in DAILY_BACKFILL_STATE_FILE: running the same
+  command again after a failure only processes the missing chunks
+- chunks use the DAILY_PRICE_SOURCE resolution of the daily run: with bars,
+  covered days are read from price_bar_1h and days whose ticks are gone are
+  still rebuilt from it
+
+Usage:
+  python3 -m app.update_daily_price [--dry-run]
+  python3 -m app.update_daily_price --from 2025-01-01 --to 2025-12-31 [--workers 8]
 """
 
 import argparse
-from datetime import date
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta
+from time import monotonic
 from lib.config import ConfigManager
 from lib.db import DatabaseConnection
 from lib.logger import LoggerManager
@@ -32,35 +59,23 @@ DB_PASS = config.get("DB_PASS")
 LOG_FILE = config.get("LOG_FILE", "/var/log/cashcue/daily_price.log")
 APP_LOG_LEVEL = config.get("APP_LOG_LEVEL", "INFO").upper()
 
-# -----------------------------
-# Command-line args
-# -----------------------------
-parser = argparse.ArgumentParser(description="CashCue Daily Price Updater")
-parser.add_argument("--dry-run", action="store_true", help="Simulate DB writes")
-args = parser.parse_args()
-DRY_RUN = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
-
-# -----------------------------
-# Logging
-# -----------------------------
-logger_manager = LoggerManager(log_file=LOG_FILE, level=APP_LOG_LEVEL)
-logger = logger_manager.get_logger()
-
-if DRY_RUN:
-    logger.info("=== Running in DRY-RUN mode ===")
+DAILY_PRICE_SOURCE = config.get("DAILY_PRICE_SOURCE", "ticks").lower()
 
-# -----------------------------
-# DB Connection
-# -----------------------------
-db = DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT)
+DAILY_BACKFILL_WORKERS = int(config.get("DAILY_BACKFILL_WORKERS", 4))
+DAILY_BACKFILL_CHUNK_DAYS = int(config.get("DAILY_BACKFILL_CHUNK_DAYS", 7))
+DAILY_BACKFILL_STATE_FILE = config.get("DAILY_BACKFILL_STATE_FILE", "/var/lib/cashcue/daily_backfill.json")
 
 # -----------------------------
 # Daily Price Updater Class
 # -----------------------------
 class DailyPriceUpdater:
-    def __init__(self, db, logger):
+    def __init__(self, db, logger, dry_run=False, close_db=True, source="ticks"):
         self.db = db
         self.logger = logger
+        self.dry_run = dry_run
+        self.source = source  # "ticks" (realtime_price) or "bars" (price_bar_1h)
+        # Long-running callers (price_scheduler) keep the connection open
+        self.close_db = close_db
 
     def run(self, target_date):
         try:
@@ -75,54 +90,191 @@ class DailyPriceUpdater:
                     f"Instrument {inst_id}: O={data['open']}, H={data['high']}, "
                     f"L={data['low']}, C={data['close']}, Δ={data['pct_change']:.2f}%"
                 )
-                self.upsert_daily_price(cursor, inst_id, target_date, data)
+            self.upsert_daily_prices(
+                [dict(data, instrument_id=inst_id, date=target_date) for inst_id, data in daily_data.items()]
+            )
 
             self.logger.info("=== CashCue Daily Price Update Completed ===")
 
         except Exception as e:
             self.logger.error("Unexpected error: %s", e)
         finally:
-            self.db.close()
+            if self.close_db:
+                self.db.close()
 
     def compute_daily_prices(self, cursor, target_date):
         """
         Calculate OHLC and pct_change from realtime_price for the given date.
         """
+        rows = self.resolve_range(cursor, target_date, target_date + timedelta(days=1))
+        if not rows:
+            self.logger.warning(f"No realtime_price data for {target_date}")
+            return {}
+        return {row["instrument_id"]: row for row in rows}
+
+    def resolve_range(self, cursor, start_date, end_date):
+        """
+        Daily rows of [start_date, end_date). In bars mode an instrument day
+        is read from price_bar_1h when every hour holding ticks has a bar that
+        spans them and has seen at least as many (bars see every tick,
+        unchanged ones included); the ticks are only aggregated for the other
+        instrument days, one query per day.
+        """
+        if self.source != "bars":
+            return self.compute_range(cursor, start_date, end_date)
+
+        bars = {(row["instrument_id"], row["date"]): row
+                for row in self.compute_range_from_bars(cursor, start_date, end_date)}
+        bar_hours = self.bar_hours(cursor, start_date, end_date)
+        uncovered = {}  # day -> instrument ids whose bars miss ticks
+        day = start_date
+        while day < end_date:
+            for inst_id, hours in self.tick_hours(cursor, day).items():
+                if (inst_id, day) in bars and self._bars_cover(bar_hours.get((inst_id, day), {}), hours):
+                    continue
+                bars.pop((inst_id, day), None)
+                uncovered.setdefault(day, []).append(inst_id)
+            day += timedelta(days=1)
+
+        rows = list(bars.values())
+        for day, inst_ids in uncovered.items():
+            rows += self.compute_range(cursor, day, day + timedelta(days=1), inst_ids)
+        if bars:
+            self.logger.info(f"{len(bars)} instrument day(s) built from price_bar_1h, "
+                             f"{len(rows) - len(bars)} from ticks")
+        return rows
+
+    @staticmethod
+    def _bars_cover(bars, ticks):
+        """
+        True when each hour of `ticks` has a bar spanning its first and last
+        tick and counting at least its ticks: a missing bar (failed flush) or
+        a short one would give a wrong high/low.
+        """
+        for hour, tick in ticks.items():
+            bar = bars.get(hour)
+            if (not bar or bar["tick_count"] < tick["tick_count"]
+                    or bar["first_at"] > tick["first_at"] or bar["last_at"] < tick["last_at"]):
+                return False
+        return True
+
+    def tick_hours(self, cursor, day):
+        """
+        {instrument_id: {hour: {tick_count, first_at, last_at}}} of the ticks
+        of one day. COUNT/MIN/MAX per instrument and hour over one captured_at
+        range are read from the (instrument_id, captured_at) index alone,
+        without reading the prices.
+        """
         sql = """
-            SELECT instrument_id, price, captured_at
+            SELECT instrument_id, HOUR(captured_at) AS hour, COUNT(*) AS tick_count,
+                   MIN(captured_at) AS first_at, MAX(captured_at) AS last_at
             FROM realtime_price
-            WHERE DATE(captured_at) = %s
-            ORDER BY instrument_id, captured_at
+            WHERE captured_at >= %s AND captured_at < %s
+            GROUP BY instrument_id, hour
         """
-        cursor.execute(sql, (target_date,))
-        rows = cursor.fetchall()
+        cursor.execute(sql, (
+            datetime.combine(day, time.min),
+            datetime.combine(day + timedelta(days=1), time.min),
+        ))
+        hours = {}
+        for row in cursor.fetchall():
+            hours.setdefault(row["instrument_id"], {})[row["hour"]] = row
+        return hours
 
-        if not rows:
-            self.logger.warning(f"No realtime_price data for {target_date}")
-            return {}
+    def bar_hours(self, cursor, start_date, end_date):
+        """
+        {(instrument_id, date): {hour: {tick_count, first_at, last_at}}} of
+        the hourly bars of [start_date, end_date), to check against tick_hours().
+        """
+        sql = """
+            SELECT instrument_id, bar_start, tick_count, first_at, last_at
+            FROM price_bar_1h
+            WHERE bar_start >= %s AND bar_start < %s
+        """
+        cursor.execute(sql, (
+            datetime.combine(start_date, time.min),
+            datetime.combine(end_date, time.min),
+        ))
+        hours = {}
+        for row in cursor.fetchall():
+            bar_start = row["bar_start"]
+            hours.setdefault((row["instrument_id"], bar_start.date()), {})[bar_start.hour] = row
+        return hours
+
+    def compute_range(self, cursor, start_date, end_date, instrument_ids=None):
+        """
+        OHLC and pct_change of every instrument (or only `instrument_ids`) and
+        day in [start_date, end_date).
+
+        First/last prices are the first element of a GROUP_CONCAT ordered by
+        captured_at (then id for identical timestamps), so group_concat_max_len
+        truncation can never affect them.
+        """
+        params = [
+            datetime.combine(start_date, time.min),
+            datetime.combine(end_date, time.min),
+        ]
+        instrument_filter = ""
+        if instrument_ids:
+            instrument_filter = f"AND instrument_id IN ({', '.join(['%s'] * len(instrument_ids))})"
+            params += instrument_ids
+        sql = f"""
+            SELECT instrument_id, DATE(captured_at) AS day,
+                   SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY captured_at, id), ',', 1) AS open_price,
+                   MAX(price) AS high_price,
+                   MIN(price) AS low_price,
+                   SUBSTRING_INDEX(GROUP_CONCAT(price ORDER BY captured_at DESC, id DESC), ',', 1) AS close_price
+            FROM realtime_price
+            WHERE captured_at >= %s AND captured_at < %s {instrument_filter}
+            GROUP BY instrument_id, day
+        """
+        cursor.execute(sql, params)
+
+        return self._daily_rows(cursor.fetchall())
 
-        daily_data = {}
+    def compute_range_from_bars(self, cursor, start_date, end_date):
+        """
+        Same as compute_range(), from the hourly bars: at most 24 rows per
+        instrument and day instead of every tick.
+        """
+        sql = """
+            SELECT instrument_id, DATE(bar_start) AS day,
+                   SUBSTRING_INDEX(GROUP_CONCAT(open_price ORDER BY bar_start), ',', 1) AS open_price,
+                   MAX(high_price) AS high_price,
+                   MIN(low_price) AS low_price,
+                   SUBSTRING_INDEX(GROUP_CONCAT(close_price ORDER BY bar_start DESC), ',', 1) AS close_price
+            FROM price_bar_1h
+            WHERE bar_start >= %s AND bar_start < %s
+            GROUP BY instrument_id, day
+        """
+        cursor.execute(sql, (
+            datetime.combine(start_date, time.min),
+            datetime.combine(end_date, time.min),
+        ))
+        return self._daily_rows(cursor.fetchall())
+
+    @staticmethod
+    def _daily_rows(rows):
+        results = []
         for row in rows:
-            inst_id = row["instrument_id"]
-            price = float(row["price"])
-
-            if inst_id not in daily_data:
-                daily_data[inst_id] = {"open": price, "close": price, "high": price, "low": price, "pct_change": 0.0}
-            else:
-                data = daily_data[inst_id]
-                data["close"] = price
-                data["high"] = max(data["high"], price)
-                data["low"] = min(data["low"], price)
-
-        # Calculate pct_change
-        for inst_id, data in daily_data.items():
-            open_price = data["open"]
-            close_price = data["close"]
-            data["pct_change"] = ((close_price - open_price) / open_price * 100) if open_price != 0 else 0.0
-
-        return daily_data
-
-    def upsert_daily_price(self, cursor, inst_id, target_date, data):
+            open_price = float(row["open_price"])
+            close_price = float(row["close_price"])
+            results.append({
+                "instrument_id": row["instrument_id"],
+                "date": row["day"],
+                "open": open_price,
+                "high": float(row["high_price"]),
+                "low": float(row["low_price"]),
+                "close": close_price,
+                "pct_change": ((close_price - open_price) / open_price * 100) if open_price != 0 else 0.0,
+            })
+        return results
+
+    def upsert_daily_prices(self, rows):
+        """
+        Insert/update many daily_price rows with one multi-row statement,
+        in one transaction.
+        """
         sql = """
             INSERT INTO daily_price
             (instrument_id, date, open_price, high_price, low_price, close_price, pct_change)
@@ -134,23 +286,208 @@ class DailyPriceUpdater:
                 close_price = VALUES(close_price),
                 pct_change = VALUES(pct_change)
         """
-        params = (
-            inst_id,
-            target_date,
-            round(data["open"], 4),
-            round(data["high"], 4),
-            round(data["low"], 4),
-            round(data["close"], 4),
-            round(data["pct_change"], 2),
+        params = [
+            (
+                row["instrument_id"],
+                row["date"],
+                round(row["open"], 4),
+                round(row["high"], 4),
+                round(row["low"], 4),
+                round(row["close"], 4),
+                round(row["pct_change"], 2),
+            )
+            for row in rows
+        ]
+        if not params:
+            return
+        if self.dry_run:
+            self.logger.info(f"[DRY-RUN] SQL: {' '.join(sql.split())} x {len(params)} rows")
+            return
+        with self.db.transaction() as cur:
+            cur.executemany(sql, params)
+
+
+# -----------------------------
+# Historical backfill
+# -----------------------------
+class DailyPriceBackfill:
+    """
+    Rebuild daily_price over a date range, in parallel chunks.
+    """
+
+    def __init__(self, connect, logger, workers=DAILY_BACKFILL_WORKERS,
+                 chunk_days=DAILY_BACKFILL_CHUNK_DAYS, dry_run=False, state_file=DAILY_BACKFILL_STATE_FILE,
+                 source="ticks"):
+        self.connect = connect  # () -> DatabaseConnection, one per worker thread
+        self.logger = logger
+        self.source = source  # same resolution as the daily run (see DailyPriceUpdater.resolve_range)
+        self.workers = max(1, workers)
+        self.chunk_days = max(1, chunk_days)
+        self.dry_run = dry_run
+        self.state_file = state_file
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chunks(start_date, end_date, chunk_days):
+        """[start_date, end_date] inclusive -> list of (first_day, day_after_last)"""
+        chunks = []
+        day = start_date
+        while day <= end_date:
+            chunk_end = min(day + timedelta(days=chunk_days), end_date + timedelta(days=1))
+            chunks.append((day, chunk_end))
+            day = chunk_end
+        return chunks
+
+    # -----------------------------
+    # Resume state
+    # -----------------------------
+    def load_state(self, start_date, end_date):
+        """
+        Chunks already done by a previous run of the same range, as ISO dates.
+        """
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {"from": start_date.isoformat(), "to": end_date.isoformat(),
+                    "chunk_days": self.chunk_days, "done": []}
+        with open(self.state_file, encoding="utf-8") as f:
+            state = json.load(f)
+        if (state.get("from"), state.get("to"), state.get("chunk_days")) != \
+                (start_date.isoformat(), end_date.isoformat(), self.chunk_days):
+            self.logger.info(f"Ignoring backfill state of another range: {self.state_file}")
+            return {"from": start_date.isoformat(), "to": end_date.isoformat(),
+                    "chunk_days": self.chunk_days, "done": []}
+        return state
+
+    def save_state(self, state):
+        """
+        Best effort: a state file that cannot be written only loses the
+        ability to resume, never the chunks already computed.
+        """
+        if not self.state_file or self.dry_run:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp = self.state_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            self.logger.warning(f"Could not save backfill state {self.state_file}: {e}")
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    def _updater(self):
+        updater = getattr(self._local, "updater", None)
+        if updater is None:
+            db = self.connect()
+            with self._lock:
+                self._connections.append(db)
+            updater = DailyPriceUpdater(db, self.logger, dry_run=self.dry_run, close_db=False,
+                                        source=self.source)
+            self._local.updater = updater
+        return updater
+
+    def process_chunk(self, chunk):
+        start_date, end_date = chunk
+        updater = self._updater()
+        with updater.db.cursor() as cursor:
+            rows = updater.resolve_range(cursor, start_date, end_date)
+        updater.upsert_daily_prices(rows)
+        return len(rows)
+
+    def run(self, start_date, end_date):
+        if end_date < start_date:
+            raise ValueError(f"--to {end_date} is before --from {start_date}")
+
+        state = self.load_state(start_date, end_date)
+        done = set(state["done"])
+        chunks = self.chunks(start_date, end_date, self.chunk_days)
+        pending = [c for c in chunks if c[0].isoformat() not in done]
+        self.logger.info(
+            f"=== Daily price backfill {start_date} -> {end_date}: {len(chunks)} chunks of "
+            f"{self.chunk_days} days, {len(chunks) - len(pending)} already done, workers={self.workers} ==="
         )
-        if DRY_RUN:
-            self.logger.info(f"[DRY-RUN] SQL: {sql.strip()} with {params}")
+
+        started = monotonic()
+        rows_total = 0
+        failed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as pool:
+                futures = {pool.submit(self.process_chunk, chunk): chunk for chunk in pending}
+                for finished, future in enumerate(as_completed(futures), start=1):
+                    first_day, day_after = futures[future]
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        failed += 1
+                        self.logger.error(f"Chunk {first_day}..{day_after - timedelta(days=1)} failed: {e}")
+                        continue
+                    rows_total += rows
+                    state["done"].append(first_day.isoformat())
+                    self.save_state(state)
+                    self.logger.info(
+                        f"Chunk {first_day}..{day_after - timedelta(days=1)}: {rows} rows "
+                        f"({finished}/{len(pending)}, {monotonic() - started:.1f}s)"
+                    )
+        finally:
+            for db in self._connections:
+                db.close()
+
+        if failed:
+            self.logger.error(f"Backfill incomplete: {failed} chunks failed, run the same command again to resume")
         else:
-            cursor.execute(sql, params)
+            if self.state_file and not self.dry_run and os.path.exists(self.state_file):
+                try:
+                    os.remove(self.state_file)
+                except OSError as e:
+                    self.logger.warning(f"Could not remove backfill state {self.state_file}: {e}")
+            self.logger.info(
+                f"=== Daily price backfill completed: {rows_total} rows in "
+                f"{monotonic() - started:.1f}s ==="
+            )
+        return failed == 0
 
 # -----------------------------
 # Entry point
 # -----------------------------
-if __name__ == "__main__":
-    updater = DailyPriceUpdater(db, logger)
+def main():
+    parser = argparse.ArgumentParser(description="CashCue Daily Price Updater")
+    parser.add_argument("--dry-run", action="store_true", help="Simulate DB writes")
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat,
+                        help="Backfill mode: first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", type=date.fromisoformat,
+                        help="Backfill mode: last day to rebuild, inclusive (default: yesterday)")
+    parser.add_argument("--workers", type=int, default=DAILY_BACKFILL_WORKERS,
+                        help="Backfill worker threads (default: DAILY_BACKFILL_WORKERS)")
+    parser.add_argument("--chunk-days", type=int, default=DAILY_BACKFILL_CHUNK_DAYS,
+                        help="Days per backfill chunk (default: DAILY_BACKFILL_CHUNK_DAYS)")
+    args = parser.parse_args()
+    dry_run = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
+    if args.to_date and not args.from_date:
+        parser.error("--to requires --from")
+
+    logger = LoggerManager(log_file=LOG_FILE, level=APP_LOG_LEVEL).get_logger()
+    if dry_run:
+        logger.info("=== Running in DRY-RUN mode ===")
+
+    if args.from_date:
+        backfill = DailyPriceBackfill(
+            lambda: DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT),
+            logger,
+            workers=args.workers,
+            chunk_days=args.chunk_days,
+            dry_run=dry_run,
+            source=DAILY_PRICE_SOURCE,
+        )
+        ok = backfill.run(args.from_date, args.to_date or date.today() - timedelta(days=1))
+        raise SystemExit(0 if ok else 1)
+
+    db = DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT)
+    updater = DailyPriceUpdater(db, logger, dry_run=dry_run, source=DAILY_PRICE_SOURCE)
     updater.run(date.today())
+
+
+if __name__ == "__main__":
+    main()
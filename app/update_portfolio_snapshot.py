@@ -17,6 +17,7 @@ ARCHITECTURAL RULES
 1. cash_account.current_balance is the ONLY source of truth for cash
 2. cash_transaction is the ONLY source of dividends and cash movements
 3. order_transaction is the ONLY source for invested capital & realized P/L
+   (effective orders only: status='ACTIVE' AND settled=1, as in the web UI)
 4. portfolio_snapshot stores a historical snapshot (append / upsert)
 
 WHAT THIS SCRIPT DOES
@@ -30,6 +31,36 @@ For each broker_account:
 - Aggregates dividends received
 - Stores everything into portfolio_snapshot
 
+All broker accounts are computed together (set-based): cash balances,
+dividend sums, invested sums and orders are each loaded with ONE grouped
+query, latest prices with one query for every open position, and all
+snapshots are stored with one multi-row upsert.
+
+FIFO lots live in lib.lots (deque of slotted lots) and are checkpointed per
+broker account and instrument in fifo_lot_checkpoint: a run only applies the
+orders entered since the previous run. A back-dated, edited or deleted order
+invalidates the checkpoint of its instrument (order_transaction triggers),
+which is then replayed from its first order. --verify-lots also checks every
+checkpoint against the order history; --rebuild-lots replays everything.
+
+REPLAY MODE (--replay [--from D] [--to D])
+------------------------------------------
+Rebuilds portfolio_snapshot for every trading day (a day with daily_price
+closes) in one chronological pass: orders, cash transactions and closes are
+streamed in date order (server-side cursors, one connection each) and
+merged, the state of every broker account is
+advanced day by day, and the snapshots are bulk-upserted in batches.
+Historical cash is SUM(cash_transaction.amount) up to the day (the same
+ledger that maintains cash_account.current_balance); positions are valued at
+the last close known that day.
+
+PARALLEL MODE (--workers N)
+---------------------------
+Broker accounts are sharded round-robin across N processes, each computing
+its shard (lots, positions, P/L) on a DB connection of its own. The parent
+logs the timing of each worker and stores every snapshot with one bulk
+upsert, then the lot checkpoints.
+
 WHAT THIS SCRIPT DOES NOT DO
 ----------------------------
 - Does NOT recalculate cash from transactions
@@ -45,13 +76,22 @@ EXECUTION
 """
 
 import argparse
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 from decimal import Decimal
 from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
 
 from lib.config import ConfigManager
 from lib.logger import LoggerManager
 from lib.db import DatabaseConnection
+from lib.lots import LotBook, LotCheckpointStore, LotLedger, effective_orders
+from lib.prices import LatestPriceResolver
 
 
 class PortfolioSnapshotUpdater:
@@ -59,10 +99,13 @@ class PortfolioSnapshotUpdater:
     Handles the creation of daily portfolio snapshots.
     """
 
-    def __init__(self, config, logger, dry_run=False):
+    def __init__(self, config, logger, dry_run=False, rebuild_lots=False, workers=1, verify_lots=False):
         self.config = config
         self.logger = logger
         self.dry_run = dry_run
+        self.rebuild_lots = rebuild_lots
+        self.verify_lots = verify_lots
+        self.workers = max(1, workers)
         self.snapshot_date = date.today()
 
         self.db = DatabaseConnection(
@@ -73,6 +116,9 @@ class PortfolioSnapshotUpdater:
             port=int(config.get("DB_PORT", 3306))
         )
         self.db.connect()
+        # Latest prices, cached for one run (see run())
+        self.prices = LatestPriceResolver(self.db)
+        self.lot_store = LotCheckpointStore(self.db, logger, dry_run)
 
     # ------------------------------------------------------------------
     # FETCH: broker accounts
@@ -85,146 +131,208 @@ class PortfolioSnapshotUpdater:
             return cur.fetchall()
 
     # ------------------------------------------------------------------
-    # FETCH: cash balance
+    # POSITIONS, unrealized and realized P/L
     # ------------------------------------------------------------------
 
-    def fetch_cash_balance(self, broker_account_id):
-        sql = """
-            SELECT current_balance
-            FROM cash_account
-            WHERE broker_account_id = %s
+    @staticmethod
+    def apply_orders_fifo(rows):
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql, (broker_account_id,))
-            row = cur.fetchone()
-            return Decimal(row["current_balance"]) if row else Decimal("0.00")
+        Replay orders (sorted by trade_date) with FIFO lots.
+        Returns positions, LotBook per instrument, realized PL
+        """
+        books = defaultdict(LotBook)
+        for row in rows:
+            books[row["instrument_id"]].apply(
+                row["order_type"], Decimal(row["quantity"]), Decimal(row["price"])
+            )
+        return PortfolioSnapshotUpdater.summarize_books(books)
+
+    @staticmethod
+    def summarize_books(books):
+        """
+        positions, books, realized PL of one broker account's {instrument_id: LotBook}
+        """
+        positions = {instr: book.position for instr, book in books.items()}
+        realized_pl = sum((book.realized_pl for book in books.values()), Decimal("0.00"))
+        return positions, books, realized_pl
+
+    @staticmethod
+    def compute_unrealized_pl(positions, books, latest_prices):
+        unrealized_pl = Decimal("0.00")
+        for instr, net_qty in positions.items():
+            if net_qty == 0:
+                continue
+            market_price = latest_prices.get(instr, Decimal("0"))
+            # Average cost from remaining FIFO lots (running totals of the book)
+            book = books.get(instr)
+            avg_cost = book.avg_cost() if book is not None else Decimal("0")
+            unrealized_pl += (market_price - avg_cost) * net_qty
+        return unrealized_pl
 
     # ------------------------------------------------------------------
-    # FETCH: dividends
+    # FIFO lots: resumed from checkpoints
     # ------------------------------------------------------------------
 
-    def fetch_dividends_received(self, broker_account_id):
-        sql = """
-            SELECT COALESCE(SUM(amount),0) AS total
-            FROM cash_transaction
-            WHERE broker_account_id=%s
-              AND type='DIVIDEND'
-              AND date <= %s
+    def load_lot_ledger(self, broker_ids=None):
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql, (broker_account_id, self.snapshot_date))
-            row = cur.fetchone()
-            return Decimal(row["total"])
+        LotLedger of the broker accounts (all by default): checkpointed lots
+        plus the orders entered since (full replay for invalidated or missing
+        checkpoints).
+        """
+        if self.rebuild_lots:
+            self.lot_store.reset(broker_ids)
+            stale = list(self.lot_store.load(broker_ids))
+        elif self.verify_lots:
+            stale = self.lot_store.invalidate_stale(broker_ids)
+        else:
+            stale = []
+        ledger = LotLedger()
+        ledger.resume(self.lot_store.load(broker_ids, skip=stale))
+        resumed = len(ledger.books)
+        ledger.apply(self.lot_store.fetch_new_orders(broker_ids, replay=stale))
+        self.logger.info(f"FIFO lots: {resumed} checkpoints resumed, {ledger.applied} orders applied")
+        return ledger
+
+    # ------------------------------------------------------------------
+    # FETCH: latest prices
+    # ------------------------------------------------------------------
+
+    def fetch_latest_prices(self, instrument_ids):
+        """
+        Latest daily close, else latest realtime tick, else 0, for every
+        instrument: {instrument_id: Decimal} (one query for uncached ids)
+        """
+        if not instrument_ids:
+            return {}
+        return self.prices.prices(instrument_ids)
 
     # ------------------------------------------------------------------
-    # FETCH: invested amount
+    # BULK LOADS: one grouped query for all broker accounts
     # ------------------------------------------------------------------
 
-    def fetch_invested_amount(self, broker_account_id):
-        sql = """
-            SELECT
+    @staticmethod
+    def _broker_filter(broker_ids, prefix="WHERE"):
+        """SQL condition limiting a bulk load to some broker accounts (none = all)."""
+        if not broker_ids:
+            return "", ()
+        return (f"{prefix} broker_account_id IN ({', '.join(['%s'] * len(broker_ids))})",
+                tuple(broker_ids))
+
+    def _load_grouped(self, sql, params=()):
+        with self.db.cursor() as cur:
+            cur.execute(sql, params)
+            return {row["broker_account_id"]: Decimal(row["total"]) for row in cur.fetchall()}
+
+    def load_cash_balances(self, broker_ids=None):
+        where, params = self._broker_filter(broker_ids)
+        return self._load_grouped(f"""
+            SELECT broker_account_id, current_balance AS total
+            FROM cash_account
+            {where}
+        """, params)
+
+    def load_dividends_received(self, broker_ids=None):
+        where, params = self._broker_filter(broker_ids, prefix="AND")
+        return self._load_grouped(f"""
+            SELECT broker_account_id, COALESCE(SUM(amount),0) AS total
+            FROM cash_transaction
+            WHERE type='DIVIDEND'
+              AND date <= %s
+              {where}
+            GROUP BY broker_account_id
+        """, (self.snapshot_date, *params))
+
+    def load_invested_amounts(self, broker_ids=None):
+        where, params = self._broker_filter(broker_ids, prefix="AND")
+        return self._load_grouped(f"""
+            SELECT broker_account_id,
                 COALESCE(SUM(
                     CASE WHEN order_type='BUY' THEN quantity*price
                          WHEN order_type='SELL' THEN -quantity*price
                          ELSE 0
                     END
-                ),0) AS invested
+                ),0) AS total
             FROM order_transaction
-            WHERE broker_account_id=%s
+            WHERE {effective_orders()}
               AND trade_date <= %s
+              {where}
+            GROUP BY broker_account_id
+        """, (self.snapshot_date, *params))
+
+    def compute_snapshots(self, brokers, broker_ids=None):
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql, (broker_account_id, self.snapshot_date))
-            row = cur.fetchone()
-            return Decimal(row["invested"])
+        Compute the snapshot of every broker account in memory (bulk loads
+        and lots limited to `broker_ids` when given, e.g. one worker shard).
+        Returns a list of snapshot dicts (store_snapshots() input).
+        """
+        cash_balances = self.load_cash_balances(broker_ids)
+        dividends = self.load_dividends_received(broker_ids)
+        invested_amounts = self.load_invested_amounts(broker_ids)
+        self.lot_ledger = self.load_lot_ledger(broker_ids)
 
-    # ------------------------------------------------------------------
-    # FETCH: positions, unrealized and realized P/L
-    # ------------------------------------------------------------------
+        replayed = {}
+        open_instruments = set()
+        for broker in brokers:
+            positions, books, realized_pl = self.summarize_books(self.lot_ledger.broker_books(broker["id"]))
+            replayed[broker["id"]] = (positions, books, realized_pl)
+            open_instruments.update(instr for instr, qty in positions.items() if qty != 0)
+        latest_prices = self.fetch_latest_prices(open_instruments)
 
-    def fetch_positions_and_pl(self, broker_account_id):
+        snapshots = []
+        for broker in brokers:
+            bid = broker["id"]
+            positions, books, realized_pl = replayed[bid]
+            unrealized_pl = self.compute_unrealized_pl(positions, books, latest_prices)
+            invested = invested_amounts.get(bid, Decimal("0.00"))
+            snapshots.append({
+                "broker_account_id": bid,
+                "name": broker["name"],
+                "date": self.snapshot_date,
+                "total_value": invested + unrealized_pl,
+                "invested_amount": invested,
+                "unrealized_pl": unrealized_pl,
+                "realized_pl": realized_pl,
+                "dividends_received": dividends.get(bid, Decimal("0.00")),
+                "cash_balance": cash_balances.get(bid, Decimal("0.00")),
+            })
+        return snapshots
+
+    @staticmethod
+    def shard(brokers, workers):
         """
-        Returns positions, unrealized PL, realized PL
+        Split the broker accounts round-robin into at most `workers` non-empty
+        shards: each account lands in exactly one shard.
         """
-        positions = defaultdict(Decimal)
-        unrealized_pl = Decimal("0.00")
-        realized_pl = Decimal("0.00")
+        shards = [brokers[i::workers] for i in range(workers)]
+        return [shard for shard in shards if shard]
 
-        # Step 1: Fetch all orders
-        sql_orders = """
-            SELECT instrument_id, order_type, quantity, price, trade_date
-            FROM order_transaction
-            WHERE broker_account_id=%s
-            ORDER BY trade_date ASC
+    def compute_snapshots_parallel(self, brokers):
         """
-        with self.db.cursor() as cur:
-            cur.execute(sql_orders, (broker_account_id,))
-            rows = cur.fetchall()
-
-        # FIFO lot tracking per instrument
-        fifo_lots = defaultdict(list)
-
-        for row in rows:
-            instr = row["instrument_id"]
-            qty = Decimal(row["quantity"])
-            price = Decimal(row["price"])
-            typ = row["order_type"]
-
-            if typ == "BUY":
-                fifo_lots[instr].append({"qty": qty, "price": price})
-                positions[instr] += qty
-            elif typ == "SELL":
-                positions[instr] -= qty
-                # Compute realized P/L
-                remaining = qty
-                while remaining > 0 and fifo_lots[instr]:
-                    lot = fifo_lots[instr][0]
-                    lot_qty = lot["qty"]
-                    lot_price = lot["price"]
-                    if lot_qty <= remaining:
-                        realized_pl += (price - lot_price) * lot_qty
-                        remaining -= lot_qty
-                        fifo_lots[instr].pop(0)
-                    else:
-                        realized_pl += (price - lot_price) * remaining
-                        lot["qty"] -= remaining
-                        remaining = 0
-
-        # Step 2: Fetch latest price for each instrument to compute unrealized PL
-        for instr, net_qty in positions.items():
-            if net_qty == 0:
-                continue
-            sql_price = """
-            SELECT COALESCE(
-                    (SELECT close_price FROM daily_price dp
-                        WHERE dp.instrument_id=%s
-                        ORDER BY dp.date DESC LIMIT 1),
-                    (SELECT price FROM realtime_price rp
-                        WHERE rp.instrument_id=%s
-                        ORDER BY rp.captured_at DESC LIMIT 1),
-                    0
-                ) AS last_price
-            """
-            with self.db.cursor() as cur:
-                cur.execute(sql_price, (instr, instr))
-                row = cur.fetchone()
-                market_price = Decimal(row["last_price"])
-            # Average cost from remaining FIFO lots
-            lots = fifo_lots.get(instr, [])
-            total_cost = sum(lot["qty"]*lot["price"] for lot in lots)
-            total_qty = sum(lot["qty"] for lot in lots) or 1
-            avg_cost = total_cost / total_qty
-            unrealized_pl += (market_price - avg_cost) * net_qty
-
-        return positions, unrealized_pl, realized_pl
+        Shard the broker accounts across self.workers processes.
+        Returns (snapshots, lot checkpoints) merged from every shard.
+        """
+        shards = self.shard(brokers, self.workers)
+        snapshots, checkpoints = [], []
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                pool.submit(compute_snapshot_shard, self.config, shard,
+                            self.snapshot_date, self.dry_run, self.rebuild_lots, self.verify_lots)
+                for shard in shards
+            ]
+            for worker, future in enumerate(futures, 1):
+                shard_snapshots, shard_checkpoints, pid, elapsed = future.result()
+                self.logger.info(f"Worker {worker} (pid {pid}): {len(shard_snapshots)} accounts "
+                                 f"in {elapsed:.2f}s")
+                snapshots.extend(shard_snapshots)
+                checkpoints.extend(shard_checkpoints)
+        snapshots.sort(key=lambda s: s["broker_account_id"])
+        return snapshots, checkpoints
 
     # ------------------------------------------------------------------
     # STORE SNAPSHOT
     # ------------------------------------------------------------------
 
-    def store_snapshot(self, broker_account_id, total_value, invested_amount,
-                       unrealized_pl, realized_pl, dividends_received, cash_balance):
-        sql = """
+    SNAPSHOT_SQL = """
             INSERT INTO portfolio_snapshot
             (broker_account_id, date,
              total_value, invested_amount,
@@ -239,14 +347,152 @@ class PortfolioSnapshotUpdater:
                 dividends_received = VALUES(dividends_received),
                 cash_balance       = VALUES(cash_balance)
         """
-        params = (broker_account_id, self.snapshot_date, total_value,
-                  invested_amount, unrealized_pl, realized_pl,
-                  dividends_received, cash_balance)
+
+    def store_snapshots(self, snapshots):
+        """
+        Upsert many snapshots with one multi-row statement, in one transaction.
+        """
+        params = [
+            (s["broker_account_id"], s["date"], s["total_value"],
+             s["invested_amount"], s["unrealized_pl"], s["realized_pl"],
+             s["dividends_received"], s["cash_balance"])
+            for s in snapshots
+        ]
+        if not params:
+            return
         if self.dry_run:
-            self.logger.info(f"[DRY-RUN] {sql} | {params}")
+            self.logger.info(f"[DRY-RUN] {' '.join(self.SNAPSHOT_SQL.split())} x {len(params)} rows")
             return
-        with self.db.cursor() as cur:
-            cur.execute(sql, params)
+        with self.db.transaction() as cur:
+            cur.executemany(self.SNAPSHOT_SQL, params)
+
+    # ------------------------------------------------------------------
+    # HISTORICAL REPLAY: one chronological pass over the whole history
+    # ------------------------------------------------------------------
+
+    REPLAY_BATCH_ROWS = 5000
+
+    def _stream(self, kind, sql, params=()):
+        """
+        Yield (day, kind, row) for each row of `sql`, which must be sorted by day.
+
+        Each stream reads a server-side cursor on a connection of its own (an
+        unbuffered result holds its connection until exhausted, and the three
+        streams are consumed together while self.db stores the batches), so
+        client memory stays at REPLAY_BATCH_ROWS rows per stream.
+        """
+        db = DatabaseConnection(
+            host=self.config.get("DB_HOST", "localhost"),
+            user=self.config.get("DB_USER"),
+            password=self.config.get("DB_PASS"),
+            database=self.config.get("DB_NAME"),
+            port=int(self.config.get("DB_PORT", 3306))
+        )
+        try:
+            for row in db.stream(sql, params, self.REPLAY_BATCH_ROWS):
+                yield row["day"], kind, row
+        finally:
+            db.close()
+
+    def replay_events(self, end):
+        """
+        Orders, cash transactions and closes up to `end`, merged in date order.
+        """
+        orders = self._stream("order", f"""
+            SELECT DATE(trade_date) AS day, broker_account_id, instrument_id,
+                   order_type, quantity, price
+            FROM order_transaction
+            WHERE {effective_orders()}
+              AND trade_date < %s + INTERVAL 1 DAY
+            ORDER BY trade_date, id
+        """, (end,))
+        cash = self._stream("cash", """
+            SELECT DATE(date) AS day, broker_account_id, type, amount
+            FROM cash_transaction
+            WHERE date < %s + INTERVAL 1 DAY
+            ORDER BY date, id
+        """, (end,))
+        closes = self._stream("close", """
+            SELECT date AS day, instrument_id, close_price
+            FROM daily_price
+            WHERE date <= %s AND close_price IS NOT NULL
+            ORDER BY date
+        """, (end,))
+        return heapq.merge(orders, cash, closes, key=itemgetter(0))
+
+    def replay_history(self, start=None, end=None):
+        """
+        Compute and upsert the snapshot of every broker account for every
+        trading day in [start, end] (default: whole history up to today).
+        Returns the number of snapshot rows.
+        """
+        end = end or self.snapshot_date
+        names = {b["id"]: b["name"] for b in self.fetch_broker_accounts()}
+        accounts = {}  # broker_account_id -> replay state, created at first activity
+        closes = {}
+        pending, total, days = [], 0, 0
+
+        def account(bid):
+            state = accounts.get(bid)
+            if state is None:
+                state = accounts[bid] = {
+                    "books": defaultdict(LotBook),
+                    "invested": Decimal("0.00"),
+                    "cash": Decimal("0.00"),
+                    "dividends": Decimal("0.00"),
+                }
+            return state
+
+        for day, events in groupby(self.replay_events(end), key=itemgetter(0)):
+            trading_day = False
+            for _, kind, row in events:
+                if kind == "close":
+                    closes[row["instrument_id"]] = Decimal(row["close_price"])
+                    trading_day = True
+                elif kind == "order":
+                    state = account(row["broker_account_id"])
+                    qty, price = Decimal(row["quantity"]), Decimal(row["price"])
+                    state["books"][row["instrument_id"]].apply(row["order_type"], qty, price)
+                    if row["order_type"] == "BUY":
+                        state["invested"] += qty * price
+                    elif row["order_type"] == "SELL":
+                        state["invested"] -= qty * price
+                else:
+                    state = account(row["broker_account_id"])
+                    amount = Decimal(row["amount"])
+                    state["cash"] += amount
+                    if row["type"] == "DIVIDEND":
+                        state["dividends"] += amount
+
+            if not trading_day or (start and day < start):
+                continue
+            days += 1
+            for bid, state in accounts.items():
+                if bid not in names:
+                    continue
+                positions, books, realized_pl = self.summarize_books(state["books"])
+                unrealized_pl = self.compute_unrealized_pl(positions, books, closes)
+                pending.append({
+                    "broker_account_id": bid,
+                    "name": names[bid],
+                    "date": day,
+                    "total_value": state["invested"] + unrealized_pl,
+                    "invested_amount": state["invested"],
+                    "unrealized_pl": unrealized_pl,
+                    "realized_pl": realized_pl,
+                    "dividends_received": state["dividends"],
+                    "cash_balance": state["cash"],
+                })
+            if len(pending) >= self.REPLAY_BATCH_ROWS:
+                self.store_snapshots(pending)
+                total += len(pending)
+                pending = []
+
+        self.store_snapshots(pending)
+        total += len(pending)
+        self.logger.info(f"Replay: {total} snapshots over {days} trading days "
+                         f"({start or 'first day'} -> {end})")
+        return total
 
     # ------------------------------------------------------------------
     # MAIN RUN
@@ -256,36 +502,51 @@ class PortfolioSnapshotUpdater:
         self.logger.info(f"=== Portfolio Snapshot Update started "
                          f"(date={self.snapshot_date}, dry_run={self.dry_run}) ===")
 
+        self.prices.invalidate()  # a resident caller (price_scheduler) reruns after new closes
         brokers = self.fetch_broker_accounts()
-        for broker in brokers:
-            bid = broker["id"]
-            name = broker["name"]
-            self.logger.info(f"Processing broker '{name}' (ID={bid})")
-
-            cash_balance = self.fetch_cash_balance(bid)
-            dividends = self.fetch_dividends_received(bid)
-            invested = self.fetch_invested_amount(bid)
-            positions, unrealized_pl, realized_pl = self.fetch_positions_and_pl(bid)
-            total_value = invested + unrealized_pl
-
-            self.store_snapshot(
-                broker_account_id=bid,
-                total_value=total_value,
-                invested_amount=invested,
-                unrealized_pl=unrealized_pl,
-                realized_pl=realized_pl,
-                dividends_received=dividends,
-                cash_balance=cash_balance
-            )
-
-            self.logger.info(f"Snapshot stored for '{name}': "
-                             f"value={total_value}, invested={invested}, "
-                             f"cash={cash_balance}, unrealized_pl={unrealized_pl}, "
-                             f"realized_pl={realized_pl}")
+        started = time.monotonic()
+        if self.workers > 1 and len(brokers) > 1:
+            snapshots, checkpoints = self.compute_snapshots_parallel(brokers)
+        else:
+            snapshots = self.compute_snapshots(brokers)
+            checkpoints = self.lot_ledger.checkpoints()
+        self.logger.info(f"Computed {len(snapshots)} snapshots in {time.monotonic() - started:.2f}s "
+                         f"(workers={min(self.workers, max(1, len(brokers)))})")
+        self.store_snapshots(snapshots)
+        self.lot_store.save(checkpoints)
+
+        for snap in snapshots:
+            self.logger.info(f"Snapshot stored for '{snap['name']}': "
+                             f"value={snap['total_value']}, invested={snap['invested_amount']}, "
+                             f"cash={snap['cash_balance']}, unrealized_pl={snap['unrealized_pl']}, "
+                             f"realized_pl={snap['realized_pl']}")
 
         self.logger.info("=== Portfolio Snapshot Update completed ===")
 
 
+# ----------------------------------------------------------------------
+# PROCESS POOL WORKER
+# ----------------------------------------------------------------------
+
+def compute_snapshot_shard(config, brokers, snapshot_date, dry_run, rebuild_lots, verify_lots=False):
+    """
+    Worker process: compute the snapshots of a shard of broker accounts on a
+    DB connection of its own. Snapshots and lot checkpoints are returned to
+    the parent, which stores them; only stale checkpoints of the shard are
+    deleted here. Returns (snapshots, checkpoints, pid, elapsed seconds).
+    """
+    started = time.monotonic()
+    updater = PortfolioSnapshotUpdater(config, logging.getLogger("cashcue"), dry_run, rebuild_lots,
+                                       verify_lots=verify_lots)
+    updater.snapshot_date = snapshot_date
+    try:
+        snapshots = updater.compute_snapshots(brokers, broker_ids=[b["id"] for b in brokers])
+        checkpoints = updater.lot_ledger.checkpoints()
+    finally:
+        updater.db.close()
+    return snapshots, checkpoints, os.getpid(), time.monotonic() - started
+
+
 # ----------------------------------------------------------------------
 # ENTRY POINT
 # ----------------------------------------------------------------------
@@ -296,7 +557,22 @@ def main():
     )
     parser.add_argument("--dry-run", action="store_true",
                         help="Simulate execution without DB writes")
+    parser.add_argument("--rebuild-lots", action="store_true",
+                        help="Ignore FIFO lot checkpoints and replay every order")
+    parser.add_argument("--verify-lots", action="store_true",
+                        help="Check FIFO lot checkpoints against the whole order history "
+                             "instead of trusting the order_transaction triggers")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes sharding the broker accounts (default: SNAPSHOT_WORKERS)")
+    parser.add_argument("--replay", action="store_true",
+                        help="Rebuild the snapshots of every trading day in one pass")
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat,
+                        help="Replay mode: first day to store (YYYY-MM-DD, default: first trading day)")
+    parser.add_argument("--to", dest="to_date", type=date.fromisoformat,
+                        help="Replay mode: last day to store, inclusive (default: today)")
     args = parser.parse_args()
+    if (args.from_date or args.to_date) and not args.replay:
+        parser.error("--from/--to require --replay")
 
     config = ConfigManager("/etc/cashcue/cashcue.conf")
     logger = LoggerManager(
@@ -304,7 +580,13 @@ def main():
     ).get_logger()
 
     dry_run = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
-    updater = PortfolioSnapshotUpdater(config, logger, dry_run)
+    workers = args.workers if args.workers is not None else config.get_int("SNAPSHOT_WORKERS", 1)
+    updater = PortfolioSnapshotUpdater(config, logger, dry_run,
+                                       rebuild_lots=args.rebuild_lots, workers=workers,
+                                       verify_lots=args.verify_lots)
+    if args.replay:
+        updater.replay_history(args.from_date, args.to_date)
+        return
     updater.run()
 
 
@@ -5,23 +5,75 @@ CashCue - Realtime Price Updater (OOP Refactored)
 Fetches the latest prices for all instruments and updates `realtime_price` table.
 Also captures "capital échangé" percentage if available.
 
+Fetch modes:
+- sync  (default): one instrument after the other
+- async (--async or REALTIME_FETCH_MODE=async): concurrent fetches bounded by
+  --concurrency / HTTP_CONCURRENCY, with per-request timeouts and
+  exponential retry backoff (HTTP_BACKOFF) that does not block other fetches
+
+Quotes come from the providers listed in PRICE_PROVIDERS (lib.providers):
+for each instrument type the cheapest provider is tried first and the others
+are the failover order. Batch-capable providers are asked for many symbols in
+one request before the per-instrument fetches. PRICE_PROVIDERS=file with
+PRICE_PROVIDER_DIR=<saved pages> runs the whole pipeline offline. Boursorama
+URLs take their {category} from the instrument type (BOURSORAMA_CATEGORIES).
+
+Only ACTIVE instruments are polled. Instruments with a positive net quantity
+in order_transaction (held) and those nobody holds (watch-only) can be polled
+separately with --scope held|watch, so watch-only ones get a slower cadence
+(REALTIME_WATCH_INTERVAL minutes in cron and daemon mode).
+
+Prices are buffered and written with multi-row INSERTs, one transaction per
+REALTIME_FLUSH_SIZE rows, and flushed again at the end of the sweep.
+
+With --skip-unchanged (or REALTIME_SKIP_UNCHANGED=true) a tick identical to
+the last price written for the instrument (price and capital exchanged) is
+not written, unless REALTIME_HEARTBEAT_MINUTES have elapsed. The first tick of
+each day is always written, so daily open/high/low/close and "latest price"
+queries return the same values as with every tick stored. The last written
+prices are kept in REALTIME_CACHE_FILE when set, otherwise in process memory
+seeded from today's rows.
+
+With REALTIME_BARS=true every fetched tick also updates 5-minute and hourly
+OHLC bars (price_bar_5m / price_bar_1h), accumulated in memory and merged
+into the tables with one upsert per table at the end of the sweep.
+
+With --stream (or HTTP_STREAM=true) quote pages are read in HTTP_STREAM_CHUNK
+chunks and the connection is closed as soon as price and capital exchanged
+are found; pages without those markers are still read in full.
+
+All requests go through a per-host token bucket (HTTP_RATE_LIMIT requests/s,
+HTTP_RATE_BURST) and circuit breaker: after HTTP_BREAKER_THRESHOLD consecutive
+failures (errors, 403/429/5xx) the host is skipped for HTTP_BREAKER_COOLDOWN
+seconds, then probed with a single request. Instruments hit while the circuit
+is open fail fast without retries.
+
 Uses:
 - LoggerManager (centralized logging)
 - DatabaseConnection (robust DB access)
 - ConfigManager (dotenv-style configuration)
+- HttpSessionPool (keep-alive connections reused across instruments)
+- QuoteExtractor (single extraction of price, currency and capital exchanged)
 """
 
 import argparse
-import re
+import asyncio
+import json
+import os
+import signal
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 import requests
-from bs4 import BeautifulSoup
 
 from lib.config import ConfigManager
 from lib.db import DatabaseConnection
+from lib.fetcher import parse_categories
+from lib.http_pool import get_session_pool
 from lib.logger import LoggerManager
+from lib.providers import ProviderError, create_providers, select_providers
+from lib.ratelimit import CircuitOpenError
 
 # -----------------------------
 # Load configuration
@@ -38,171 +90,623 @@ BOURSORAMA_URL_PATTERN = config.get(
     "BOURSORAMA_URL_PATTERN",
     "https://bourse.boursobank.com/bourse/{category}/cours/1r{symbol}/"
 )
+BOURSORAMA_CATEGORIES = parse_categories(config.get("BOURSORAMA_CATEGORIES", ""))
 
 HTTP_TIMEOUT = int(config.get("HTTP_TIMEOUT", 10))
 HTTP_RETRIES = int(config.get("HTTP_RETRIES", 3))
+HTTP_BACKOFF = float(config.get("HTTP_BACKOFF", 1))
+HTTP_CONCURRENCY = int(config.get("HTTP_CONCURRENCY", 8))
+HTTP_POOL_SIZE = int(config.get("HTTP_POOL_SIZE", max(HTTP_CONCURRENCY, 10)))
+HTTP_STREAM_CHUNK = int(config.get("HTTP_STREAM_CHUNK", 16384))
+PRICE_PROVIDERS = config.get("PRICE_PROVIDERS", "boursorama")
+PRICE_PROVIDER_DIR = config.get("PRICE_PROVIDER_DIR", "")
+
+REALTIME_WATCH_INTERVAL = int(config.get("REALTIME_WATCH_INTERVAL", 30))
+HTTP_RATE_LIMIT = float(config.get("HTTP_RATE_LIMIT", 0))
+HTTP_RATE_BURST = int(config.get("HTTP_RATE_BURST", HTTP_CONCURRENCY))
+HTTP_BREAKER_THRESHOLD = int(config.get("HTTP_BREAKER_THRESHOLD", 5))
+HTTP_BREAKER_COOLDOWN = float(config.get("HTTP_BREAKER_COOLDOWN", 60))
+REALTIME_FLUSH_SIZE = int(config.get("REALTIME_FLUSH_SIZE", 500))
+REALTIME_HEARTBEAT_MINUTES = int(config.get("REALTIME_HEARTBEAT_MINUTES", 60))
+REALTIME_CACHE_FILE = config.get("REALTIME_CACHE_FILE", "")
+REALTIME_BARS = config.get("REALTIME_BARS", "false").lower() == "true"
 LOG_FILE = config.get("LOG_FILE", "/var/log/cashcue/realtime_price.log")
 APP_LOG_LEVEL = config.get("APP_LOG_LEVEL", "INFO").upper()
 
 DEFAULT_CURRENCY = config.get("DEFAULT_CURRENCY", "EUR")
 
-# -----------------------------
-# Command-line args
-# -----------------------------
-parser = argparse.ArgumentParser(description="CashCue Realtime Price Updater")
-parser.add_argument(
-    "--dry-run",
-    action="store_true",
-    help="Simulate execution without writing to the database. Overrides config DRY_RUN."
-)
-args = parser.parse_args()
-DRY_RUN = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
-
-# -----------------------------
-# Logging
-# -----------------------------
-logger_manager = LoggerManager(log_file=LOG_FILE, level=APP_LOG_LEVEL)
-logger = logger_manager.get_logger()
-
-if DRY_RUN:
-    logger.info("=== Running in DRY-RUN mode ===")
-
-# -----------------------------
-# DB Connection
-# -----------------------------
-db = DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT)
-
 # -----------------------------
 # Helper functions
 # -----------------------------
-def fetch_price_from_html(html_content):
+class RealtimePriceWriter:
     """
-    Extract numeric price from HTML using regex.
-    Returns float or None if not found.
+    Buffer realtime_price rows and write them with a multi-row INSERT,
+    one transaction per flush instead of one autocommit per instrument.
+
+    - flush() is called automatically every `flush_size` rows
+    - the updater flushes again at the end of the sweep (including on error
+      or SIGTERM), so collected prices are never silently dropped
+    - rows stay buffered if a flush fails, and are retried at the next flush
     """
-    match = re.search(
-        r'<span class="c-instrument c-instrument--last" data-ist-last>(\d+[.,]\d+)</span>.*<span class="c-faceplate__price-currency"> EUR</span>',
-        html_content
-    )
-    if match:
-        return float(match.group(1).replace(",", ".").strip())
-    return None
 
+    SQL = """
+        INSERT INTO realtime_price (instrument_id, price, captured_at, capital_exchanged_percent)
+        VALUES (%s, %s, %s, %s)
+    """
 
-def fetch_capital_exchanged_from_html(html_content):
+    def __init__(self, db, logger, flush_size=REALTIME_FLUSH_SIZE, dry_run=False):
+        self.db = db
+        self.logger = logger
+        self.flush_size = max(1, flush_size)
+        self.dry_run = dry_run
+        self.rows = []
+        self.written = 0
+
+    def add(self, instrument_id, price, capital_exchanged, captured_at=None):
+        self.rows.append((instrument_id, price, captured_at or datetime.now(), capital_exchanged))
+        if len(self.rows) >= self.flush_size:
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Flush of {len(self.rows)} realtime prices failed, will retry: {e}")
+
+    def flush(self):
+        if not self.rows:
+            return 0
+        rows, count = self.rows, len(self.rows)
+        if self.dry_run:
+            self.logger.info(f"[DRY-RUN] SQL: {self.SQL.strip()} x {count} rows")
+            self.rows = []
+            return count
+        with self.db.transaction() as cur:
+            cur.executemany(self.SQL, rows)
+        self.rows = []
+        self.written += count
+        self.logger.info(f"Flushed {count} realtime prices")
+        return count
+
+
+class PriceChangeFilter:
     """
-    Extract 'capital échangé' percentage from HTML.
-    Returns float (0.02 for 0.02%) or None if not found.
+    Remember the last price written per instrument and decide whether a new
+    tick must be written: first tick of the day, changed price or capital
+    exchanged, or heartbeat interval elapsed.
     """
-    if not html_content:
-        return None
 
-    # Primary regex search
-    pattern = re.compile(
-        r'capital\s+échang(?:é|e)\b.*?<p[^>]*class=["\'][^"\']*c-list-info__value[^"\']*["\'][^>]*>\s*([\d\.,]+)\s*%',
-        re.IGNORECASE | re.DOTALL
-    )
-    m = pattern.search(html_content)
-    if m:
-        try:
-            return float(m.group(1).replace(",", ".").strip())
-        except ValueError:
-            logger.warning("Failed converting capital exchanged to float: '%s'", m.group(1))
-            return None
-
-    # Fallback: parse all <p class="c-list-info__value"> for percentage
-    soup = BeautifulSoup(html_content, "html.parser")
-    for p in soup.find_all("p", class_=lambda c: c and "c-list-info__value" in c):
-        txt = p.get_text()
-        m2 = re.search(r'([\d\.,]+)\s*%', txt)
-        if m2:
+    def __init__(self, logger, heartbeat_minutes=REALTIME_HEARTBEAT_MINUTES, cache_file=None):
+        self.logger = logger
+        self.heartbeat = timedelta(minutes=heartbeat_minutes)
+        self.cache_file = cache_file or None
+        self.last = {}  # instrument_id -> (price, capital_exchanged, written_at)
+        self.skipped = 0
+        self.loaded = False
+
+    @staticmethod
+    def _key(price, capital_exchanged):
+        # Same precision as realtime_price columns: decimal(12,4) / decimal(5,2)
+        return (round(float(price), 4),
+                None if capital_exchanged is None else round(float(capital_exchanged), 2))
+
+    def load(self, db):
+        """
+        Load the cache file, or seed from the last rows written today.
+        Only the first call of a process reads anything.
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.cache_file and os.path.exists(self.cache_file):
             try:
-                return float(m2.group(1).replace(",", ".").strip())
-            except ValueError:
-                logger.warning("Fallback failed converting percent '%s'", m2.group(1))
-                return None
-    return None
-
-
-def insert_realtime_price(cursor, instrument_id, price, capital_exchanged):
+                with open(self.cache_file) as f:
+                    for inst_id, (price, capital, written_at) in json.load(f).items():
+                        self.last[int(inst_id)] = (*self._key(price, capital),
+                                                   datetime.fromisoformat(written_at))
+                return
+            except (OSError, ValueError, TypeError) as e:
+                self.logger.warning(f"Ignoring unreadable price cache {self.cache_file}: {e}")
+                self.last = {}
+
+        sql = """
+            SELECT rp.instrument_id, rp.price, rp.capital_exchanged_percent, rp.captured_at
+            FROM realtime_price rp
+            JOIN (
+                SELECT instrument_id, MAX(captured_at) AS last_at
+                FROM realtime_price
+                WHERE captured_at >= %s
+                GROUP BY instrument_id
+            ) last ON last.instrument_id = rp.instrument_id AND last.last_at = rp.captured_at
+        """
+        with db.cursor() as cur:
+            cur.execute(sql, (datetime.now().replace(hour=0, minute=0, second=0, microsecond=0),))
+            for row in cur.fetchall():
+                self.last[row["instrument_id"]] = (
+                    *self._key(row["price"], row["capital_exchanged_percent"]), row["captured_at"]
+                )
+
+    def should_write(self, instrument_id, price, capital_exchanged, now):
+        last = self.last.get(instrument_id)
+        if last is None:
+            return True
+        last_price, last_capital, written_at = last
+        if written_at.date() != now.date():
+            return True
+        if (last_price, last_capital) != self._key(price, capital_exchanged):
+            return True
+        if now - written_at >= self.heartbeat:
+            return True
+        self.skipped += 1
+        return False
+
+    def mark(self, instrument_id, price, capital_exchanged, written_at):
+        self.last[instrument_id] = (*self._key(price, capital_exchanged), written_at)
+
+    def save(self):
+        if not self.cache_file:
+            return
+        data = {
+            str(inst_id): [price, capital, written_at.isoformat()]
+            for inst_id, (price, capital, written_at) in self.last.items()
+        }
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.cache_file)
+
+
+class IntradayBarAccumulator:
     """
-    Insert a new price record into the database.
+    In-memory 5-minute and hourly OHLC bars of the ticks of one sweep.
+
+    flush() merges them into price_bar_5m / price_bar_1h: open and close are
+    only replaced by ticks captured earlier / later than the stored ones
+    (first_at / last_at), so bars spanning several sweeps stay exact.
     """
-    sql = """
-        INSERT INTO realtime_price (instrument_id, price, captured_at, capital_exchanged_percent)
-        VALUES (%s, %s, %s, %s)
+
+    TABLES = {"price_bar_5m": 5, "price_bar_1h": 60}
+
+    SQL = """
+        INSERT INTO {table}
+            (instrument_id, bar_start, open_price, high_price, low_price, close_price,
+             tick_count, first_at, last_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            open_price = IF(VALUES(first_at) < first_at, VALUES(open_price), open_price),
+            close_price = IF(VALUES(last_at) >= last_at, VALUES(close_price), close_price),
+            high_price = GREATEST(high_price, VALUES(high_price)),
+            low_price = LEAST(low_price, VALUES(low_price)),
+            tick_count = tick_count + VALUES(tick_count),
+            first_at = LEAST(first_at, VALUES(first_at)),
+            last_at = GREATEST(last_at, VALUES(last_at))
     """
-    params = (instrument_id, price, datetime.now(), capital_exchanged)
-    if DRY_RUN:
-        logger.info(f"[DRY-RUN] SQL: {sql.strip()} with {params}")
-    else:
-        cursor.execute(sql, params)
+    # MariaDB applies the assignments left to right: first_at/last_at must be
+    # updated after open_price/close_price have been compared with them.
+
+    def __init__(self, db, logger, dry_run=False):
+        self.db = db
+        self.logger = logger
+        self.dry_run = dry_run
+        self.bars = {table: {} for table in self.TABLES}
+
+    @staticmethod
+    def bar_start(captured_at, minutes):
+        minute = captured_at.minute - captured_at.minute % minutes if minutes < 60 else 0
+        return captured_at.replace(minute=minute, second=0, microsecond=0)
+
+    def add(self, instrument_id, price, captured_at):
+        for table, minutes in self.TABLES.items():
+            key = (instrument_id, self.bar_start(captured_at, minutes))
+            bar = self.bars[table].get(key)
+            if bar is None:
+                # open, high, low, close, ticks, first_at, last_at
+                self.bars[table][key] = [price, price, price, price, 1, captured_at, captured_at]
+                continue
+            if captured_at < bar[5]:
+                bar[0], bar[5] = price, captured_at
+            if captured_at >= bar[6]:
+                bar[3], bar[6] = price, captured_at
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[4] += 1
+
+    def flush(self):
+        count = 0
+        for table, bars in self.bars.items():
+            if not bars:
+                continue
+            sql = self.SQL.format(table=table)
+            rows = [(inst_id, start, *bar) for (inst_id, start), bar in bars.items()]
+            if self.dry_run:
+                self.logger.info(f"[DRY-RUN] SQL: upsert {table} x {len(rows)} bars")
+            else:
+                with self.db.transaction() as cur:
+                    cur.executemany(sql, rows)
+            bars.clear()
+            count += len(rows)
+        if count and not self.dry_run:
+            self.logger.info(f"Merged {count} intraday bars")
+        return count
+
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(128 + signum)
 
 # -----------------------------
 # Main updater class
 # -----------------------------
 class RealtimePriceUpdater:
-    def __init__(self, db, logger):
+    def __init__(self, db, logger, dry_run=False, concurrency=HTTP_CONCURRENCY, stream=False,
+                 flush_size=REALTIME_FLUSH_SIZE, skip_unchanged=False, http=None, close_db=True,
+                 providers=None, bars=REALTIME_BARS, stop_event=None):
         self.db = db
         self.logger = logger
-
-    def run(self):
+        self.dry_run = dry_run
+        self.concurrency = max(1, concurrency)
+        self.stream = stream
+        # Long-running callers (price_scheduler) keep the connection open between sweeps
+        self.close_db = close_db
+        # ...and own SIGTERM: their stop flag ends the sweep between instruments
+        self.stop_event = stop_event
+        self.http = http or get_session_pool(
+            pool_size=HTTP_POOL_SIZE,
+            rate_limit={
+                "rate": HTTP_RATE_LIMIT,
+                "burst": HTTP_RATE_BURST,
+                "failure_threshold": HTTP_BREAKER_THRESHOLD,
+                "reset_timeout": HTTP_BREAKER_COOLDOWN,
+            },
+        )
+        self.providers = providers or create_providers(
+            PRICE_PROVIDERS,
+            http=self.http,
+            url_pattern=BOURSORAMA_URL_PATTERN,
+            categories=BOURSORAMA_CATEGORIES,
+            timeout=HTTP_TIMEOUT,
+            stream=stream,
+            chunk_size=HTTP_STREAM_CHUNK,
+            directory=PRICE_PROVIDER_DIR,
+        )
+        self.writer = RealtimePriceWriter(db, logger, flush_size=flush_size, dry_run=dry_run)
+        self.bars = IntradayBarAccumulator(db, logger, dry_run=dry_run) if bars else None
+        self.change_filter = (
+            PriceChangeFilter(logger, cache_file=REALTIME_CACHE_FILE) if skip_unchanged else None
+        )
+
+    def fetch_instruments(self, types=None, scope="all"):
+        """
+        Select the ACTIVE instruments to poll, with their type and a `held`
+        flag (net BUY - SELL quantity of active orders > 0, all accounts).
+
+        scope: "all", "held" (held positions only) or "watch" (not held).
+        """
+        sql = """
+            SELECT i.id, i.symbol, i.label, COALESCE(i.type, 'OTHER') AS type,
+                   COALESCE(h.net_qty, 0) > 0 AS held
+            FROM instrument i
+            LEFT JOIN (
+                SELECT instrument_id,
+                       SUM(CASE WHEN order_type = 'BUY' THEN quantity ELSE -quantity END) AS net_qty
+                FROM order_transaction
+                WHERE status = 'ACTIVE'
+                GROUP BY instrument_id
+            ) h ON h.instrument_id = i.id
+            WHERE i.status = 'ACTIVE'
+        """
+        params = ()
+        if types:
+            sql += f" AND COALESCE(i.type, 'OTHER') IN ({', '.join(['%s'] * len(types))})"
+            params = tuple(types)
+        with self.db.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        for row in rows:
+            row["held"] = bool(row["held"])
+        if scope == "held":
+            return [r for r in rows if r["held"]]
+        if scope == "watch":
+            return [r for r in rows if not r["held"]]
+        return rows
+
+    def run(self, async_mode=False, types=None, scope="all", instruments=None):
+        """
+        Run one sweep over the selected instruments (see fetch_instruments), or
+        over `instruments` when the caller already made the selection.
+        """
+        # Standalone run: turn SIGTERM into SystemExit so the final flush below
+        # still runs. A handler installed by the caller (price_scheduler) is kept.
+        previous_handler = signal.getsignal(signal.SIGTERM)
+        if previous_handler == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _raise_system_exit)
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT id, symbol, label FROM instrument")
-            instruments = cursor.fetchall()
+            if instruments is None:
+                instruments = self.fetch_instruments(types, scope)
             if not instruments:
-                self.logger.warning("No instruments found in DB")
+                self.logger.warning("No active instruments to poll")
                 return
+            held = sum(1 for instr in instruments if instr.get("held"))
+            self.logger.info(
+                f"Polling {len(instruments)} instruments ({held} held, {len(instruments) - held} watch-only)"
+            )
+
+            if self.change_filter:
+                self.change_filter.load(self.db)
+
+            instruments = self.fetch_batches(instruments)
 
-            for instr in instruments:
-                self.update_instrument(instr, cursor)
+            if async_mode:
+                asyncio.run(self.run_async(instruments))
+            else:
+                for instr in instruments:
+                    if self.stopping():
+                        break
+                    self.update_instrument(instr)
 
         except Exception as e:
             self.logger.error("Unexpected error: %s", e)
         finally:
-            self.db.close()
+            if self.stopping():
+                self.logger.info("Stop requested, sweep ended early")
+            try:
+                self.writer.flush()
+            except Exception as e:
+                self.logger.error(f"Final flush failed, {len(self.writer.rows)} prices lost: {e}")
+            if self.bars:
+                try:
+                    self.bars.flush()
+                except Exception as e:
+                    self.logger.error(f"Intraday bars flush failed: {e}")
+            if self.change_filter and not self.writer.rows and not self.dry_run:
+                self.logger.info(f"{self.change_filter.skipped} unchanged prices skipped")
+                try:
+                    self.change_filter.save()
+                except OSError as e:
+                    self.logger.warning(f"Could not save price cache: {e}")
+            if previous_handler == signal.SIG_DFL:
+                signal.signal(signal.SIGTERM, previous_handler)
+            if self.close_db:
+                self.db.close()
+            self.http.log_stats(self.logger)
             self.logger.info("=== Realtime Price Update Completed ===")
 
-    def update_instrument(self, instr, cursor):
+    # -----------------------------
+    # Providers
+    # -----------------------------
+    def providers_for(self, instr):
+        """
+        Failover chain of `instr`: cheapest provider first. Providers already
+        tried by fetch_batches() are removed from it.
+        """
+        if "providers" not in instr:
+            instr["providers"] = select_providers(self.providers, instr.get("type", "OTHER"))
+        return instr["providers"]
+
+    def fetch_batches(self, instruments):
+        """
+        Serve instruments whose cheapest provider is batch-capable with one
+        request per batch_size symbols. Returns the instruments left for the
+        per-instrument fetch (provider failed or did not know the symbol).
+        """
+        groups = {}
+        for instr in instruments:
+            chain = self.providers_for(instr)
+            if chain and chain[0].batch_size > 1:
+                groups.setdefault(chain[0], []).append(instr)
+        if not groups:
+            return instruments
+
+        served = set()
+        for provider, group in groups.items():
+            for start in range(0, len(group), provider.batch_size):
+                batch = group[start:start + provider.batch_size]
+                if self.dry_run:
+                    self.logger.info(f"[DRY-RUN] Fetching {len(batch)} symbols from {provider.name}")
+                try:
+                    quotes = provider.fetch(batch)
+                except requests.RequestException as e:
+                    self.logger.warning(f"Batch of {len(batch)} from {provider.name} failed: {e}")
+                    quotes = {}
+                for instr in batch:
+                    instr["providers"] = instr["providers"][1:]
+                    quote = quotes.get(instr["id"])
+                    if quote is not None and quote.price is not None:
+                        self.process_quote(instr, quote)
+                        served.add(instr["id"])
+            self.logger.info(f"{provider.name}: {len(group)} symbols requested in batches")
+        remaining = []
+        for instr in instruments:
+            if instr["id"] in served:
+                continue
+            if instr["providers"]:
+                remaining.append(instr)
+            else:
+                self.logger.error(f"No price found for {instr['symbol']} and no failover provider")
+        return remaining
+
+    def fetch_quote(self, instr):
+        """
+        Fetch `instr` from its providers in failover order and return the
+        first Quote with a price (or the last Quote without one). Returns None
+        when every provider answered that it does not know the symbol (not
+        retried); raises the last error when a provider failed.
+        """
+        chain = self.providers_for(instr)
+        if not chain:
+            raise ProviderError(f"No provider left for {instr['symbol']}")
+        quote, error = None, None
+        for provider in chain:
+            if self.dry_run:
+                self.logger.info(f"[DRY-RUN] Fetching {provider.describe(instr)}")
+            try:
+                quote = provider.fetch([instr]).get(instr["id"])
+            except requests.RequestException as e:
+                if not isinstance(e, CircuitOpenError):
+                    self.logger.warning(f"{provider.name} failed for {instr['symbol']}: {e}")
+                if error is None or isinstance(error, CircuitOpenError):
+                    error = e
+                continue
+            if quote is not None and quote.price is not None:
+                return quote
+        if quote is not None:
+            return quote
+        if error is not None:
+            raise error
+        return None
+
+    def process_quote(self, instr, quote):
+        """
+        Log and store a parsed quote.
+        A symbol no provider knows (quote None) or a page without price is
+        logged and not retried.
+        """
+        symbol = instr["symbol"]
+        if quote is None:
+            self.logger.error(f"{symbol} unknown to {', '.join(p.name for p in self.providers_for(instr))}")
+            return
+        price, currency, capital_exchanged = quote
+        if price is None:
+            self.logger.error(f"No price found for {symbol}")
+            return
+        currency = currency or DEFAULT_CURRENCY
+        if currency != DEFAULT_CURRENCY:
+            self.logger.error(f"Unexpected currency {currency} for {symbol}, price ignored")
+            return
+
+        self.logger.info(f"{symbol} ({instr['label']}): {price} {currency}, capital_exchanged={capital_exchanged}")
+
+        now = datetime.now()
+        if self.bars:
+            # Bars see every tick, including unchanged ones skipped below
+            self.bars.add(instr["id"], price, now)
+        if self.change_filter:
+            if not self.change_filter.should_write(instr["id"], price, capital_exchanged, now):
+                self.logger.debug(f"{symbol}: unchanged, not written")
+                return
+            self.change_filter.mark(instr["id"], price, capital_exchanged, now)
+        self.writer.add(instr["id"], price, capital_exchanged, captured_at=now)
+
+    def update_instrument(self, instr):
         symbol = instr["symbol"]
-        instrument_id = instr["id"]
-        url = BOURSORAMA_URL_PATTERN.format(category="trackers", symbol=symbol)
 
         for attempt in range(HTTP_RETRIES):
             try:
-                if DRY_RUN:
-                    self.logger.info(f"[DRY-RUN] Fetching URL: {url}")
-                response = requests.get(url, timeout=HTTP_TIMEOUT)
-                if response.status_code != 200:
-                    self.logger.warning(f"HTTP {response.status_code} for {url}")
-                    time.sleep(1)
-                    continue
-
-                html_content = response.text
-                price = fetch_price_from_html(html_content)
-                if price is None:
-                    self.logger.error(f"No price found for {symbol}")
-                    break  # stop retries if price not found
-
-                capital_exchanged = fetch_capital_exchanged_from_html(html_content)
-                self.logger.info(f"{symbol} ({instr['label']}): {price} EUR, capital_exchanged={capital_exchanged}")
-
-                if not DRY_RUN:
-                    insert_realtime_price(cursor, instrument_id, price, capital_exchanged)
-
+                quote = self.fetch_quote(instr)
+                self.process_quote(instr, quote)
                 break  # successful fetch, exit retry loop
 
+            except CircuitOpenError as e:
+                self.logger.error(f"Skipping {symbol}: {e}")
+                return
             except requests.RequestException as e:
                 self.logger.warning(f"Attempt {attempt+1}/{HTTP_RETRIES} failed for {symbol}: {e}")
                 time.sleep(1)
         else:
             self.logger.error(f"Failed to fetch {symbol} after {HTTP_RETRIES} attempts")
 
+    # -----------------------------
+    # Async fetch engine
+    # -----------------------------
+    async def run_async(self, instruments):
+        """
+        Fetch all instruments concurrently, at most `self.concurrency` requests
+        in flight. Blocking HTTP calls and parsing run in worker threads; DB
+        writes stay on the event loop thread (the DB connection is not shared).
+        A fetch holds its semaphore slot until its thread returns: the HTTP
+        timeout is enforced by requests inside the thread, never by abandoning
+        a running thread, so the executor always has a free worker per slot.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="fetch")
+        )
+        started = time.monotonic()
+        self.logger.info(f"Async fetch of {len(instruments)} instruments (concurrency={self.concurrency})")
+        await asyncio.gather(
+            *(self.update_instrument_async(instr, semaphore) for instr in instruments)
+        )
+        self.logger.info(f"Async sweep finished in {time.monotonic() - started:.1f}s")
+
+    def stopping(self):
+        """True once the caller's stop flag is set: the sweep ends early."""
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    async def update_instrument_async(self, instr, semaphore):
+        if self.stopping():
+            return
+        symbol = instr["symbol"]
+
+        for attempt in range(HTTP_RETRIES):
+            try:
+                async with semaphore:
+                    quote = await asyncio.to_thread(self.fetch_quote, instr)
+                self.process_quote(instr, quote)
+                return
+
+            except CircuitOpenError as e:
+                self.logger.error(f"Skipping {symbol}: {e}")
+                return
+            except requests.RequestException as e:
+                self.logger.warning(f"Attempt {attempt+1}/{HTTP_RETRIES} failed for {symbol}: {e!r}")
+
+            # Backoff outside the semaphore so other instruments can use the slot
+            if attempt + 1 < HTTP_RETRIES:
+                await asyncio.sleep(HTTP_BACKOFF * (2 ** attempt))
+
+        self.logger.error(f"Failed to fetch {symbol} after {HTTP_RETRIES} attempts")
+
 
 # -----------------------------
 # Entry point
 # -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="CashCue Realtime Price Updater")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Simulate execution without writing to the database. Overrides config DRY_RUN."
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_mode",
+        action="store_true",
+        help="Fetch instruments concurrently (asyncio). Overrides config REALTIME_FETCH_MODE."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=HTTP_CONCURRENCY,
+        help="Maximum number of in-flight HTTP requests in async mode (default: HTTP_CONCURRENCY)."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read quote pages in chunks and stop once all fields are found. Overrides config HTTP_STREAM."
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="Do not write a price identical to the last one written, except as a periodic heartbeat. "
+             "Overrides config REALTIME_SKIP_UNCHANGED."
+    )
+    parser.add_argument(
+        "--scope",
+        choices=("all", "held", "watch"),
+        default="all",
+        help="Poll all ACTIVE instruments, only held positions, or only watch-only instruments."
+    )
+    args = parser.parse_args()
+    dry_run = args.dry_run or config.get("DRY_RUN", "false").lower() == "true"
+    async_mode = args.async_mode or config.get("REALTIME_FETCH_MODE", "sync").lower() == "async"
+    stream = args.stream or config.get("HTTP_STREAM", "false").lower() == "true"
+    skip_unchanged = args.skip_unchanged or config.get("REALTIME_SKIP_UNCHANGED", "false").lower() == "true"
+
+    logger = LoggerManager(log_file=LOG_FILE, level=APP_LOG_LEVEL).get_logger()
+    if dry_run:
+        logger.info("=== Running in DRY-RUN mode ===")
+
+    db = DatabaseConnection(DB_HOST, DB_USER, DB_PASS, DB_NAME, DB_PORT)
+    updater = RealtimePriceUpdater(db, logger, dry_run=dry_run, concurrency=args.concurrency,
+                                   stream=stream, skip_unchanged=skip_unchanged)
+    updater.run(async_mode=async_mode, scope=args.scope)
+
+
 if __name__ == "__main__":
-    updater = RealtimePriceUpdater(db, logger)
-    updater.run()
+    main()
@@ -1,5 +1,5 @@
 # cashcue_core/main.py
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException
 from typing import List
 from sqlalchemy.orm import Session
 from cashcue_core.models import Base, Instrument
@@ -7,6 +7,8 @@ from cashcue_core.db import engine, get_db
 from cashcue_core.repositories import InstrumentRepository
 from cashcue_core.services import InstrumentService
 from lib.config import ConfigManager  # optional if you need ConfigManager
+from lib.db import DatabaseConnection
+from lib.prices import LatestPriceResolver, valuation_price
 
 
 # Create tables (dev mode)
@@ -14,6 +16,19 @@ Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="CashCue Core API")
 
+# Latest prices shared by all requests, refreshed after PRICE_CACHE_TTL seconds
+config = ConfigManager()
+price_resolver = LatestPriceResolver(
+    DatabaseConnection(
+        host=config.get("DB_HOST", "localhost"),
+        user=config.get("DB_USER"),
+        password=config.get("DB_PASS"),
+        database=config.get("DB_NAME"),
+        port=int(config.get("DB_PORT", 3306))
+    ),
+    ttl=config.get_int("PRICE_CACHE_TTL", 60)
+)
+
 def get_service(db: Session = Depends(get_db)):
     repo = InstrumentRepository(db)
     return InstrumentService(repo)
@@ -27,3 +42,23 @@ def list_instruments(service: InstrumentService = Depends(get_service)):
 def create_instrument(symbol: str, label: str, service: InstrumentService = Depends(get_service)):
     instr = service.add_instrument(symbol, label)
     return {"id": instr.id, "symbol": instr.symbol, "label": instr.label}
+
+@app.get("/prices/latest")
+def latest_prices(ids: str):
+    """
+    Latest close / tick of instruments, e.g. /prices/latest?ids=1,2,3
+    """
+    try:
+        instrument_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    return {
+        instr_id: {
+            "price": valuation_price(latest),
+            "close": latest.close,
+            "close_date": latest.close_date,
+            "tick": latest.tick,
+            "tick_at": latest.tick_at,
+        }
+        for instr_id, latest in price_resolver.resolve(instrument_ids).items()
+    }
@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# Effect of each cash_transaction type on the cash balance, as a multiplier of
+# the stored amount. The web API stores amounts signed (BUY, WITHDRAWAL and
+# FEES negative, SELL, DEPOSIT and DIVIDEND positive, reversals with the
+# opposite sign; see docs/CASHCUE_ACCOUNTING_AND_MANAGEMENT_RULES.md), so every
+# type counts as stored: the balance is SUM(amount), the rule that maintains
+# cash_account.current_balance. Types missing here count 0 and are reported.
+# The cash_running_balance triggers (adm/migrations/007) add the amount as is:
+# a multiplier other than 1 would have to be applied there too.
+CASH_EFFECTS = {
+    "DEPOSIT": 1,
+    "WITHDRAWAL": 1,
+    "BUY": 1,
+    "SELL": 1,
+    "DIVIDEND": 1,
+    "FEES": 1,
+    "ADJUSTMENT": 1,
+}
+
+# Content fingerprint of a set of cash_transaction rows `t`: BIT_XOR of one
+# CRC32 per row, so the fingerprint of rows a and b is fp(a) ^ fp(b). Any
+# insert, delete or edit of id, amount, type or date changes it.
+CASH_FINGERPRINT = "CRC32(CONCAT_WS('|', t.id, t.amount, t.type, t.date))"
+
+
+def cash_effect(ttype, amount):
+    """
+    Effect of one transaction on the balance (Decimal 0 for unknown types).
+    """
+    return Decimal(amount) * CASH_EFFECTS.get(ttype, 0)
+
+
+def cash_effect_sql(amount="amount", ttype="type"):
+    """
+    SQL expression of cash_effect() over the given columns. With every
+    multiplier at 1 it equals the amount for each known type: the CASE
+    mainly keeps unknown types at 0 (and reported, see cash_totals_sql) and
+    keeps SQL and Python on the one CASH_EFFECTS table.
+    """
+    whens = " ".join(f"WHEN '{t}' THEN {amount} * {m}" for t, m in CASH_EFFECTS.items())
+    return f"(CASE {ttype} {whens} ELSE 0 END)"
+
+
+def cash_totals_sql(join="", where=""):
+    """
+    One row per broker account: balance, per-type totals (one column per
+    CASH_EFFECTS type), row count, last id/date, content fingerprint (see
+    CASH_FINGERPRINT) and the number of rows of unknown type, over
+    cash_transaction aliased `t`.
+    """
+    effect = cash_effect_sql("t.amount", "t.type")
+    known = ", ".join(f"'{t}'" for t in CASH_EFFECTS)
+    per_type = ",\n               ".join(
+        f"COALESCE(SUM(CASE WHEN t.type = '{t}' THEN {effect} ELSE 0 END), 0) AS `{t}`"
+        for t in CASH_EFFECTS
+    )
+    return f"""
+        SELECT t.broker_account_id,
+               COALESCE(SUM({effect}), 0) AS balance,
+               COUNT(*) AS tx_count,
+               MAX(t.id) AS last_tx_id,
+               MAX(t.date) AS last_tx_date,
+               COALESCE(BIT_XOR({CASH_FINGERPRINT}), 0) AS fingerprint,
+               COALESCE(SUM(t.type NOT IN ({known})), 0) AS unknown_count,
+               {per_type}
+        FROM cash_transaction t
+        {join}
+        {where}
+        GROUP BY t.broker_account_id
+    """
+
+
+def load_cash_totals(db, join="", where="", params=()):
+    """
+    Run cash_totals_sql() and return {broker_account_id: dict} with keys
+    balance, tx_count, last_tx_id, last_tx_date, fingerprint, unknown_count
+    and totals ({type: Decimal}).
+    """
+    with db.cursor() as cur:
+        cur.execute(cash_totals_sql(join, where), params)
+        rows = cur.fetchall()
+    return {
+        row["broker_account_id"]: {
+            "balance": Decimal(row["balance"]),
+            "tx_count": row["tx_count"],
+            "last_tx_id": row["last_tx_id"],
+            "last_tx_date": row["last_tx_date"],
+            "fingerprint": int(row["fingerprint"]),
+            "unknown_count": int(row["unknown_count"]),
+            "totals": {t: Decimal(row[t]) for t in CASH_EFFECTS},
+        }
+        for row in rows
+    }
+
+
+def balance_as_of(db, broker_account_id, when=None):
+    """
+    Cash balance of an account right after its last transaction dated at or
+    before `when` (a date covers the whole day, None = latest): one indexed
+    lookup in cash_running_balance (Decimal 0 when there is none).
+    """
+    condition, params = "", [broker_account_id]
+    if isinstance(when, date) and not isinstance(when, datetime):
+        condition = "AND date < %s"
+        params.append(datetime.combine(when, datetime.min.time()) + timedelta(days=1))
+    elif when is not None:
+        condition = "AND date <= %s"
+        params.append(when)
+    sql = f"""
+        SELECT balance
+        FROM cash_running_balance
+        WHERE broker_account_id = %s {condition}
+        ORDER BY date DESC, transaction_id DESC
+        LIMIT 1
+    """
+    with db.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    return Decimal(row["balance"]) if row else Decimal("0.00")
@@ -1,5 +1,6 @@
 import pymysql
 import logging
+from contextlib import contextmanager
 
 class DatabaseConnection:
     """
@@ -35,11 +36,63 @@ class DatabaseConnection:
             self.connect()
         return self.conn.cursor()
 
+    def ping(self):
+        """
+        Make sure the connection is alive, reconnecting if the server dropped
+        it (e.g. wait_timeout on a long-running process).
+        """
+        if not self.conn:
+            self.connect()
+        else:
+            self.conn.ping(reconnect=True)
+
+    def stream(self, query, params=None, chunk_size=1000):
+        """
+        Yield the rows of a SELECT one by one from a server-side (unbuffered)
+        cursor, fetched chunk_size at a time: client memory stays bounded by
+        the chunk instead of the whole result set.
+
+        The connection is busy until the generator is exhausted or closed;
+        run other queries on it only after the loop (or use another
+        DatabaseConnection).
+        """
+        if not self.conn:
+            self.connect()
+        cur = self.conn.cursor(pymysql.cursors.SSDictCursor)
+        try:
+            cur.execute(query, params or ())
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cur.close()
+
     def execute(self, query, params=None):
         with self.cursor() as cur:
             cur.execute(query, params or ())
             return cur
 
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block in one explicit transaction, even on the autocommit
+        connection: commit on success, rollback on error.
+        """
+        if not self.conn:
+            self.connect()
+        self.conn.begin()
+        cur = self.conn.cursor()
+        try:
+            yield cur
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cur.close()
+
     def close(self):
         if self.conn:
             self.conn.close()
@@ -0,0 +1,151 @@
+import re
+from collections import namedtuple
+
+Quote = namedtuple("Quote", ["price", "currency", "capital_exchanged"])
+
+# Literal markers are located with str.find (C speed, no regex backtracking over
+# the whole page, no DOM tree); the precompiled patterns are then only matched
+# *at* each marker. Each field stops scanning at its first valid match.
+_PRICE_MARKER = '<span class="c-instrument c-instrument--last" data-ist-last>'
+_PRICE_RE = re.compile(r'(\d+[.,]\d+)</span>')
+
+_CURRENCY_MARKER = '<span class="c-faceplate__price-currency">'
+_CURRENCY_RE = re.compile(r'\s*([A-Z]{3})\s*</span>')
+
+_LABEL_MARKERS = ("apital", "APITAL")
+_LABEL_RE = re.compile(r'capital\s+échang(?:é|e)\b', re.IGNORECASE)
+
+_VALUE_MARKER = "c-list-info__value"
+
+# When fed a growing buffer, scans resume this many characters before the end
+# of the previous buffer so a tag split across two chunks is seen again whole.
+_RESCAN_WINDOW = 512
+_VALUE_RE = re.compile(
+    r'<p[^>]*class=["\'][^"\']*c-list-info__value[^"\']*["\'][^>]*>\s*([\d\.,]+)\s*%'
+)
+
+
+def _to_float(value):
+    try:
+        return float(value.replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+class QuoteExtractor:
+    """
+    Marker-driven extractor for price, currency and "capital échangé" percentage.
+
+    `feed()` may be called repeatedly with a growing buffer (streamed pages):
+    each field resumes scanning close to where the previous call stopped.
+
+    Rules (same as the former regex + BeautifulSoup implementation):
+    - price: the `data-ist-last` span
+    - currency: first currency span following the price
+    - capital exchanged: first `c-list-info__value` percentage after the
+      "capital échangé" label; if the label is missing, the first
+      `c-list-info__value` percentage of the page
+    """
+
+    def __init__(self):
+        self.price = None
+        self.currency = None
+        self.capital_exchanged = None
+        self._price_pos = None
+        self._label_pos = None
+        self._first_pct = None
+        # Resume offsets for incremental feeding
+        self._price_from = 0
+        self._currency_from = 0
+        self._label_from = 0
+        self._value_from = 0
+
+    @property
+    def complete(self):
+        return (self.price is not None
+                and self.currency is not None
+                and self.capital_exchanged is not None)
+
+    def feed(self, text):
+        """
+        Scan `text`, the whole document or the document received so far.
+        """
+        if self.price is None:
+            self._scan_price(text)
+        if self.price is not None and self.currency is None:
+            self._scan_currency(text)
+        if self.capital_exchanged is None:
+            if self._label_pos is None:
+                self._scan_label(text)
+            self._scan_values(text)
+        return self
+
+    @staticmethod
+    def _resume_at(text):
+        return max(0, len(text) - _RESCAN_WINDOW)
+
+    def _scan_price(self, text):
+        i = text.find(_PRICE_MARKER, self._price_from)
+        while i != -1:
+            m = _PRICE_RE.match(text, i + len(_PRICE_MARKER))
+            if m:
+                self.price = _to_float(m.group(1))
+                self._price_pos = m.end()
+                return
+            i = text.find(_PRICE_MARKER, i + 1)
+        self._price_from = self._resume_at(text)
+
+    def _scan_currency(self, text):
+        i = text.find(_CURRENCY_MARKER, max(self._price_pos, self._currency_from))
+        while i != -1:
+            m = _CURRENCY_RE.match(text, i + len(_CURRENCY_MARKER))
+            if m:
+                self.currency = m.group(1)
+                return
+            i = text.find(_CURRENCY_MARKER, i + 1)
+        self._currency_from = self._resume_at(text)
+
+    def _scan_label(self, text):
+        for marker in _LABEL_MARKERS:
+            i = text.find(marker, max(1, self._label_from))
+            while i > 0:
+                if _LABEL_RE.match(text, i - 1):
+                    if self._label_pos is None or i - 1 < self._label_pos:
+                        self._label_pos = i - 1
+                    break
+                i = text.find(marker, i + 1)
+        if self._label_pos is None:
+            self._label_from = self._resume_at(text)
+
+    def _scan_values(self, text):
+        i = text.find(_VALUE_MARKER, self._value_from)
+        while i != -1:
+            start = text.rfind("<", 0, i)
+            m = _VALUE_RE.match(text, start) if start != -1 else None
+            if m:
+                value = _to_float(m.group(1))
+                if value is not None:
+                    if self._first_pct is None:
+                        self._first_pct = value
+                    if self._label_pos is not None and start > self._label_pos:
+                        self.capital_exchanged = value
+                        return
+            i = text.find(_VALUE_MARKER, i + 1)
+        self._value_from = self._resume_at(text)
+
+    def result(self):
+        capital = self.capital_exchanged
+        if capital is None:
+            capital = self._first_pct
+        return Quote(self.price, self.currency, capital)
+
+
+def extract_quote(html_content):
+    """
+    Extract a Quote(price, currency, capital_exchanged) from a quote page.
+    Missing fields are None.
+    """
+    extractor = QuoteExtractor()
+    if html_content:
+        extractor.feed(html_content)
+    return extractor.result()
@@ -1,36 +1,94 @@
-import re
+import codecs
 import time
 import requests
 import logging
 
+from lib.extractor import QuoteExtractor, extract_quote
+from lib.http_pool import get_session_pool
+
+STREAM_CHUNK_SIZE = 16384
+
+# {category} of a quote URL pattern per instrument type (BOURSORAMA_CATEGORIES)
+DEFAULT_CATEGORIES = {
+    "STOCK": "actions",
+    "ETF": "trackers",
+    "BOND": "obligations",
+    "FUND": "opcvm",
+    "OTHER": "trackers",
+}
+
+
+def parse_categories(value):
+    """'STOCK:actions,ETF:trackers' -> DEFAULT_CATEGORIES with these entries replaced"""
+    categories = dict(DEFAULT_CATEGORIES)
+    for item in (value or "").split(","):
+        if ":" in item:
+            typ, category = item.split(":", 1)
+            categories[typ.strip().upper()] = category.strip()
+    return categories
+
+
+def url_category(categories, instrument_type):
+    """URL category of an instrument type; unknown or missing types use OTHER."""
+    return categories.get(instrument_type) or categories["OTHER"]
+
+
+def read_quote_streamed(response, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Read a `stream=True` response chunk by chunk and feed the extractor.
+
+    The connection is closed as soon as price, currency and capital exchanged
+    are known, so the rest of the page is never downloaded nor decoded. If the
+    markers are never all seen, the whole body is read (same result as a full
+    read). Note: a connection closed early is not returned to the keep-alive pool.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    extractor = QuoteExtractor()
+    buffer = ""
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            buffer += decoder.decode(chunk)
+            extractor.feed(buffer)
+            if extractor.complete:
+                break
+        else:
+            buffer += decoder.decode(b"", final=True)
+            extractor.feed(buffer)
+    finally:
+        response.close()
+    return extractor.result()
+
+
 class PriceFetcher:
     """
     Fetch stock/ETF prices and related information from external sources.
     """
 
-    def __init__(self, url_pattern, retries=3, timeout=10):
+    def __init__(self, url_pattern, retries=3, timeout=10, session=None, stream=False, categories=None):
         self.url_pattern = url_pattern
+        self.categories = categories or DEFAULT_CATEGORIES
         self.retries = retries
         self.timeout = timeout
+        self.stream = stream
+        # Shared keep-alive pool unless a dedicated one is given
+        self.session = session or get_session_pool()
 
-    def fetch_price(self, symbol):
-        url = self.url_pattern.format(category="trackers", symbol=symbol)
+    def fetch_price(self, symbol, instrument_type=None):
+        category = url_category(self.categories, instrument_type)
+        url = self.url_pattern.format(category=category, symbol=symbol)
         for attempt in range(self.retries):
             try:
-                response = requests.get(url, timeout=self.timeout)
+                response = self.session.get(url, timeout=self.timeout, stream=self.stream)
                 if response.status_code == 200:
-                    html_content = response.text
-                    # Extract price
-                    match = re.search(
-                        r'<span class="c-instrument c-instrument--last" data-ist-last>(\d+[.,]\d+)</span>',
-                        html_content
-                    )
-                    if match:
-                        return float(match.group(1).replace(",", ".").strip())
+                    if self.stream:
+                        price = read_quote_streamed(response).price
                     else:
+                        price = extract_quote(response.text).price
+                    if price is None:
                         logging.warning(f"No price found for {symbol}")
-                        return None
+                    return price
                 else:
+                    response.close()
                     logging.warning(f"HTTP status {response.status_code} for {symbol}")
             except requests.RequestException as e:
                 logging.warning(f"Attempt {attempt+1}/{self.retries} failed for {symbol}: {e}")
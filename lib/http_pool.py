@@ -0,0 +1,143 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lib.ratelimit import HostRateLimiter
+
+try:
+    # urllib3 only decodes brotli bodies when one of these is installed
+    import brotli  # noqa: F401
+    _BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _BROTLI = True
+    except ImportError:
+        _BROTLI = False
+
+
+class HttpSessionPool:
+    """
+    Shared keep-alive HTTP session with a bounded connection pool.
+
+    - One requests.Session, so TCP/TLS connections are reused across symbols
+    - pool_size connections kept per host (should be >= fetch concurrency)
+    - gzip/deflate (and brotli when available) content negotiation
+    - connection reuse metrics read from the urllib3 pools
+    - optional per-host rate limiter / circuit breaker (lib.ratelimit)
+    """
+
+    def __init__(self, pool_size=10, user_agent="CashCue/1.0", rate_limiter=None):
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter
+        self.rate_limit = None  # HostRateLimiter settings, when built by get_session_pool()
+        self.session = requests.Session()
+        # One adapter mounted for both schemes: its pools are counted once in stats()
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=False,
+            max_retries=0,
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({
+            "User-Agent": user_agent,
+            "Accept-Encoding": "gzip, deflate, br" if _BROTLI else "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+
+    def get(self, url, timeout=10, **kwargs):
+        """
+        GET through the shared session. With a rate limiter, waits for a
+        token first and raises CircuitOpenError while the host circuit is open.
+        """
+        if self.rate_limiter is None:
+            with self._lock:
+                self.requests_sent += 1
+            return self.session.get(url, timeout=timeout, **kwargs)
+
+        self.rate_limiter.before_request(url)
+        with self._lock:
+            self.requests_sent += 1
+        try:
+            response = self.session.get(url, timeout=timeout, **kwargs)
+        except Exception:
+            self.rate_limiter.after_request(url)
+            raise
+        self.rate_limiter.after_request(url, response.status_code)
+        return response
+
+    def stats(self):
+        """
+        Return connection reuse counters:
+        requests, connections opened, requests served on a reused connection.
+        """
+        opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        requests_sent = self.requests_sent
+        stats = {
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(0, requests_sent - opened),
+        }
+        if self.rate_limiter is not None:
+            stats.update(self.rate_limiter.stats())
+        return stats
+
+    def log_stats(self, logger=None):
+        stats = self.stats()
+        (logger or logging).info(
+            f"HTTP pool: {stats['requests']} requests, "
+            f"{stats['connections_opened']} connections opened, "
+            f"{stats['connections_reused']} reused (pool_size={self.pool_size})"
+        )
+        if self.rate_limiter is not None:
+            (logger or logging).info(
+                f"HTTP limiter: {stats['throttled']} throttled "
+                f"({stats['throttled_seconds']:.1f}s waited), "
+                f"{stats['rejected']} rejected (circuit open), "
+                f"{stats['recovered']} recovered"
+            )
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_session_pool(pool_size=None, rate_limit=None):
+    """
+    Return the process-wide HttpSessionPool, creating it on first use.
+
+    - pool_size: connections per host (default 10), only used on creation
+    - rate_limit: HostRateLimiter keyword arguments; the limiter is built
+      once, with the pool or by the first call asking for one
+    Later calls with other settings keep the pool in place and log a warning.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = HttpSessionPool(pool_size=pool_size or 10)
+        elif pool_size is not None and pool_size != _shared_pool.pool_size:
+            logging.warning(f"HTTP pool already created with pool_size={_shared_pool.pool_size}, "
+                            f"ignoring pool_size={pool_size}")
+        if rate_limit:
+            if _shared_pool.rate_limiter is None:
+                _shared_pool.rate_limiter = HostRateLimiter(**rate_limit)
+                _shared_pool.rate_limit = dict(rate_limit)
+            elif rate_limit != _shared_pool.rate_limit:
+                logging.warning(f"HTTP pool already rate limited with {_shared_pool.rate_limit}, "
+                                f"ignoring {rate_limit}")
+        return _shared_pool
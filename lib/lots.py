@@ -0,0 +1,326 @@
+import json
+from collections import deque
+from decimal import Decimal
+
+ZERO = Decimal("0")
+
+
+def effective_orders(alias=None):
+    """
+    SQL condition keeping the orders that count in positions and P/L: active
+    and settled, as in web/api/getPortfolioHistory.php. Served by the index
+    idx_order_tx_effective (broker_account_id, status, settled, trade_date).
+    """
+    prefix = f"{alias}." if alias else ""
+    return f"{prefix}status = 'ACTIVE' AND {prefix}settled = 1"
+
+
+class Lot:
+    """
+    One open BUY lot (remaining quantity and unit price).
+    """
+
+    __slots__ = ("qty", "price")
+
+    def __init__(self, qty, price):
+        self.qty = qty
+        self.price = price
+
+
+class LotBook:
+    """
+    FIFO lots of one instrument in one broker account.
+
+    - lots are a deque: a SELL consumes from the left in O(1) per lot
+    - open quantity and open cost are kept as running totals, so the average
+      cost of the remaining lots is O(1) too
+    - position is BUY - SELL quantities, as in the snapshot (it differs from
+      open_qty only when more was sold than bought)
+    """
+
+    __slots__ = ("lots", "position", "realized_pl", "open_qty", "open_cost")
+
+    def __init__(self):
+        self.lots = deque()
+        self.position = ZERO
+        self.realized_pl = ZERO
+        self.open_qty = ZERO
+        self.open_cost = ZERO
+
+    def buy(self, qty, price):
+        self.lots.append(Lot(qty, price))
+        self.position += qty
+        self.open_qty += qty
+        self.open_cost += qty * price
+
+    def sell(self, qty, price):
+        """Consume lots FIFO; returns the realized P/L of this sale."""
+        self.position -= qty
+        realized = ZERO
+        remaining = qty
+        lots = self.lots
+        while remaining > 0 and lots:
+            lot = lots[0]
+            if lot.qty <= remaining:
+                consumed = lot.qty
+                lots.popleft()
+            else:
+                consumed = remaining
+                lot.qty -= remaining
+            realized += (price - lot.price) * consumed
+            self.open_qty -= consumed
+            self.open_cost -= consumed * lot.price
+            remaining -= consumed
+        self.realized_pl += realized
+        return realized
+
+    def apply(self, order_type, qty, price):
+        if order_type == "BUY":
+            self.buy(qty, price)
+        elif order_type == "SELL":
+            self.sell(qty, price)
+
+    def avg_cost(self):
+        return self.open_cost / (self.open_qty or 1)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def dump_lots(self):
+        return json.dumps([[str(lot.qty), str(lot.price)] for lot in self.lots])
+
+    @classmethod
+    def restore(cls, position, realized_pl, lots_json):
+        book = cls()
+        book.position = Decimal(position)
+        book.realized_pl = Decimal(realized_pl)
+        for qty, price in json.loads(lots_json or "[]"):
+            qty, price = Decimal(qty), Decimal(price)
+            book.lots.append(Lot(qty, price))
+            book.open_qty += qty
+            book.open_cost += qty * price
+        return book
+
+
+class LotCheckpointStore:
+    """
+    Persisted LotBook state per broker account and instrument
+    (table fifo_lot_checkpoint), so a daily run only applies the orders
+    entered since the last run.
+
+    A checkpoint stores the (trade_date, id) of the last order applied and a
+    fingerprint (count + BIT_XOR of CRC32) of every order up to it. When an
+    effective order at or before that point is inserted, edited or deleted
+    (cancelling one included), the order_transaction triggers delete the
+    checkpoint and the pair is replayed from scratch. invalidate_stale()
+    checks the fingerprints against the whole history, on request.
+    """
+
+    ORDER_FINGERPRINT = (
+        "CRC32(CONCAT_WS('|', o.id, o.order_type, o.quantity, o.price, o.trade_date, o.status, o.settled))"
+    )
+
+    def __init__(self, db, logger, dry_run=False):
+        self.db = db
+        self.logger = logger
+        self.dry_run = dry_run
+
+    def invalidate_stale(self, broker_ids=None):
+        """
+        Delete checkpoints whose order prefix changed. Returns their keys.
+        Scans every order before the checkpoints: a verification for changes
+        the triggers could not see (restored dump...), not for every run.
+        """
+        sql = f"""
+            SELECT c.broker_account_id, c.instrument_id
+            FROM fifo_lot_checkpoint c
+            LEFT JOIN order_transaction o
+                   ON o.broker_account_id = c.broker_account_id
+                  AND o.instrument_id = c.instrument_id
+                  AND (o.trade_date < c.last_trade_date
+                       OR (o.trade_date = c.last_trade_date AND o.id <= c.last_order_id))
+                  AND {effective_orders("o")}
+            {self._broker_filter("c", broker_ids)}
+            GROUP BY c.broker_account_id, c.instrument_id, c.order_count, c.fingerprint
+            HAVING COUNT(o.id) <> c.order_count
+                OR COALESCE(BIT_XOR({self.ORDER_FINGERPRINT}), 0) <> c.fingerprint
+        """
+        with self.db.cursor() as cur:
+            cur.execute(sql, tuple(broker_ids or ()))
+            stale = [(row["broker_account_id"], row["instrument_id"]) for row in cur.fetchall()]
+        if stale:
+            self.logger.info(f"{len(stale)} lot checkpoints outdated by back-dated or edited orders, replaying")
+            if not self.dry_run:
+                with self.db.transaction() as cur:
+                    cur.executemany(
+                        "DELETE FROM fifo_lot_checkpoint WHERE broker_account_id = %s AND instrument_id = %s",
+                        stale
+                    )
+        return stale
+
+    def load(self, broker_ids=None, skip=()):
+        """
+        {(broker_account_id, instrument_id): checkpoint row}, except `skip` keys.
+        """
+        sql = f"""
+            SELECT c.broker_account_id, c.instrument_id, c.last_trade_date, c.last_order_id,
+                   c.order_count, c.fingerprint, c.position, c.realized_pl, c.lots
+            FROM fifo_lot_checkpoint c
+            {self._broker_filter("c", broker_ids)}
+        """
+        skip = set(skip)
+        with self.db.cursor() as cur:
+            cur.execute(sql, tuple(broker_ids or ()))
+            return {
+                (row["broker_account_id"], row["instrument_id"]): row
+                for row in cur.fetchall()
+                if (row["broker_account_id"], row["instrument_id"]) not in skip
+            }
+
+    def fetch_new_orders(self, broker_ids=None, replay=()):
+        """
+        Orders after each pair's checkpoint (all orders for pairs without one
+        or listed in `replay`), sorted by broker, instrument, trade_date, id.
+        """
+        where = self._broker_filter("o", broker_ids)
+        replay = list(replay)
+        replay_sql = ""
+        if replay:
+            replay_sql = ("OR (o.broker_account_id, o.instrument_id) IN ("
+                          + ", ".join(["(%s, %s)"] * len(replay)) + ")")
+        sql = f"""
+            SELECT o.id, o.broker_account_id, o.instrument_id, o.order_type, o.quantity, o.price,
+                   o.trade_date, o.status, o.settled,
+                   {self.ORDER_FINGERPRINT} AS fingerprint
+            FROM order_transaction o
+            LEFT JOIN fifo_lot_checkpoint c
+                   ON c.broker_account_id = o.broker_account_id
+                  AND c.instrument_id = o.instrument_id
+            {where} {"AND" if where else "WHERE"} {effective_orders("o")}
+              AND (c.broker_account_id IS NULL
+                   OR o.trade_date > c.last_trade_date
+                   OR (o.trade_date = c.last_trade_date AND o.id > c.last_order_id)
+                   {replay_sql})
+            ORDER BY o.broker_account_id, o.instrument_id, o.trade_date, o.id
+        """
+        params = list(broker_ids or ())
+        for key in replay:
+            params.extend(key)
+        with self.db.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def reset(self, broker_ids=None):
+        """
+        Drop the checkpoints (all, or of some broker accounts): the next run
+        replays every order.
+        """
+        if self.dry_run:
+            self.logger.info("[DRY-RUN] Lot checkpoints would be reset")
+            return
+        with self.db.cursor() as cur:
+            cur.execute(f"DELETE FROM fifo_lot_checkpoint {self._broker_filter('fifo_lot_checkpoint', broker_ids)}",
+                        tuple(broker_ids or ()))
+
+    def save(self, checkpoints):
+        """
+        Upsert checkpoint rows (dicts with the fifo_lot_checkpoint columns).
+        """
+        sql = """
+            INSERT INTO fifo_lot_checkpoint
+                (broker_account_id, instrument_id, last_trade_date, last_order_id,
+                 order_count, fingerprint, position, realized_pl, lots)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                last_trade_date = VALUES(last_trade_date),
+                last_order_id   = VALUES(last_order_id),
+                order_count     = VALUES(order_count),
+                fingerprint     = VALUES(fingerprint),
+                position        = VALUES(position),
+                realized_pl     = VALUES(realized_pl),
+                lots            = VALUES(lots)
+        """
+        params = [
+            (c["broker_account_id"], c["instrument_id"], c["last_trade_date"], c["last_order_id"],
+             c["order_count"], c["fingerprint"], c["position"], c["realized_pl"], c["lots"])
+            for c in checkpoints
+        ]
+        if not params:
+            return
+        if self.dry_run:
+            self.logger.info(f"[DRY-RUN] upsert fifo_lot_checkpoint x {len(params)} rows")
+            return
+        with self.db.transaction() as cur:
+            cur.executemany(sql, params)
+
+    @staticmethod
+    def _broker_filter(alias, broker_ids):
+        if not broker_ids:
+            return ""
+        return f"WHERE {alias}.broker_account_id IN ({', '.join(['%s'] * len(broker_ids))})"
+
+
+class LotLedger:
+    """
+    LotBooks of many broker accounts, resumed from checkpoints.
+
+    books[(broker_account_id, instrument_id)] -> LotBook
+    """
+
+    def __init__(self):
+        self.books = {}
+        self.by_broker = {}  # broker_account_id -> {instrument_id: LotBook}
+        self.marks = {}  # key -> [last_trade_date, last_order_id, order_count, fingerprint]
+        self.dirty = set()  # keys with orders applied since resume()
+        self.applied = 0
+
+    def resume(self, checkpoints):
+        for key, row in checkpoints.items():
+            self._add(key, LotBook.restore(row["position"], row["realized_pl"], row["lots"]))
+            self.marks[key] = [row["last_trade_date"], row["last_order_id"],
+                               row["order_count"], row["fingerprint"]]
+
+    def apply(self, orders):
+        """
+        Apply orders sorted by (trade_date, id) within each pair.
+        """
+        for o in orders:
+            key = (o["broker_account_id"], o["instrument_id"])
+            book = self.books.get(key)
+            if book is None:
+                book = self._add(key, LotBook())
+                self.marks[key] = [None, None, 0, 0]
+            book.apply(o["order_type"], Decimal(o["quantity"]), Decimal(o["price"]))
+            mark = self.marks[key]
+            mark[0], mark[1] = o["trade_date"], o["id"]
+            mark[2] += 1
+            mark[3] ^= int(o["fingerprint"])
+            self.dirty.add(key)
+            self.applied += 1
+
+    def _add(self, key, book):
+        self.books[key] = book
+        self.by_broker.setdefault(key[0], {})[key[1]] = book
+        return book
+
+    def broker_books(self, broker_account_id):
+        """{instrument_id: LotBook} of one broker account."""
+        return self.by_broker.get(broker_account_id, {})
+
+    def checkpoints(self):
+        """Checkpoint rows of the pairs changed since resume()."""
+        return [
+            {
+                "broker_account_id": bid,
+                "instrument_id": instr,
+                "last_trade_date": mark[0],
+                "last_order_id": mark[1],
+                "order_count": mark[2],
+                "fingerprint": mark[3],
+                "position": book.position,
+                "realized_pl": book.realized_pl,
+                "lots": book.dump_lots(),
+            }
+            for (bid, instr) in sorted(self.dirty)
+            for book, mark in ((self.books[(bid, instr)], self.marks[(bid, instr)]),)
+        ]
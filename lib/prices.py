@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+# close/close_date: last daily_price row; tick/tick_at: last realtime_price row
+LatestPrice = namedtuple("LatestPrice", ["close", "close_date", "tick", "tick_at"])
+
+_NO_PRICE = LatestPrice(None, None, None, None)
+
+
+def valuation_price(latest):
+    """
+    Price used to value a position: last daily close, else last tick, else 0
+    (same rule as the former per-instrument COALESCE subquery).
+    """
+    if latest.close is not None:
+        return latest.close
+    if latest.tick is not None:
+        return latest.tick
+    return Decimal("0")
+
+
+class LatestPriceResolver:
+    """
+    Latest daily close and latest realtime tick for a set of instruments,
+    fetched with ONE query per call and cached.
+
+    - ttl=None: entries live as long as the resolver (one batch run)
+    - ttl=N: entries expire after N seconds (daemons, API processes)
+    - thread-safe; the DB connection is only used under the resolver lock
+    """
+
+    SQL = """
+        SELECT i.id AS instrument_id,
+               dp.close_price, dp.date AS close_date,
+               rp.price AS tick_price, rp.captured_at AS tick_at
+        FROM instrument i
+        LEFT JOIN daily_price dp
+               ON dp.instrument_id = i.id
+              AND dp.date = (SELECT MAX(d2.date) FROM daily_price d2 WHERE d2.instrument_id = i.id)
+        LEFT JOIN realtime_price rp
+               ON rp.id = (SELECT r2.id FROM realtime_price r2
+                           WHERE r2.instrument_id = i.id
+                           ORDER BY r2.captured_at DESC, r2.id DESC LIMIT 1)
+        WHERE i.id IN ({placeholders})
+    """
+
+    def __init__(self, db, ttl=None):
+        self.db = db
+        self.ttl = ttl
+        self.cache = {}  # instrument_id -> (LatestPrice, fetched_at)
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry, now):
+        return entry is not None and (self.ttl is None or now - entry[1] < self.ttl)
+
+    def _fetch(self, ids):
+        sql = self.SQL.format(placeholders=", ".join(["%s"] * len(ids)))
+        if self.ttl is not None:
+            self.db.ping()  # long-lived owner: the connection may have timed out
+        with self.db.cursor() as cur:
+            cur.execute(sql, ids)
+            rows = cur.fetchall()
+        self.queries += 1
+        found = {}
+        for row in rows:
+            found[row["instrument_id"]] = LatestPrice(
+                Decimal(row["close_price"]) if row["close_price"] is not None else None,
+                row["close_date"],
+                Decimal(row["tick_price"]) if row["tick_price"] is not None else None,
+                row["tick_at"],
+            )
+        return found
+
+    def resolve(self, instrument_ids):
+        """
+        {instrument_id: LatestPrice} for every requested id; unknown ids or
+        instruments without any price get LatestPrice(None, None, None, None).
+        """
+        ids = set(instrument_ids)
+        now = time.monotonic()
+        with self._lock:
+            missing = sorted(i for i in ids if not self._fresh(self.cache.get(i), now))
+            if missing:
+                found = self._fetch(missing)
+                for i in missing:
+                    self.cache[i] = (found.get(i, _NO_PRICE), now)
+            return {i: self.cache[i][0] for i in ids}
+
+    def prices(self, instrument_ids):
+        """
+        {instrument_id: Decimal valuation price} (see valuation_price).
+        """
+        return {i: valuation_price(latest) for i, latest in self.resolve(instrument_ids).items()}
+
+    def invalidate(self, instrument_ids=None):
+        with self._lock:
+            if instrument_ids is None:
+                self.cache.clear()
+            else:
+                for i in instrument_ids:
+                    self.cache.pop(i, None)
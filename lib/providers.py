@@ -0,0 +1,166 @@
+import os
+from abc import ABC, abstractmethod
+
+import requests
+
+from lib.extractor import extract_quote
+from lib.fetcher import DEFAULT_CATEGORIES, STREAM_CHUNK_SIZE, read_quote_streamed, url_category
+from lib.ratelimit import HostRateLimiter
+
+# name -> provider class, filled by @register_provider
+PROVIDERS = {}
+
+
+class ProviderError(requests.RequestException):
+    """
+    A provider could not return a usable answer (server error, throttling,
+    access refused...).
+    """
+
+
+def register_provider(cls):
+    PROVIDERS[cls.name] = cls
+    return cls
+
+
+class PriceProvider(ABC):
+    """
+    Base class of price sources.
+
+    - name: registry key, as used in PRICE_PROVIDERS
+    - cost: relative cost of one request (network, quota), used to pick the
+      cheapest provider per instrument type
+    - batch_size: symbols one request can return (1 = one request per symbol)
+    - types: instrument types served, None for all
+    """
+
+    name = None
+    cost = 1.0
+    batch_size = 1
+    types = None
+
+    def supports(self, instrument_type):
+        return self.types is None or instrument_type in self.types
+
+    @property
+    def cost_per_symbol(self):
+        return self.cost / max(1, self.batch_size)
+
+    @abstractmethod
+    def fetch(self, instruments):
+        """
+        Return {instrument_id: Quote} for the given instrument rows (at most
+        batch_size). Instruments the source does not know are left out; a
+        transport, server or refusal error raises requests.RequestException.
+        """
+
+    def describe(self, instr):
+        """Where the quote of `instr` comes from, for logs."""
+        return f"{self.name}:{instr['symbol']}"
+
+
+@register_provider
+class BoursoramaProvider(PriceProvider):
+    """
+    Boursorama quote pages, one HTTP request per symbol. The {category} of
+    the URL comes from the instrument type (categories, see
+    lib.fetcher.DEFAULT_CATEGORIES). 403, 429 and 5xx answers mean the source
+    refuses or fails (HostRateLimiter.FAILURE_STATUSES, the breaker counts
+    them too) and raise; any other client error (404...) means the symbol
+    is unknown and it is left out.
+    """
+
+    name = "boursorama"
+
+    def __init__(self, http, url_pattern, timeout=10, stream=False,
+                 chunk_size=STREAM_CHUNK_SIZE, categories=None, **_):
+        self.http = http
+        self.url_pattern = url_pattern
+        self.timeout = timeout
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.categories = categories or DEFAULT_CATEGORIES
+
+    def describe(self, instr):
+        return self.url_pattern.format(category=url_category(self.categories, instr.get("type")),
+                                       symbol=instr["symbol"])
+
+    def fetch(self, instruments):
+        quotes = {}
+        for instr in instruments:
+            url = self.describe(instr)
+            response = self.http.get(url, timeout=self.timeout, stream=self.stream)
+            if response.status_code != 200:
+                response.close()
+                if response.status_code in HostRateLimiter.FAILURE_STATUSES or response.status_code >= 500:
+                    raise ProviderError(f"HTTP {response.status_code} for {url}")
+                continue  # unknown symbol: the other quotes of the batch are kept
+            if self.stream:
+                quotes[instr["id"]] = read_quote_streamed(response, self.chunk_size)
+            else:
+                quotes[instr["id"]] = extract_quote(response.text)
+        return quotes
+
+
+@register_provider
+class LocalFileProvider(PriceProvider):
+    """
+    Saved quote pages read from `directory`/<symbol>.html, all symbols in one
+    call. No network: used to benchmark the whole pipeline offline. A missing
+    page means an unknown symbol; any other read error raises ProviderError,
+    so the batch fails over like a server error.
+    """
+
+    name = "file"
+    cost = 0.0
+    batch_size = 10000
+
+    def __init__(self, directory, **_):
+        if not directory or not os.path.isdir(directory):
+            raise ValueError(f"PRICE_PROVIDER_DIR is not a directory: {directory!r}")
+        self.directory = directory
+
+    def describe(self, instr):
+        return os.path.join(self.directory, f"{instr['symbol']}.html")
+
+    def fetch(self, instruments):
+        quotes = {}
+        for instr in instruments:
+            path = self.describe(instr)
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    quotes[instr["id"]] = extract_quote(f.read())
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                raise ProviderError(f"Cannot read {path}: {e}") from e
+        return quotes
+
+
+def create_providers(names, **options):
+    """
+    Instantiate the registered providers listed in `names` ("boursorama,file"),
+    passing each the shared keyword options it needs.
+    """
+    providers = []
+    for name in names.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown price provider: {name} (known: {', '.join(sorted(PROVIDERS))})")
+        providers.append(PROVIDERS[name](**options))
+    if not providers:
+        raise ValueError("No price provider configured")
+    return providers
+
+
+def select_providers(providers, instrument_type):
+    """
+    Providers able to serve `instrument_type`, cheapest first; the next ones
+    are the failover order. Ties keep the configured order.
+    """
+    return sorted(
+        (p for p in providers if p.supports(instrument_type)),
+        key=lambda p: p.cost_per_symbol
+    )
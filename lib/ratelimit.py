@@ -0,0 +1,156 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised instead of sending a request while the host circuit is open.
+    """
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `burst` stored.
+    acquire() blocks until a token is available and returns the time waited.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """
+    CLOSED -> OPEN after `failure_threshold` consecutive failures.
+    OPEN rejects every request for `reset_timeout` seconds, then lets a single
+    probe through (HALF_OPEN): success closes the circuit, failure reopens it.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        """Returns True when this success closed a half-open circuit."""
+        with self._lock:
+            recovered = self.state == self.HALF_OPEN
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+            return recovered
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class HostRateLimiter:
+    """
+    Per-host token bucket and circuit breaker for the fetch layer.
+
+    - rate <= 0 disables throttling, failure_threshold <= 0 disables the breaker
+    - counters: throttled (had to wait for a token), rejected (circuit open),
+      recovered (half-open probe succeeded)
+    """
+
+    # Responses meaning "the source is unhappy", as opposed to e.g. 404
+    FAILURE_STATUSES = {403, 429}
+
+    def __init__(self, rate=0, burst=1, failure_threshold=5, reset_timeout=60):
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.buckets = {}
+        self.breakers = {}
+        self.counters = {"throttled": 0, "throttled_seconds": 0.0, "rejected": 0, "recovered": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return urlsplit(url).netloc
+
+    def _get(self, host):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                if self.rate > 0:
+                    self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets.get(host), self.breakers[host]
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def before_request(self, url):
+        host = self.host_of(url)
+        bucket, breaker = self._get(host)
+        if self.failure_threshold > 0 and not breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"Circuit open for {host}, request not sent")
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited > 0:
+                self._count("throttled")
+                self._count("throttled_seconds", waited)
+
+    def after_request(self, url, status_code=None):
+        """
+        Record the outcome; status_code None means the request raised.
+        """
+        if self.failure_threshold <= 0:
+            return
+        _, breaker = self._get(self.host_of(url))
+        if status_code is None or status_code in self.FAILURE_STATUSES or status_code >= 500:
+            breaker.record_failure()
+        elif breaker.record_success():
+            self._count("recovered")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
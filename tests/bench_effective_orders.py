@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark: effective-order filter on a large synthetic order book.
+
+Builds a synthetic order book (a share of it cancelled or unsettled) and
+compares, per broker account:
+- legacy:    every order of the account (fk_order_tx_broker_account index)
+- filtered:  status='ACTIVE' AND settled=1, composite index ignored
+- indexed:   status='ACTIVE' AND settled=1 through idx_order_tx_effective
+
+Rows read by the server come from the session Handler_read_* counters; the
+FIFO replay time of the rows returned is measured with lib.lots.
+
+Without --db only the in-memory part runs (FIFO replay of all vs effective
+rows). With --db the order book is loaded into a TEMPORARY copy of
+order_transaction on the configured database (nothing persistent is written).
+
+Usage:
+  python3 tests/bench_effective_orders.py [--orders N] [--accounts N] [--db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from lib.lots import LotBook, effective_orders
+
+BENCH_TABLE = "bench_order_transaction"
+
+QUERIES = {
+    "legacy": f"""
+        SELECT instrument_id, order_type, quantity, price, trade_date
+        FROM {BENCH_TABLE} FORCE INDEX (fk_order_tx_broker_account)
+        WHERE broker_account_id = %s
+        ORDER BY trade_date ASC, id ASC
+    """,
+    "filtered": f"""
+        SELECT instrument_id, order_type, quantity, price, trade_date
+        FROM {BENCH_TABLE} IGNORE INDEX (idx_order_tx_effective)
+        WHERE broker_account_id = %s AND {effective_orders()}
+        ORDER BY trade_date ASC, id ASC
+    """,
+    "indexed": f"""
+        SELECT instrument_id, order_type, quantity, price, trade_date
+        FROM {BENCH_TABLE} FORCE INDEX (idx_order_tx_effective)
+        WHERE broker_account_id = %s AND {effective_orders()}
+        ORDER BY trade_date ASC, id ASC
+    """,
+}
+
+
+def synthetic_orders(count, accounts, instruments, cancelled, unsettled, seed=42):
+    """Order rows as dicts, BUY-heavy so SELLs mostly find lots."""
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1)
+    rows = []
+    for i in range(count):
+        r = rng.random()
+        rows.append({
+            "id": i + 1,
+            "broker_account_id": rng.randint(1, accounts),
+            "instrument_id": rng.randint(1, instruments),
+            "order_type": "BUY" if rng.random() < 0.6 else "SELL",
+            "quantity": Decimal(rng.randint(1, 200)),
+            "price": Decimal(rng.randint(500, 50000)) / 100,
+            "trade_date": start + timedelta(minutes=i * 7),
+            "status": "CANCELLED" if r < cancelled else "ACTIVE",
+            "settled": 0 if cancelled <= r < cancelled + unsettled else 1,
+        })
+    return rows
+
+
+def replay(rows):
+    books = {}
+    started = time.perf_counter()
+    for row in rows:
+        book = books.get(row["instrument_id"])
+        if book is None:
+            book = books[row["instrument_id"]] = LotBook()
+        book.apply(row["order_type"], Decimal(row["quantity"]), Decimal(row["price"]))
+    return (time.perf_counter() - started) * 1000
+
+
+def bench_memory(rows):
+    effective = [r for r in rows if r["status"] == "ACTIVE" and r["settled"] == 1]
+    print(f"{'replay':<10} {'rows':>10} {'ms':>10}")
+    print(f"{'all':<10} {len(rows):>10} {replay(rows):>10.1f}")
+    print(f"{'effective':<10} {len(effective):>10} {replay(effective):>10.1f}")
+
+
+def handler_reads(cur):
+    cur.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    return sum(int(row["Value"]) for row in cur.fetchall())
+
+
+def bench_db(rows, accounts):
+    from lib.config import ConfigManager
+    from lib.db import DatabaseConnection
+
+    config = ConfigManager()
+    db = DatabaseConnection(
+        host=config.get("DB_HOST", "localhost"),
+        user=config.get("DB_USER"),
+        password=config.get("DB_PASS"),
+        database=config.get("DB_NAME"),
+        port=int(config.get("DB_PORT", 3306))
+    )
+    db.connect()
+    try:
+        with db.cursor() as cur:
+            cur.execute(f"CREATE TEMPORARY TABLE {BENCH_TABLE} LIKE order_transaction")
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_order_tx_effective "
+                        f"ON {BENCH_TABLE} (broker_account_id, status, settled, trade_date)")
+        insert = f"""
+            INSERT INTO {BENCH_TABLE}
+                (id, broker_account_id, instrument_id, order_type, quantity, price,
+                 trade_date, status, settled)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        with db.transaction() as cur:
+            for i in range(0, len(rows), 5000):
+                cur.executemany(insert, [
+                    (r["id"], r["broker_account_id"], r["instrument_id"], r["order_type"],
+                     r["quantity"], r["price"], r["trade_date"], r["status"], r["settled"])
+                    for r in rows[i:i + 5000]
+                ])
+        with db.cursor() as cur:
+            cur.execute(f"ANALYZE TABLE {BENCH_TABLE}")
+            cur.fetchall()
+
+        print(f"\n{'query':<10} {'rows read':>10} {'returned':>10} {'sql ms':>10} {'fifo ms':>10}")
+        for name, sql in QUERIES.items():
+            read = returned = 0
+            sql_ms = fifo_ms = 0.0
+            with db.cursor() as cur:
+                for broker_account_id in range(1, accounts + 1):
+                    before = handler_reads(cur)
+                    started = time.perf_counter()
+                    cur.execute(sql, (broker_account_id,))
+                    fetched = cur.fetchall()
+                    sql_ms += (time.perf_counter() - started) * 1000
+                    read += handler_reads(cur) - before
+                    returned += len(fetched)
+                    fifo_ms += replay(fetched)
+            print(f"{name:<10} {read:>10} {returned:>10} {sql_ms:>10.1f} {fifo_ms:>10.1f}")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Effective-order filter benchmark")
+    parser.add_argument("--orders", type=int, default=200000, help="Synthetic orders")
+    parser.add_argument("--accounts", type=int, default=50, help="Broker accounts")
+    parser.add_argument("--instruments", type=int, default=40, help="Instruments")
+    parser.add_argument("--cancelled", type=float, default=0.25, help="Share of cancelled orders")
+    parser.add_argument("--unsettled", type=float, default=0.10, help="Share of unsettled orders")
+    parser.add_argument("--db", action="store_true",
+                        help="Also measure the SQL side on a temporary table (uses the CashCue config)")
+    args = parser.parse_args()
+
+    rows = synthetic_orders(args.orders, args.accounts, args.instruments, args.cancelled, args.unsettled)
+    print(f"{args.orders} orders, {args.accounts} accounts, "
+          f"{args.cancelled:.0%} cancelled, {args.unsettled:.0%} unsettled\n")
+    bench_memory(rows)
+    if args.db:
+        bench_db(rows, args.accounts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: quote page extraction.
+
+Compares the former extraction (greedy price regex + DOTALL capital regex +
+BeautifulSoup fallback) with lib.extractor.extract_quote over the saved pages
+in tests/fixtures/quotes/.
+
+Usage:
+  python3 tests/bench_quote_extractor.py [--runs N]
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import timeit
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from lib.extractor import extract_quote
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "quotes", "*.html")
+
+_LEGACY_PRICE = r'<span class="c-instrument c-instrument--last" data-ist-last>(\d+[.,]\d+)</span>.*<span class="c-faceplate__price-currency"> EUR</span>'
+_LEGACY_CAPITAL = re.compile(
+    r'capital\s+échang(?:é|e)\b.*?<p[^>]*class=["\'][^"\']*c-list-info__value[^"\']*["\'][^>]*>\s*([\d\.,]+)\s*%',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def legacy_extract(html_content):
+    """Former app.update_realtime_prices extraction, kept for comparison."""
+    match = re.search(_LEGACY_PRICE, html_content)
+    price = float(match.group(1).replace(",", ".")) if match else None
+
+    capital = None
+    m = _LEGACY_CAPITAL.search(html_content)
+    if m:
+        capital = float(m.group(1).replace(",", "."))
+    elif BeautifulSoup is not None:
+        soup = BeautifulSoup(html_content, "html.parser")
+        for p in soup.find_all("p", class_=lambda c: c and "c-list-info__value" in c):
+            m2 = re.search(r'([\d\.,]+)\s*%', p.get_text())
+            if m2:
+                capital = float(m2.group(1).replace(",", "."))
+                break
+    return price, capital
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quote extractor micro-benchmark")
+    parser.add_argument("--runs", type=int, default=50, help="Iterations per page")
+    args = parser.parse_args()
+
+    if BeautifulSoup is None:
+        print("[WARN] bs4 not installed: legacy timings exclude the BeautifulSoup fallback")
+
+    print(f"{'page':<32} {'size':>8} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}")
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path, encoding="utf-8") as f:
+            html_content = f.read()
+
+        quote = extract_quote(html_content)
+        legacy = legacy_extract(html_content)
+        if (quote.price, quote.capital_exchanged) != legacy and BeautifulSoup is not None:
+            print(f"[WARN] {os.path.basename(path)}: results differ {legacy} vs {quote}")
+
+        t_legacy = timeit.timeit(lambda: legacy_extract(html_content), number=args.runs) / args.runs * 1000
+        t_new = timeit.timeit(lambda: extract_quote(html_content), number=args.runs) / args.runs * 1000
+        print(f"{os.path.basename(path):<32} {len(html_content) // 1024:>6}KB "
+              f"{t_legacy:>10.3f} {t_new:>8.3f} {t_legacy / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -137,3 +137,29 @@ def test_broker(db):
 
     db.commit()
     cur.close()
+
+
+# =============================================================================
+#  FIXTURE: Create a test instrument (its prices are removed with it)
+# =============================================================================
+@pytest.fixture(scope="function")
+def test_instrument(db):
+    """
+    Creates a dedicated ACTIVE instrument and deletes it afterward; its
+    realtime_price, daily_price and price bar rows go with it (ON DELETE CASCADE).
+    """
+    cur = db.cursor()
+
+    ts = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")[-14:]
+    cur.execute("""
+        INSERT INTO instrument (symbol, label, type, currency, status)
+        VALUES (%s, %s, 'ETF', 'EUR', 'ACTIVE')
+    """, (f"T{ts}", f"Test instrument {ts}"))
+    instrument_id = cur.lastrowid
+    db.commit()
+
+    yield instrument_id
+
+    cur.execute("DELETE FROM instrument WHERE id = %s", (instrument_id,))
+    db.commit()
+    cur.close()
@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from app.audit_financials import AccountAudit
+from lib.cash import CASH_EFFECTS
+
+
+def make_audit():
+    audit = AccountAudit(3, "Broker")
+    audit.initial_balance = Decimal("100.00")
+    audit.recomputed_cash = Decimal("80.50")
+    audit.persisted_cash = Decimal("80.50")
+    audit.cash_delta = Decimal("0.00")
+    audit.cash_totals = {"DEPOSIT": Decimal("100.00"), "BUY": Decimal("-19.50")}
+    audit.positions = {7: Decimal("2"), 9: Decimal("1.5")}
+    audit.log = "captured text"
+    return audit
+
+
+def test_defaults():
+    audit = AccountAudit(1, "Empty")
+    assert audit.status == "OK"
+    assert audit.error is None
+    assert audit.cash_totals == {} and audit.positions == {}
+
+
+def test_to_dict_is_json_ready():
+    row = make_audit().to_dict()
+    assert "log" not in row
+    assert set(row) == set(AccountAudit.FIELDS) - {"log"}
+    assert row["recomputed_cash"] == "80.50"
+    assert row["total_buy"] == "0.0"
+    assert row["cash_totals"] == {"DEPOSIT": "100.00", "BUY": "-19.50"}
+    assert row["positions"] == {"7": "2", "9": "1.5"}
+    assert row["broker_account_id"] == 3
+
+
+def test_csv_row_matches_header():
+    audit = make_audit()
+    header = AccountAudit.csv_header()
+    row = audit.csv_row()
+    assert len(row) == len(header)
+    values = dict(zip(header, row))
+    assert values["name"] == "Broker"
+    assert values["cash_delta"] == "0.00"
+    assert values["total_DEPOSIT"] == "100.00"
+    assert values["total_BUY"] == "-19.50"
+    assert values["total_DIVIDEND"] is None
+    assert values["open_positions"] == "7:2;9:1.5"
+    assert header[-len(CASH_EFFECTS) - 1:] == [f"total_{t}" for t in CASH_EFFECTS] + ["open_positions"]
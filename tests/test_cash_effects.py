@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from lib.cash import CASH_EFFECTS, cash_effect, cash_effect_sql, cash_totals_sql
+
+
+def test_every_known_type_counts_as_stored():
+    for ttype, multiplier in CASH_EFFECTS.items():
+        assert cash_effect(ttype, Decimal("-12.34")) == Decimal("-12.34") * multiplier
+
+
+def test_signed_ledger_rule():
+    # Amounts are stored signed: the balance is SUM(amount)
+    assert cash_effect("WITHDRAWAL", Decimal("-50.00")) == Decimal("-50.00")
+    assert cash_effect("DEPOSIT", Decimal("50.00")) == Decimal("50.00")
+    assert cash_effect("BUY", "-10.5") == Decimal("-10.5")
+
+
+def test_unknown_type_counts_zero():
+    assert cash_effect("TRANSFER", Decimal("99.99")) == 0
+
+
+def test_cash_effect_sql_has_one_branch_per_type():
+    sql = cash_effect_sql("t.amount", "t.type")
+    assert sql.startswith("(CASE t.type ")
+    assert sql.endswith(" ELSE 0 END)")
+    for ttype, multiplier in CASH_EFFECTS.items():
+        assert f"WHEN '{ttype}' THEN t.amount * {multiplier}" in sql
+    assert sql.count("WHEN ") == len(CASH_EFFECTS)
+
+
+def test_cash_totals_sql_has_one_column_per_type():
+    sql = cash_totals_sql(where="WHERE t.broker_account_id = %s")
+    for ttype in CASH_EFFECTS:
+        assert f"AS `{ttype}`" in sql
+    assert "unknown_count" in sql
+    assert "fingerprint" in sql
+    assert "WHERE t.broker_account_id = %s" in sql
+    assert "GROUP BY t.broker_account_id" in sql
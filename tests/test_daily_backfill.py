@@ -0,0 +1,73 @@
+import json
+import logging
+import threading
+from datetime import date
+
+from app.update_daily_price import DailyPriceBackfill
+
+
+class RecordingBackfill(DailyPriceBackfill):
+    """Backfill whose chunks are recorded instead of computed; `failing` chunks raise."""
+
+    def __init__(self, state_file, failing=(), **kwargs):
+        super().__init__(connect=None, logger=logging.getLogger("test"), workers=2, chunk_days=7,
+                         state_file=str(state_file), **kwargs)
+        self.failing = set(failing)
+        self.processed = []
+        self._processed_lock = threading.Lock()
+
+    def process_chunk(self, chunk):
+        with self._processed_lock:
+            self.processed.append(chunk[0])
+        if chunk[0] in self.failing:
+            raise RuntimeError("boom")
+        return 1
+
+
+def test_chunks_cover_the_range_inclusively():
+    chunks = DailyPriceBackfill.chunks(date(2025, 1, 1), date(2025, 1, 16), 7)
+    assert chunks == [
+        (date(2025, 1, 1), date(2025, 1, 8)),
+        (date(2025, 1, 8), date(2025, 1, 15)),
+        (date(2025, 1, 15), date(2025, 1, 17)),
+    ]
+    assert DailyPriceBackfill.chunks(date(2025, 1, 1), date(2025, 1, 1), 7) == [(date(2025, 1, 1), date(2025, 1, 2))]
+
+
+def test_failed_chunk_is_resumed_from_the_state_file(tmp_path):
+    state_file = tmp_path / "backfill.json"
+    start, end = date(2025, 1, 1), date(2025, 1, 21)
+
+    first = RecordingBackfill(state_file, failing={date(2025, 1, 8)})
+    assert first.run(start, end) is False
+    state = json.loads(state_file.read_text())
+    assert sorted(state["done"]) == ["2025-01-01", "2025-01-15"]
+
+    second = RecordingBackfill(state_file)
+    assert second.run(start, end) is True
+    assert second.processed == [date(2025, 1, 8)]
+    assert not state_file.exists()  # removed once the whole range is done
+
+
+def test_state_of_another_range_is_ignored(tmp_path):
+    state_file = tmp_path / "backfill.json"
+    state_file.write_text(json.dumps({"from": "2024-01-01", "to": "2024-01-21",
+                                      "chunk_days": 7, "done": ["2024-01-01"]}))
+    backfill = RecordingBackfill(state_file)
+    assert backfill.run(date(2025, 1, 1), date(2025, 1, 14)) is True
+    assert sorted(backfill.processed) == [date(2025, 1, 1), date(2025, 1, 8)]
+
+
+def test_dry_run_keeps_no_state(tmp_path):
+    state_file = tmp_path / "backfill.json"
+    backfill = RecordingBackfill(state_file, failing={date(2025, 1, 1)}, dry_run=True)
+    assert backfill.run(date(2025, 1, 1), date(2025, 1, 14)) is False
+    assert not state_file.exists()
+
+
+def test_unwritable_state_file_does_not_abort_the_backfill(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    backfill = RecordingBackfill(blocker / "backfill.json")
+    assert backfill.run(date(2025, 1, 1), date(2025, 1, 21)) is True
+    assert sorted(backfill.processed) == [date(2025, 1, 1), date(2025, 1, 8), date(2025, 1, 15)]
@@ -0,0 +1,147 @@
+import logging
+from datetime import date, datetime
+
+import pytest
+
+from app.update_daily_price import DailyPriceUpdater
+
+DAY = date(2001, 2, 13)
+
+
+def insert_ticks(db, instrument_id, ticks):
+    with db.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO realtime_price (instrument_id, price, captured_at) VALUES (%s, %s, %s)",
+            [(instrument_id, price, captured_at) for captured_at, price in ticks]
+        )
+    db.commit()
+
+
+@pytest.fixture
+def updater():
+    return DailyPriceUpdater(None, logging.getLogger("test"), dry_run=True, close_db=False)
+
+
+def test_daily_ohlc_over_half_open_day(db, cursor, test_instrument, updater):
+    insert_ticks(db, test_instrument, [
+        (datetime(2001, 2, 12, 23, 59, 59), 1),    # day before
+        (datetime(2001, 2, 13, 0, 0, 0), 10),      # first tick of the day...
+        (datetime(2001, 2, 13, 0, 0, 0), 11),      # ...same timestamp, higher id
+        (datetime(2001, 2, 13, 12, 0, 0), 15),
+        (datetime(2001, 2, 13, 18, 0, 0), 9),
+        (datetime(2001, 2, 13, 23, 59, 59), 12),
+        (datetime(2001, 2, 13, 23, 59, 59), 13),   # last tick: highest id of the last timestamp
+        (datetime(2001, 2, 14, 0, 0, 0), 99),      # next day (excluded bound)
+    ])
+    data = updater.compute_daily_prices(cursor, DAY)[test_instrument]
+    assert (data["open"], data["high"], data["low"], data["close"]) == (10, 15, 9, 13)
+    assert data["pct_change"] == pytest.approx(30.0)
+
+
+def test_first_and_last_survive_group_concat_truncation(db, cursor, test_instrument, updater):
+    # Far more ticks than group_concat_max_len (1024 bytes by default) can list
+    ticks = [(datetime(2001, 2, 13, 9, 0, 0), 20)]
+    ticks += [(datetime(2001, 2, 13, 10, i // 60, i % 60), 21 + i % 7) for i in range(1000)]
+    ticks += [(datetime(2001, 2, 13, 17, 0, 0), 30)]
+    insert_ticks(db, test_instrument, ticks)
+    data = updater.compute_daily_prices(cursor, DAY)[test_instrument]
+    assert (data["open"], data["close"]) == (20, 30)
+    assert (data["high"], data["low"]) == (30, 20)
+
+
+def test_day_without_ticks(cursor, test_instrument, updater):
+    assert test_instrument not in updater.compute_daily_prices(cursor, DAY)
+
+
+def insert_hour_bars(db, instrument_id, bars):
+    with db.cursor() as cur:
+        cur.executemany(
+            """INSERT INTO price_bar_1h
+               (instrument_id, bar_start, open_price, high_price, low_price, close_price,
+                tick_count, first_at, last_at)
+               VALUES (%s, %s, %s, %s, %s, %s, 1, %s, %s)""",
+            [(instrument_id, start, o, h, l, c, start, start) for start, o, h, l, c in bars]
+        )
+    db.commit()
+
+
+def test_bars_mode_keeps_ticks_of_partially_barred_day(db, cursor, test_instrument):
+    insert_ticks(db, test_instrument, [
+        (datetime(2001, 2, 13, 9, 0, 0), 10),
+        (datetime(2001, 2, 13, 11, 0, 0), 8),
+        (datetime(2001, 2, 13, 15, 0, 0), 16),
+        (datetime(2001, 2, 13, 17, 0, 0), 14),
+    ])
+    # Bars enabled mid-day: only the afternoon is covered
+    insert_hour_bars(db, test_instrument, [
+        (datetime(2001, 2, 13, 15, 0, 0), 16, 16, 16, 16),
+        (datetime(2001, 2, 13, 17, 0, 0), 14, 14, 14, 14),
+    ])
+    updater = DailyPriceUpdater(None, logging.getLogger("test"), dry_run=True,
+                                close_db=False, source="bars")
+    data = updater.compute_daily_prices(cursor, DAY)[test_instrument]
+    assert (data["open"], data["high"], data["low"], data["close"]) == (10, 16, 8, 14)
+
+
+def test_bars_mode_keeps_ticks_of_day_with_missing_midday_bar(db, cursor, test_instrument):
+    insert_ticks(db, test_instrument, [
+        (datetime(2001, 2, 13, 9, 0, 0), 10),
+        (datetime(2001, 2, 13, 11, 0, 0), 8),
+        (datetime(2001, 2, 13, 15, 0, 0), 16),
+        (datetime(2001, 2, 13, 17, 0, 0), 14),
+    ])
+    # Bars span the first and last tick, but the 11:00 and 15:00 flushes failed
+    insert_hour_bars(db, test_instrument, [
+        (datetime(2001, 2, 13, 9, 0, 0), 10, 10, 10, 10),
+        (datetime(2001, 2, 13, 17, 0, 0), 14, 14, 14, 14),
+    ])
+    updater = DailyPriceUpdater(None, logging.getLogger("test"), dry_run=True,
+                                close_db=False, source="bars")
+    data = updater.compute_daily_prices(cursor, DAY)[test_instrument]
+    assert (data["open"], data["high"], data["low"], data["close"]) == (10, 16, 8, 14)
+
+
+def test_bars_mode_rebuilds_day_without_ticks(db, cursor, test_instrument):
+    insert_hour_bars(db, test_instrument, [
+        (datetime(2001, 2, 13, 9, 0, 0), 10, 12, 9, 11),
+        (datetime(2001, 2, 13, 16, 0, 0), 11, 13, 7, 12),
+    ])
+    updater = DailyPriceUpdater(None, logging.getLogger("test"), dry_run=True,
+                                close_db=False, source="bars")
+    data = updater.compute_daily_prices(cursor, DAY)[test_instrument]
+    assert (data["open"], data["high"], data["low"], data["close"]) == (10, 13, 7, 12)
+
+
+class RecordingCursor:
+    """Cursor wrapper keeping the SQL it runs."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.queries = []
+
+    def execute(self, sql, params=None):
+        self.queries.append(" ".join(sql.split()))
+        return self.cursor.execute(sql, params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+def test_bars_mode_skips_the_tick_scan_of_covered_day(db, cursor, test_instrument):
+    insert_ticks(db, test_instrument, [
+        (datetime(2001, 2, 13, 9, 0, 0), 10),
+        (datetime(2001, 2, 13, 11, 0, 0), 8),
+        (datetime(2001, 2, 13, 15, 0, 0), 16),
+    ])
+    # Bars span the first and last tick of the day
+    insert_hour_bars(db, test_instrument, [
+        (datetime(2001, 2, 13, 9, 0, 0), 10, 10, 10, 10),
+        (datetime(2001, 2, 13, 11, 0, 0), 8, 8, 8, 8),
+        (datetime(2001, 2, 13, 15, 0, 0), 16, 16, 16, 16),
+    ])
+    updater = DailyPriceUpdater(None, logging.getLogger("test"), dry_run=True,
+                                close_db=False, source="bars")
+    recording = RecordingCursor(cursor)
+    data = updater.compute_daily_prices(recording, DAY)[test_instrument]
+    assert (data["open"], data["high"], data["low"], data["close"]) == (10, 16, 8, 16)
+    assert not any("GROUP_CONCAT(price" in sql for sql in recording.queries)
@@ -0,0 +1,54 @@
+import lib.http_pool as http_pool
+from lib.http_pool import HttpSessionPool, get_session_pool
+
+
+def open_connection(pool, host):
+    # Creates a urllib3 connection object (counted by num_connections), no network I/O
+    pool.adapter.poolmanager.connection_from_host(host, 443, "https")._get_conn()
+
+
+def test_adapter_shared_by_both_schemes():
+    pool = HttpSessionPool(pool_size=4)
+    assert pool.session.get_adapter("https://example.org/") is pool.adapter
+    assert pool.session.get_adapter("http://example.org/") is pool.adapter
+
+
+def test_stats_count_each_pool_once():
+    pool = HttpSessionPool(pool_size=4)
+    open_connection(pool, "example.org")
+    open_connection(pool, "other.example.org")
+    pool.requests_sent = 5
+    assert pool.stats() == {"requests": 5, "connections_opened": 2, "connections_reused": 3}
+
+
+def test_stats_without_requests():
+    pool = HttpSessionPool()
+    assert pool.stats() == {"requests": 0, "connections_opened": 0, "connections_reused": 0}
+
+
+def test_shared_pool_is_created_once(monkeypatch):
+    monkeypatch.setattr(http_pool, "_shared_pool", None)
+    pool = get_session_pool(pool_size=3)
+    assert pool.pool_size == 3
+    assert get_session_pool() is pool
+
+
+def test_shared_rate_limiter_is_built_once(monkeypatch):
+    monkeypatch.setattr(http_pool, "_shared_pool", None)
+    settings = {"rate": 2, "burst": 4, "failure_threshold": 3, "reset_timeout": 30}
+    pool = get_session_pool(rate_limit=settings)
+    limiter = pool.rate_limiter
+    assert limiter is not None
+    assert get_session_pool(rate_limit=dict(settings)).rate_limiter is limiter
+    # Other settings keep the existing limiter (and log a warning)
+    assert get_session_pool(rate_limit=dict(settings, rate=10)).rate_limiter is limiter
+    assert get_session_pool().rate_limiter is limiter
+
+
+def test_rate_limiter_added_to_an_existing_pool(monkeypatch):
+    monkeypatch.setattr(http_pool, "_shared_pool", None)
+    pool = get_session_pool()
+    assert pool.rate_limiter is None
+    get_session_pool(rate_limit={"rate": 1})
+    assert pool.rate_limiter is not None
+    assert "throttled" in pool.stats()
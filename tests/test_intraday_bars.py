@@ -0,0 +1,42 @@
+import logging
+from datetime import datetime
+
+from app.update_realtime_prices import IntradayBarAccumulator
+
+
+def test_bar_start_buckets():
+    t = datetime(2025, 3, 4, 10, 37, 42, 123)
+    assert IntradayBarAccumulator.bar_start(t, 5) == datetime(2025, 3, 4, 10, 35)
+    assert IntradayBarAccumulator.bar_start(t, 60) == datetime(2025, 3, 4, 10, 0)
+    assert IntradayBarAccumulator.bar_start(datetime(2025, 3, 4, 10, 40), 5) == datetime(2025, 3, 4, 10, 40)
+
+
+def test_add_builds_ohlc_with_out_of_order_ticks():
+    acc = IntradayBarAccumulator(db=None, logger=logging.getLogger("test"), dry_run=True)
+    acc.add(1, 10.0, datetime(2025, 3, 4, 10, 31))
+    acc.add(1, 12.0, datetime(2025, 3, 4, 10, 33))
+    acc.add(1, 9.0, datetime(2025, 3, 4, 10, 30))   # earlier tick: new open
+    acc.add(1, 11.0, datetime(2025, 3, 4, 10, 32))  # not the latest: close unchanged
+
+    bar = acc.bars["price_bar_5m"][(1, datetime(2025, 3, 4, 10, 30))]
+    assert bar == [9.0, 12.0, 9.0, 12.0, 4,
+                   datetime(2025, 3, 4, 10, 30), datetime(2025, 3, 4, 10, 33)]
+
+
+def test_ticks_split_into_5m_bars_but_share_the_hour():
+    acc = IntradayBarAccumulator(db=None, logger=logging.getLogger("test"), dry_run=True)
+    acc.add(1, 10.0, datetime(2025, 3, 4, 10, 4))
+    acc.add(1, 11.0, datetime(2025, 3, 4, 10, 5))
+    acc.add(2, 20.0, datetime(2025, 3, 4, 10, 5))
+    assert len(acc.bars["price_bar_5m"]) == 3
+    assert len(acc.bars["price_bar_1h"]) == 2
+    hour = acc.bars["price_bar_1h"][(1, datetime(2025, 3, 4, 10, 0))]
+    assert hour[0] == 10.0 and hour[3] == 11.0 and hour[4] == 2
+
+
+def test_dry_run_flush_counts_and_clears():
+    acc = IntradayBarAccumulator(db=None, logger=logging.getLogger("test"), dry_run=True)
+    acc.add(1, 10.0, datetime(2025, 3, 4, 10, 4))
+    acc.add(1, 11.0, datetime(2025, 3, 4, 10, 5))
+    assert acc.flush() == 3  # two 5-minute bars, one hourly bar
+    assert acc.flush() == 0
@@ -0,0 +1,120 @@
+from datetime import date
+from decimal import Decimal
+
+from lib.lots import LotBook, LotLedger, effective_orders
+
+D = Decimal
+
+
+def order(oid, broker, instrument, order_type, qty, price, day=1, fingerprint=0):
+    return {
+        "id": oid,
+        "broker_account_id": broker,
+        "instrument_id": instrument,
+        "order_type": order_type,
+        "quantity": D(qty),
+        "price": D(price),
+        "trade_date": date(2025, 1, day),
+        "fingerprint": fingerprint,
+    }
+
+
+def test_sell_consumes_lots_fifo():
+    book = LotBook()
+    book.buy(D(10), D(100))
+    book.buy(D(10), D(120))
+    realized = book.sell(D(15), D(130))
+    # 10 @ 100 then 5 @ 120
+    assert realized == D(10) * 30 + D(5) * 10
+    assert book.position == D(5)
+    assert [(lot.qty, lot.price) for lot in book.lots] == [(D(5), D(120))]
+    assert book.avg_cost() == D(120)
+
+
+def test_partial_sell_keeps_running_totals():
+    book = LotBook()
+    book.buy(D(4), D(10))
+    book.buy(D(6), D(20))
+    book.sell(D(1), D(15))
+    assert book.open_qty == D(9)
+    assert book.open_cost == D(3) * 10 + D(6) * 20
+    assert book.avg_cost() == book.open_cost / book.open_qty
+
+
+def test_oversell_empties_lots_and_goes_short():
+    book = LotBook()
+    book.buy(D(3), D(10))
+    realized = book.sell(D(5), D(12))
+    assert realized == D(3) * 2  # only the 3 bought shares realize P/L
+    assert book.position == D(-2)
+    assert not book.lots
+    assert book.open_qty == 0
+    assert book.avg_cost() == 0
+
+
+def test_apply_ignores_unknown_order_types():
+    book = LotBook()
+    book.apply("DIVIDEND", D(1), D(1))
+    assert book.position == 0
+    assert not book.lots
+
+
+def test_dump_and_restore_round_trip():
+    book = LotBook()
+    book.buy(D("2.5"), D("10.10"))
+    book.buy(D(4), D("11.25"))
+    book.sell(D(1), D(12))
+    restored = LotBook.restore(book.position, book.realized_pl, book.dump_lots())
+    assert restored.position == book.position
+    assert restored.realized_pl == book.realized_pl
+    assert restored.open_qty == book.open_qty
+    assert restored.open_cost == book.open_cost
+    assert [(lot.qty, lot.price) for lot in restored.lots] == [(lot.qty, lot.price) for lot in book.lots]
+
+
+def test_ledger_resumed_from_checkpoints_matches_full_replay():
+    orders = [
+        order(1, 1, 7, "BUY", 10, 100, day=1, fingerprint=11),
+        order(2, 1, 7, "BUY", 5, 110, day=2, fingerprint=22),
+        order(3, 1, 8, "BUY", 3, 50, day=2, fingerprint=33),
+        order(4, 1, 7, "SELL", 12, 120, day=3, fingerprint=44),
+        order(5, 2, 7, "BUY", 1, 90, day=3, fingerprint=55),
+        order(6, 1, 8, "SELL", 1, 60, day=4, fingerprint=66),
+    ]
+    full = LotLedger()
+    full.apply(orders)
+
+    first = LotLedger()
+    first.apply(orders[:3])
+    checkpoints = {
+        (c["broker_account_id"], c["instrument_id"]): c for c in first.checkpoints()
+    }
+    resumed = LotLedger()
+    resumed.resume(checkpoints)
+    resumed.apply(orders[3:])
+
+    for key, book in full.books.items():
+        other = resumed.books[key]
+        assert (other.position, other.realized_pl, other.open_qty, other.open_cost) == \
+            (book.position, book.realized_pl, book.open_qty, book.open_cost)
+    assert resumed.marks == full.marks
+    assert resumed.marks[(1, 7)] == [date(2025, 1, 3), 4, 3, 11 ^ 22 ^ 44]
+
+
+def test_ledger_checkpoints_only_changed_pairs():
+    ledger = LotLedger()
+    ledger.resume({
+        (1, 7): {"position": D(1), "realized_pl": D(0), "lots": '[["1", "10"]]',
+                 "last_trade_date": date(2025, 1, 1), "last_order_id": 1,
+                 "order_count": 1, "fingerprint": 5},
+    })
+    ledger.apply([order(2, 1, 8, "BUY", 2, 20)])
+    assert [(c["broker_account_id"], c["instrument_id"]) for c in ledger.checkpoints()] == [(1, 8)]
+    assert set(ledger.broker_books(1)) == {7, 8}
+    assert ledger.broker_books(99) == {}
+
+
+
+def test_effective_orders_condition():
+    assert effective_orders() == "status = 'ACTIVE' AND settled = 1"
+    assert effective_orders("o") == "o.status = 'ACTIVE' AND o.settled = 1"
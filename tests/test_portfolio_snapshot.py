@@ -0,0 +1,168 @@
+import logging
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.update_portfolio_snapshot import PortfolioSnapshotUpdater
+from lib.lots import LotLedger
+
+D = Decimal
+BROKERS = [{"id": 1, "name": "PEA"}, {"id": 2, "name": "CTO"}, {"id": 3, "name": "Empty"}]
+
+
+def order(oid, broker_id, instrument_id, order_type, quantity, price):
+    return {"id": oid, "fingerprint": 0, "broker_account_id": broker_id, "instrument_id": instrument_id, "order_type": order_type,
+            "quantity": D(quantity), "price": D(price), "trade_date": date(2024, 1, 1)}
+
+
+def make_updater(orders, prices):
+    updater = PortfolioSnapshotUpdater.__new__(PortfolioSnapshotUpdater)
+    updater.logger = logging.getLogger("test")
+    updater.dry_run = True
+    updater.snapshot_date = date(2024, 6, 28)
+    updater.price_lookups = []
+
+    def fetch_latest_prices(instrument_ids):
+        updater.price_lookups.append(set(instrument_ids))
+        return {i: D(prices[i]) for i in instrument_ids}
+
+    updater.load_cash_balances = lambda *args: {1: D("100"), 2: D("50")}
+    updater.load_dividends_received = lambda *args: {1: D("7")}
+    updater.load_invested_amounts = lambda *args: {1: D("1000"), 2: D("400")}
+    def load_lot_ledger(*args):
+        ledger = LotLedger()
+        ledger.apply(orders)
+        return ledger
+
+    updater.load_lot_ledger = load_lot_ledger
+    updater.fetch_latest_prices = fetch_latest_prices
+    return updater
+
+
+def test_compute_snapshots_for_all_accounts_at_once():
+    orders = [
+        order(1, 1, 10, "BUY", 10, 100), order(2, 1, 10, "BUY", 10, 120), order(3, 1, 10, "SELL", 15, 130),
+        order(4, 2, 20, "BUY", 4, 100), order(5, 2, 10, "BUY", 1, 90), order(6, 2, 10, "SELL", 1, 95),
+    ]
+    updater = make_updater(orders, {10: "125", 20: "110"})
+    snapshots = {s["broker_account_id"]: s for s in updater.compute_snapshots(BROKERS)}
+
+    # Prices of the open positions of every account in a single lookup
+    assert updater.price_lookups == [{10, 20}]
+
+    pea = snapshots[1]
+    assert pea["realized_pl"] == D(10 * 30 + 5 * 10)   # FIFO: 10 @100, then 5 @120
+    assert pea["unrealized_pl"] == D(5 * 5)            # 5 left @120, priced 125
+    assert pea["total_value"] == D("1025")
+    assert (pea["cash_balance"], pea["dividends_received"]) == (D("100"), D("7"))
+
+    cto = snapshots[2]
+    assert (cto["realized_pl"], cto["unrealized_pl"]) == (D(5), D(40))
+    assert cto["dividends_received"] == D("0.00")
+
+    empty = snapshots[3]
+    assert (empty["invested_amount"], empty["unrealized_pl"], empty["realized_pl"]) == (0, 0, 0)
+    assert empty["date"] == date(2024, 6, 28)
+
+
+def make_replay_updater(streams):
+    updater = PortfolioSnapshotUpdater.__new__(PortfolioSnapshotUpdater)
+    updater.logger = logging.getLogger("test")
+    updater.dry_run = True
+    updater.snapshot_date = date(2024, 1, 31)
+    updater.stored = []
+    updater._stream = lambda kind, sql, params=(): ((row["day"], kind, row) for row in streams[kind])
+    updater.fetch_broker_accounts = lambda: [{"id": 1, "name": "PEA"}]
+    updater.store_snapshots = updater.stored.extend
+    return updater
+
+
+REPLAY_STREAMS = {
+    "order": [
+        {"day": date(2024, 1, 2), "broker_account_id": 1, "instrument_id": 10,
+         "order_type": "BUY", "quantity": D(10), "price": D(100)},
+        {"day": date(2024, 1, 4), "broker_account_id": 1, "instrument_id": 10,
+         "order_type": "SELL", "quantity": D(4), "price": D(110)},
+    ],
+    "cash": [
+        {"day": date(2024, 1, 2), "broker_account_id": 1, "type": "DEPOSIT", "amount": D(1000)},
+        {"day": date(2024, 1, 3), "broker_account_id": 1, "type": "DEPOSIT", "amount": D(200)},
+        {"day": date(2024, 1, 4), "broker_account_id": 1, "type": "DIVIDEND", "amount": D(5)},
+    ],
+    "close": [
+        {"day": date(2024, 1, 2), "instrument_id": 10, "close_price": D(105)},
+        {"day": date(2024, 1, 4), "instrument_id": 10, "close_price": D(108)},
+    ],
+}
+
+
+def test_replay_merges_streams_by_day_orders_first():
+    events = make_replay_updater(REPLAY_STREAMS).replay_events(date(2024, 1, 31))
+    assert [(day.day, kind) for day, kind, _ in events] == [
+        (2, "order"), (2, "cash"), (2, "close"),
+        (3, "cash"),
+        (4, "order"), (4, "cash"), (4, "close"),
+    ]
+
+
+def test_replay_snapshots_each_trading_day():
+    updater = make_replay_updater(REPLAY_STREAMS)
+    assert updater.replay_history() == 2
+    first, second = updater.stored
+
+    # The cash-only day is not a trading day but still counts afterwards
+    assert (first["date"], second["date"]) == (date(2024, 1, 2), date(2024, 1, 4))
+    assert (first["invested_amount"], first["unrealized_pl"], first["cash_balance"]) == (1000, 50, 1000)
+    assert second["invested_amount"] == 1000 - 4 * 110
+    assert (second["realized_pl"], second["unrealized_pl"]) == (4 * 10, 6 * 8)
+    assert (second["cash_balance"], second["dividends_received"]) == (1205, 5)
+
+
+def test_replay_from_start_stores_later_days_only():
+    updater = make_replay_updater(REPLAY_STREAMS)
+    assert updater.replay_history(start=date(2024, 1, 3)) == 1
+    assert updater.stored[0]["realized_pl"] == 40
+
+
+def test_shard_partitions_accounts_round_robin():
+    brokers = [{"id": i, "name": f"B{i}"} for i in range(1, 8)]
+    shards = PortfolioSnapshotUpdater.shard(brokers, 3)
+    assert [[b["id"] for b in shard] for shard in shards] == [[1, 4, 7], [2, 5], [3, 6]]
+    assert sorted(b["id"] for shard in shards for b in shard) == list(range(1, 8))
+
+
+def test_shard_drops_empty_shards():
+    brokers = [{"id": 1, "name": "PEA"}, {"id": 2, "name": "CTO"}]
+    assert PortfolioSnapshotUpdater.shard(brokers, 4) == [[brokers[0]], [brokers[1]]]
+    assert PortfolioSnapshotUpdater.shard([], 4) == []
+
+
+class FakeLotStore:
+    """LotCheckpointStore stand-in: one stale checkpoint, if anyone asks."""
+
+    def __init__(self):
+        self.verified = False
+
+    def invalidate_stale(self, broker_ids=None):
+        self.verified = True
+        return [(1, 7)]
+
+    def load(self, broker_ids=None, skip=()):
+        return {}
+
+    def fetch_new_orders(self, broker_ids=None, replay=()):
+        self.replayed = list(replay)
+        return []
+
+
+@pytest.mark.parametrize("verify_lots", [False, True])
+def test_lot_history_is_only_scanned_on_verify(verify_lots):
+    updater = PortfolioSnapshotUpdater.__new__(PortfolioSnapshotUpdater)
+    updater.logger = logging.getLogger("test")
+    updater.rebuild_lots = False
+    updater.verify_lots = verify_lots
+    updater.lot_store = FakeLotStore()
+    updater.load_lot_ledger()
+    assert updater.lot_store.verified is verify_lots
+    assert updater.lot_store.replayed == ([(1, 7)] if verify_lots else [])
@@ -0,0 +1,47 @@
+import logging
+from datetime import datetime
+
+from app.update_realtime_prices import PriceChangeFilter
+
+
+def make_filter():
+    f = PriceChangeFilter(logging.getLogger("test"), heartbeat_minutes=15)
+    f.mark(1, 10.0, 1.5, datetime(2025, 3, 4, 10, 0))
+    return f
+
+
+def test_first_tick_is_written():
+    f = PriceChangeFilter(logging.getLogger("test"), heartbeat_minutes=15)
+    assert f.should_write(1, 10.0, 1.5, datetime(2025, 3, 4, 10, 0))
+
+
+def test_unchanged_price_is_skipped():
+    f = make_filter()
+    assert not f.should_write(1, 10.0, 1.5, datetime(2025, 3, 4, 10, 5))
+    # below the column precision: still the same value
+    assert not f.should_write(1, 10.00001, 1.501, datetime(2025, 3, 4, 10, 6))
+    assert f.skipped == 2
+
+
+def test_changed_price_or_capital_is_written():
+    f = make_filter()
+    assert f.should_write(1, 10.01, 1.5, datetime(2025, 3, 4, 10, 5))
+    assert f.should_write(1, 10.0, 1.6, datetime(2025, 3, 4, 10, 5))
+    assert f.should_write(1, 10.0, None, datetime(2025, 3, 4, 10, 5))
+    assert f.skipped == 0
+
+
+def test_heartbeat_elapsed_is_written():
+    f = make_filter()
+    assert not f.should_write(1, 10.0, 1.5, datetime(2025, 3, 4, 10, 14, 59))
+    assert f.should_write(1, 10.0, 1.5, datetime(2025, 3, 4, 10, 15))
+
+
+def test_new_day_is_written():
+    f = make_filter()
+    assert f.should_write(1, 10.0, 1.5, datetime(2025, 3, 5, 9, 0))
+
+
+def test_other_instruments_are_independent():
+    f = make_filter()
+    assert f.should_write(2, 10.0, 1.5, datetime(2025, 3, 4, 10, 5))
@@ -0,0 +1,70 @@
+import logging
+from datetime import datetime, time as dtime, timedelta
+
+from app.price_scheduler import PriceScheduler, parse_cadences, parse_days, parse_hhmm
+
+
+class FakeDb:
+    def ping(self):
+        pass
+
+
+class FakeRealtime:
+    def __init__(self, instruments):
+        self.instruments = instruments
+        self.sweeps = []
+
+    def fetch_instruments(self):
+        return list(self.instruments)
+
+    def run(self, async_mode=False, instruments=None):
+        self.sweeps.append(sorted(instr["id"] for instr in instruments))
+
+
+def make_scheduler(instruments):
+    scheduler = PriceScheduler.__new__(PriceScheduler)  # no DB connection
+    scheduler.logger = logging.getLogger("test")
+    scheduler.db = FakeDb()
+    scheduler.realtime = FakeRealtime(instruments)
+    scheduler.async_mode = False
+    scheduler.cadences = parse_cadences("STOCK:5,ETF:15", 5)
+    scheduler.watch_interval = 60
+    scheduler.next_poll = {}
+    return scheduler
+
+
+def instr(iid, typ, held):
+    return {"id": iid, "type": typ, "held": held}
+
+
+def test_parsers():
+    assert parse_hhmm("09:05") == dtime(9, 5)
+    assert parse_days("Mon, Tue,fri") == {0, 1, 4}
+    assert parse_cadences("STOCK:5,ETF:15", 10) == {"STOCK": 5, "ETF": 15, "BOND": 10, "FUND": 10, "OTHER": 10}
+
+
+def test_watch_only_groups_use_the_watch_interval():
+    scheduler = make_scheduler([])
+    assert scheduler.cadence("STOCK", True) == 5
+    assert scheduler.cadence("STOCK", False) == 60
+
+
+def test_groups_polled_at_their_cadence():
+    now = datetime(2025, 3, 4, 10, 0)
+    scheduler = make_scheduler([instr(1, "STOCK", True), instr(2, "ETF", False)])
+    scheduler.poll(now)
+    assert scheduler.realtime.sweeps == [[1, 2]]
+    scheduler.poll(now + timedelta(minutes=5))
+    assert scheduler.realtime.sweeps == [[1, 2], [1]]
+
+
+def test_new_position_polled_before_the_other_groups_are_due():
+    now = datetime(2025, 3, 4, 10, 0)
+    scheduler = make_scheduler([instr(2, "ETF", False)])
+    scheduler.poll(now)
+    # A position is opened: the (ETF, held) group is polled on the next wake-up
+    scheduler.realtime.instruments = [instr(2, "ETF", True)]
+    scheduler.poll(now + timedelta(minutes=1))
+    assert scheduler.realtime.sweeps == [[2], [2]]
+    assert set(scheduler.next_poll) == {("ETF", True)}
+    assert scheduler.next_poll[("ETF", True)] == now + timedelta(minutes=16)
@@ -0,0 +1,132 @@
+import logging
+
+import pytest
+
+from lib.extractor import Quote
+from lib.fetcher import DEFAULT_CATEGORIES, parse_categories, url_category
+from lib.providers import (BoursoramaProvider, LocalFileProvider, PriceProvider, ProviderError,
+                           select_providers)
+from app.update_realtime_prices import RealtimePriceUpdater
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeHttp:
+    def __init__(self, statuses):
+        self.statuses = statuses  # symbol -> HTTP status
+        self.urls = []
+
+    def get(self, url, timeout=10, stream=False):
+        self.urls.append(url)
+        symbol = url.rstrip("/").rsplit("1r", 1)[1]
+        return FakeResponse(self.statuses.get(symbol, 200))
+
+
+def instr(iid, symbol, typ="ETF"):
+    return {"id": iid, "symbol": symbol, "type": typ}
+
+
+def make_provider(statuses=None, categories=None):
+    return BoursoramaProvider(FakeHttp(statuses or {}),
+                              "https://example.org/bourse/{category}/cours/1r{symbol}/",
+                              categories=categories)
+
+
+def test_parse_categories_overrides_defaults():
+    categories = parse_categories("stock:cours, FUND:fonds")
+    assert categories["STOCK"] == "cours"
+    assert categories["FUND"] == "fonds"
+    assert categories["ETF"] == DEFAULT_CATEGORIES["ETF"]
+    assert parse_categories("") == DEFAULT_CATEGORIES
+
+
+def test_url_category_falls_back_to_other():
+    assert url_category(DEFAULT_CATEGORIES, "BOND") == "obligations"
+    assert url_category(DEFAULT_CATEGORIES, None) == DEFAULT_CATEGORIES["OTHER"]
+    assert url_category(DEFAULT_CATEGORIES, "WARRANT") == DEFAULT_CATEGORIES["OTHER"]
+
+
+def test_url_category_follows_instrument_type():
+    provider = make_provider(categories=parse_categories("STOCK:actions,ETF:trackers"))
+    assert provider.describe(instr(1, "ABC", "STOCK")) == "https://example.org/bourse/actions/cours/1rABC/"
+    assert provider.describe(instr(2, "XYZ", "ETF")) == "https://example.org/bourse/trackers/cours/1rXYZ/"
+
+
+def test_unknown_symbol_is_left_out_of_the_batch():
+    provider = make_provider({"NOPE": 404})
+    quotes = provider.fetch([instr(1, "ABC"), instr(2, "NOPE"), instr(3, "XYZ")])
+    assert set(quotes) == {1, 3}
+    assert isinstance(quotes[1], Quote)
+
+
+@pytest.mark.parametrize("status", [403, 429, 500, 503])
+def test_refusals_and_server_errors_raise(status):
+    provider = make_provider({"XYZ": status})
+    with pytest.raises(ProviderError):
+        provider.fetch([instr(1, "ABC"), instr(2, "XYZ")])
+
+
+def test_price_provider_is_abstract():
+    with pytest.raises(TypeError):
+        PriceProvider()
+
+
+def test_select_providers_cheapest_first():
+    class Cheap(PriceProvider):
+        name, cost, batch_size = "cheap", 1.0, 10
+
+        def fetch(self, instruments):
+            return {}
+
+    class BondsOnly(PriceProvider):
+        name, cost, types = "bonds", 0.0, {"BOND"}
+
+        def fetch(self, instruments):
+            return {}
+
+    web = make_provider()
+    cheap, bonds = Cheap(), BondsOnly()
+    assert select_providers([web, cheap, bonds], "ETF") == [cheap, web]
+    assert select_providers([web, cheap, bonds], "BOND") == [bonds, cheap, web]
+
+
+def test_symbol_unknown_to_every_provider_is_not_retried(monkeypatch):
+    provider = make_provider({"NOPE": 404})
+    updater = RealtimePriceUpdater(None, logging.getLogger("test"), dry_run=True, http=provider.http,
+                                   close_db=False, providers=[provider])
+    monkeypatch.setattr("app.update_realtime_prices.time.sleep",
+                        lambda s: pytest.fail("unknown symbol retried"))
+    nope = instr(1, "NOPE")
+    assert updater.fetch_quote(nope) is None
+    updater.update_instrument(nope)
+    assert len(provider.http.urls) == 2
+    assert not updater.writer.rows
+
+
+def test_unreadable_local_page_fails_over(tmp_path):
+    (tmp_path / "BAD.html").mkdir()  # open() raises IsADirectoryError
+    local = LocalFileProvider(str(tmp_path))
+    with pytest.raises(ProviderError):
+        local.fetch([instr(1, "BAD")])
+
+    class Backup(PriceProvider):
+        name, cost = "backup", 1.0
+
+        def fetch(self, instruments):
+            return {i["id"]: Quote(12.5, "EUR", None) for i in instruments}
+
+    backup = Backup()
+    updater = RealtimePriceUpdater(None, logging.getLogger("test"), dry_run=True,
+                                   close_db=False, providers=[local, backup])
+    assert updater.fetch_quote(instr(1, "BAD")).price == 12.5
+    # The failed batch leaves the symbol to the next provider
+    remaining = updater.fetch_batches([instr(2, "BAD")])
+    assert [(r["symbol"], r["providers"]) for r in remaining] == [("BAD", [backup])]
@@ -0,0 +1,33 @@
+import os
+
+from lib.extractor import QuoteExtractor, extract_quote
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "quotes")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_extract_quote_with_capital_label():
+    quote = extract_quote(load_fixture("tracker_with_capital.html"))
+    assert quote.price == 523.184
+    assert quote.currency == "EUR"
+    assert quote.capital_exchanged == 0.02
+
+
+def test_extract_quote_falls_back_to_first_percentage():
+    quote = extract_quote(load_fixture("tracker_without_label.html"))
+    assert quote.price == 27.315
+    assert quote.currency == "EUR"
+    assert quote.capital_exchanged == 0.15
+
+
+def test_extract_quote_empty_page():
+    assert extract_quote("") == (None, None, None)
+
+
+def test_extractor_complete_flag():
+    extractor = QuoteExtractor().feed(load_fixture("tracker_with_capital.html"))
+    assert extractor.complete
@@ -0,0 +1,56 @@
+import os
+
+from lib.extractor import extract_quote
+from lib.fetcher import read_quote_streamed
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "quotes")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class FakeResponse:
+    """stream=True response serving `body` in chunks, recording what was read."""
+
+    def __init__(self, body, encoding="utf-8"):
+        self.body = body
+        self.encoding = encoding
+        self.chunks_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            self.chunks_read += 1
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def test_stops_reading_once_the_quote_is_complete():
+    body = load_fixture("tracker_with_capital.html")
+    page = body + b"<p>" + b"x" * 200000 + b"</p>"  # long tail never needed
+    response = FakeResponse(page)
+    quote = read_quote_streamed(response, chunk_size=1024)
+    assert quote == extract_quote(body.decode("utf-8"))
+    assert response.chunks_read < len(page) // 1024
+    assert response.closed
+
+
+def test_incomplete_page_is_read_whole():
+    body = load_fixture("tracker_with_capital.html")
+    page = body[:len(body) // 3]
+    response = FakeResponse(page)
+    quote = read_quote_streamed(response, chunk_size=64)
+    assert quote == extract_quote(page.decode("utf-8", errors="replace"))
+    assert response.chunks_read == -(-len(page) // 64)
+    assert response.closed
+
+
+def test_same_result_whatever_the_chunk_size():
+    body = load_fixture("tracker_without_label.html")
+    expected = extract_quote(body.decode("utf-8"))
+    for chunk_size in (1, 7, 100, 4096, len(body)):
+        assert read_quote_streamed(FakeResponse(body), chunk_size=chunk_size) == expected
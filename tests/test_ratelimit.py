@@ -0,0 +1,97 @@
+import pytest
+
+import lib.ratelimit as ratelimit
+from lib.ratelimit import CircuitBreaker, CircuitOpenError, HostRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(ratelimit.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_token_bucket_allows_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    waited = bucket.acquire()
+    assert waited == pytest.approx(0.5)
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 10  # refill is capped at burst
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_circuit_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.record_success() is False
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_then_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # a single probe at a time
+    assert breaker.record_success() is True
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_host_limiter_rejects_while_open_and_counts(clock):
+    limiter = HostRateLimiter(rate=0, failure_threshold=2, reset_timeout=60)
+    url = "https://example.org/quote/ABC"
+    for _ in range(2):
+        limiter.before_request(url)
+        limiter.after_request(url, 429)
+    with pytest.raises(CircuitOpenError):
+        limiter.before_request(url)
+    # other hosts are not affected
+    limiter.before_request("https://other.example.org/quote/ABC")
+    assert limiter.stats()["rejected"] == 1
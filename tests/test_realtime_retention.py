@@ -0,0 +1,98 @@
+import logging
+from datetime import date, datetime
+
+import pytest
+
+from app.prune_realtime_prices import RealtimePriceRetention
+from lib.db import DatabaseConnection
+
+DAY = date(2000, 1, 5)
+CUTOFF = datetime(2000, 1, 6)
+
+
+@pytest.fixture
+def retention_db(config):
+    conn = DatabaseConnection(
+        config.get("DB_HOST", "localhost"), config.get("DB_USER"), config.get("DB_PASS"),
+        config.get("DB_NAME"), int(config.get("DB_PORT", 3306))
+    )
+    yield conn
+    conn.close()
+
+
+def retention(db, **kwargs):
+    return RealtimePriceRetention(db, logging.getLogger("test"), batch_size=2, batch_pause=0, **kwargs)
+
+
+def insert_ticks(db, instrument_id, ticks):
+    with db.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO realtime_price (instrument_id, price, captured_at) VALUES (%s, %s, %s)",
+            [(instrument_id, price, captured_at) for captured_at, price in ticks]
+        )
+    db.commit()
+
+
+def fetch(db, sql, instrument_id):
+    db.commit()  # fresh snapshot: the job writes through its own connection
+    with db.cursor() as cur:
+        cur.execute(sql, (instrument_id,))
+        return cur.fetchall()
+
+
+def test_downsample_day_covers_only_that_day(db, retention_db, test_instrument):
+    insert_ticks(db, test_instrument, [
+        (datetime(2000, 1, 4, 23, 59, 59), 1),    # day before
+        (datetime(2000, 1, 5, 9, 1, 0), 10),
+        (datetime(2000, 1, 5, 9, 3, 0), 12),
+        (datetime(2000, 1, 5, 9, 7, 0), 8),
+        (datetime(2000, 1, 5, 10, 0, 0), 11),
+        (datetime(2000, 1, 6, 0, 0, 0), 99),      # next day (excluded bound)
+    ])
+    retention(retention_db).downsample_day(DAY)
+
+    bars_5m = fetch(db, """
+        SELECT bar_start, open_price, high_price, low_price, close_price, tick_count
+        FROM price_bar_5m WHERE instrument_id = %s ORDER BY bar_start""", test_instrument)
+    assert [(b["bar_start"], b["open_price"], b["close_price"], b["tick_count"]) for b in bars_5m] == [
+        (datetime(2000, 1, 5, 9, 0), 10, 12, 2),
+        (datetime(2000, 1, 5, 9, 5), 8, 8, 1),
+        (datetime(2000, 1, 5, 10, 0), 11, 11, 1),
+    ]
+
+    bars_1h = fetch(db, """
+        SELECT bar_start, open_price, high_price, low_price, close_price, tick_count
+        FROM price_bar_1h WHERE instrument_id = %s ORDER BY bar_start""", test_instrument)
+    assert [(b["bar_start"], b["open_price"], b["high_price"], b["low_price"],
+             b["close_price"], b["tick_count"]) for b in bars_1h] == [
+        (datetime(2000, 1, 5, 9, 0), 10, 12, 8, 8, 3),
+        (datetime(2000, 1, 5, 10, 0), 11, 11, 11, 11, 1),
+    ]
+
+
+def test_delete_ticks_walks_id_windows(db, retention_db, test_instrument):
+    # Kept ticks sit between deleted ones, inside the id windows
+    insert_ticks(db, test_instrument, [
+        (datetime(2000, 1, 3, 10, 0, 0), 1),
+        (datetime(2000, 1, 3, 11, 0, 0), 2),
+        (datetime(2000, 1, 6, 10, 0, 0), 3),      # kept
+        (datetime(2000, 1, 4, 10, 0, 0), 4),
+        (datetime(2000, 1, 4, 11, 0, 0), 5),
+        (datetime(2000, 1, 5, 23, 59, 59), 6),
+        (datetime(2000, 1, 6, 0, 0, 0), 7),       # kept: cutoff is excluded
+    ])
+    job = retention(retention_db)
+    assert job.delete_ticks(CUTOFF) == 5
+    assert job.report["realtime_price"]["rows"] == 5
+
+    rows = fetch(db, "SELECT price FROM realtime_price WHERE instrument_id = %s ORDER BY id", test_instrument)
+    assert [row["price"] for row in rows] == [3, 7]
+
+
+def test_delete_ticks_dry_run_keeps_rows(db, retention_db, test_instrument):
+    insert_ticks(db, test_instrument, [
+        (datetime(2000, 1, 4, 10, 0, 0), 1),
+        (datetime(2000, 1, 5, 10, 0, 0), 2),
+    ])
+    assert retention(retention_db, dry_run=True).delete_ticks(CUTOFF) == 2
+    assert len(fetch(db, "SELECT id FROM realtime_price WHERE instrument_id = %s", test_instrument)) == 2
@@ -0,0 +1,157 @@
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.recalc_cash_balances import CashBalanceRecalculator
+from lib.db import DatabaseConnection
+
+
+def make_recalc(config=None, incremental=True, verify=False):
+    recalc = CashBalanceRecalculator.__new__(CashBalanceRecalculator)
+    recalc.config = config
+    recalc.logger = logging.getLogger("test")
+    recalc.dry_run = False
+    recalc.incremental = incremental or verify
+    recalc.verify = verify
+    if config is not None:
+        recalc.db = DatabaseConnection(
+            config.get("DB_HOST", "localhost"), config.get("DB_USER"), config.get("DB_PASS"),
+            config.get("DB_NAME"), int(config.get("DB_PORT", 3306))
+        )
+    return recalc
+
+
+def checkpoint(**changes):
+    row = {"tx_count": 3, "seen_count": 3, "fingerprint": 1234, "seen_fingerprint": 1234,
+           "backdated": 0, "last_tx_date": datetime(2025, 1, 3)}
+    row.update(changes)
+    return row
+
+
+@pytest.mark.parametrize("changes, valid", [
+    ({}, True),
+    ({"seen_count": 2}, False),                                 # deleted row
+    ({"seen_fingerprint": 99}, False),                          # edited row
+    ({"fingerprint": Decimal(1234), "seen_fingerprint": Decimal(1234)}, True),  # BIT_XOR type
+    ({"backdated": 1}, False),                                  # back-dated insert
+])
+def test_checkpoint_is_valid(changes, valid):
+    assert make_recalc().checkpoint_is_valid("PEA", checkpoint(**changes)) is valid
+
+
+class RecordingDb:
+    """DatabaseConnection stand-in keeping the SQL it runs."""
+
+    def __init__(self):
+        self.queries = []
+
+    @contextmanager
+    def cursor(self):
+        cur = SimpleNamespace(execute=lambda sql, params=None: self.queries.append(sql),
+                              fetchall=lambda: [])
+        yield cur
+
+
+@pytest.mark.parametrize("verify", [False, True])
+def test_history_below_the_watermarks_is_only_scanned_on_verify(verify):
+    recalc = make_recalc(verify=verify)
+    recalc.db = RecordingDb()
+    recalc.fetch_checkpoints()
+    assert ("cash_transaction" in recalc.db.queries[0]) is verify
+
+
+# -----------------------------------------------------------------------------
+# Incremental runs against the database
+# -----------------------------------------------------------------------------
+
+def add_cash(db, broker_id, day, ttype, amount):
+    with db.cursor() as cur:
+        cur.execute(
+            "INSERT INTO cash_transaction (broker_account_id, date, type, amount) VALUES (%s, %s, %s, %s)",
+            (broker_id, day, ttype, amount)
+        )
+        tx_id = cur.lastrowid
+    db.commit()
+    return tx_id
+
+
+def run_recalc(config, db, broker, incremental=True, verify=False):
+    recalc = make_recalc(config, incremental, verify)
+    recalc.fetch_brokers_with_cash = lambda: [{"id": broker["broker_account_id"], "name": broker["broker_name"]}]
+    recalc.fetch_latest_snapshot_date = lambda: date(2000, 1, 1)
+    try:
+        recalc.run()
+        checkpoints = recalc.fetch_checkpoints()
+    finally:
+        recalc.db.close()
+    db.commit()  # fresh snapshot: the recalc writes through its own connection
+    with db.cursor() as cur:
+        cur.execute("SELECT current_balance FROM cash_account WHERE broker_account_id = %s",
+                    (broker["broker_account_id"],))
+        balance = cur.fetchone()["current_balance"]
+    return balance, checkpoints[broker["broker_account_id"]], recalc
+
+
+def stored_checkpoint(config, broker_id, verify=False):
+    recalc = make_recalc(config, verify=verify)
+    try:
+        return recalc, recalc.fetch_checkpoints().get(broker_id)
+    finally:
+        recalc.db.close()
+
+
+def test_incremental_recalc_follows_new_edited_and_backdated_rows(config, db, test_broker):
+    bid = test_broker["broker_account_id"]
+    first = add_cash(db, bid, datetime(2025, 1, 2), "DEPOSIT", 100)
+    add_cash(db, bid, datetime(2025, 1, 3), "WITHDRAWAL", 30)
+
+    balance, cp, recalc = run_recalc(config, db, test_broker, incremental=False, verify=True)
+    assert balance == Decimal("70.00")
+    assert (cp["tx_count"], cp["balance"]) == (2, Decimal("70.00"))
+    assert recalc.checkpoint_is_valid("test", cp)
+
+    # New row: applied on top of the watermark, which the triggers keep
+    add_cash(db, bid, datetime(2025, 1, 4), "DEPOSIT", 50)
+    assert stored_checkpoint(config, bid)[1] is not None
+    balance, cp, recalc = run_recalc(config, db, test_broker, verify=True)
+    assert balance == Decimal("120.00")
+    assert cp["tx_count"] == 3 and recalc.checkpoint_is_valid("test", cp)
+
+    # Edited row below the watermark: the trigger drops it, full rebuild
+    with db.cursor() as cur:
+        cur.execute("UPDATE cash_transaction SET amount = 200 WHERE id = %s", (first,))
+    db.commit()
+    assert stored_checkpoint(config, bid)[1] is None
+    balance, cp, recalc = run_recalc(config, db, test_broker, verify=True)
+    assert balance == Decimal("220.00")
+    assert recalc.checkpoint_is_valid("test", cp)
+
+    # Back-dated row (newer id, older date) drops it too
+    add_cash(db, bid, datetime(2025, 1, 1), "FEES", 5)
+    assert stored_checkpoint(config, bid)[1] is None
+    balance, cp, recalc = run_recalc(config, db, test_broker, verify=True)
+    assert balance == Decimal("215.00")
+    assert (cp["tx_count"], cp["backdated"]) == (4, 0)
+
+
+def test_verify_catches_changes_the_triggers_missed(config, db, test_broker):
+    bid = test_broker["broker_account_id"]
+    add_cash(db, bid, datetime(2025, 1, 2), "DEPOSIT", 100)
+    run_recalc(config, db, test_broker, incremental=False)
+
+    # Watermark out of step with the ledger (e.g. rows restored from a dump)
+    with db.cursor() as cur:
+        cur.execute("UPDATE cash_balance_checkpoint SET fingerprint = fingerprint ^ 1 "
+                    "WHERE broker_account_id = %s", (bid,))
+    db.commit()
+    balance, _, _ = run_recalc(config, db, test_broker)
+    assert balance == Decimal("100.00")  # trusted, nothing new to apply
+    recalc, cp = stored_checkpoint(config, bid, verify=True)
+    assert not recalc.checkpoint_is_valid("test", cp)
+    balance, cp, recalc = run_recalc(config, db, test_broker, verify=True)
+    assert balance == Decimal("100.00")
+    assert recalc.checkpoint_is_valid("test", cp)
@@ -7,12 +7,14 @@
  * 
  * Request:
  * GET /api/getCashBalance.php?broker_account_id=123
+ * GET /api/getCashBalance.php?broker_account_id=123&as_of=2024-12-31
  * 
  * Response:
  * {
  *   "broker_account_id": 123,
  *   "balance": 1000.50
  * }
+ * (with as_of, the response also contains "as_of": "2024-12-31")
  * 
  * Error Response (e.g., missing parameter):
  * {
@@ -26,6 +28,8 @@
  * for the specified broker account. If there are no transactions, the balance will be returned as 0.00.
  * - The endpoint assumes that the cash account balance is derived from summing all cash transactions, so it does not directly update the balance but relies on the cash transaction records to reflect the current state
  * of the cash balance for the broker account. In a production application, you might want to implement caching or a more efficient way to track the current balance if performance becomes an issue with a large number of transactions.
+ * - 'as_of' (YYYY-MM-DD, optional) returns the balance after the last transaction of that day or before, read from the
+ * materialized running balance (table cash_running_balance, kept by triggers) with one indexed lookup instead of a replay.
  */
 header('Content-Type: application/json; charset=utf-8');
 
@@ -46,6 +50,27 @@ try {
     $db = new Database();
     $pdo = $db->getConnection();
 
+    if (isset($_GET['as_of'])) {
+        $as_of = DateTime::createFromFormat('Y-m-d', $_GET['as_of']);
+        if (!$as_of) throw new Exception('Invalid as_of date (expected YYYY-MM-DD)');
+        $as_of = $as_of->format('Y-m-d');
+
+        // Last running balance of the day (or before), served by idx_cash_running_balance_account_date
+        $stmt = $pdo->prepare("
+            SELECT balance
+            FROM cash_running_balance
+            WHERE broker_account_id = :broker_account_id AND date < DATE_ADD(:as_of, INTERVAL 1 DAY)
+            ORDER BY date DESC, transaction_id DESC
+            LIMIT 1
+        ");
+        $stmt->execute([':broker_account_id' => $broker_account_id, ':as_of' => $as_of]);
+        $row = $stmt->fetch(PDO::FETCH_ASSOC);
+        $balance = $row ? (float)$row['balance'] : 0.00;
+
+        echo json_encode(['broker_account_id' => $broker_account_id, 'as_of' => $as_of, 'balance' => $balance]);
+        exit;
+    }
+
     // Prefer current_balance from cash_account if exist
     $stmt = $pdo->prepare("SELECT current_balance FROM cash_account WHERE broker_account_id = :broker_account_id LIMIT 1");
     $stmt->execute([':broker_account_id' => $broker_account_id]);
@@ -3,6 +3,10 @@
  * This endpoint retrieves the historical realtime price data for a specific instrument for the current day. It accepts an instrument_id as a query parameter and returns a JSON response containing an array of price records, each with a price and captured_at timestamp. The data is ordered chronologically by the captured_at timestamp. This allows clients to display intraday price movements for the instrument.
  * 
  * Example request: GET /api/getInstrumentHistory.php?instrument_id=123
+ *
+ * Optional: resolution=5m|1h returns the intraday OHLC bars maintained by
+ * update_realtime_prices (price_bar_5m / price_bar_1h) instead of every tick:
+ * "price" is the bar close and "captured_at" the bar start, plus open/high/low.
  * 
  * Example response:
  * {
@@ -38,15 +42,34 @@ try {
     $db = new Database('production');           // ← créer une instance
     $pdo = $db->getConnection();    // ← appeler la méthode
     $instrument_id = (int) $_GET['instrument_id'];
+    $resolution = $_GET['resolution'] ?? null;
+    $barTables = ['5m' => 'price_bar_5m', '1h' => 'price_bar_1h'];
 
-    // Select all realtime prices for today, ordered by timestamp
-    $sql = "
-        SELECT price, captured_at
-        FROM realtime_price
-        WHERE instrument_id = :instrument_id
-          AND DATE(captured_at) = CURDATE()
-        ORDER BY captured_at ASC
-    ";
+    if ($resolution !== null && !isset($barTables[$resolution])) {
+        echo json_encode(["status" => "error", "message" => "resolution must be 5m or 1h"]);
+        exit;
+    }
+
+    if ($resolution !== null) {
+        // Today's bars, ordered by bar start
+        $sql = "
+            SELECT close_price AS price, bar_start AS captured_at,
+                   open_price, high_price, low_price
+            FROM {$barTables[$resolution]}
+            WHERE instrument_id = :instrument_id
+              AND bar_start >= CURDATE()
+            ORDER BY bar_start ASC
+        ";
+    } else {
+        // Select all realtime prices for today, ordered by timestamp
+        $sql = "
+            SELECT price, captured_at
+            FROM realtime_price
+            WHERE instrument_id = :instrument_id
+              AND captured_at >= CURDATE()
+            ORDER BY captured_at ASC
+        ";
+    }
 
     $stmt = $pdo->prepare($sql);
     $stmt->execute(["instrument_id" => $instrument_id]);